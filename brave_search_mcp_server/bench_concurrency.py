@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+brave_search 동시성 벤치마크 (변경 전/후 비교)
+
+로컬에서 Brave Search API를 흉내 내는 대역 서버(uvicorn)를 띄우고, 같은 FastMCP 도구 호출 경로로
+- 변경 전: requests.get을 쓰는 동기 도구 (호출마다 새 연결, 이벤트 루프를 막음)
+- 변경 후: 공유 httpx.AsyncClient를 쓰는 비동기 brave_search 도구
+를 동시에 여러 번 호출하여 전체 소요 시간, 호출당 지연 시간, 새로 열린 연결 수를 비교합니다.
+
+사용법:
+    python bench_concurrency.py [--concurrency 1 10 50] [--latency 0.1] [--rounds 3]
+
+참고: 대역 서버는 평문 HTTP/1.1만 지원하므로 로컬 측정에서는 HTTP/2 대신 keep-alive 재사용 효과만 나타납니다.
+변경 전 경로를 측정하려면 requests 패키지가 필요합니다.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+
+# 대역 서버가 돌려주는 검색 결과 (실제 API 응답과 같은 구조)
+FAKE_RESULTS = {
+    "web": {
+        "results": [
+            {
+                "title": f"결과 {i}",
+                "url": f"https://example.com/{i}",
+                "description": "Brave Search API 대역 서버의 검색 결과 설명입니다. " * 3,
+                "age": "1 day ago",
+                "language": "ko",
+            }
+            for i in range(20)
+        ]
+    }
+}
+
+
+class FakeBraveAPI:
+    """지연 시간을 흉내 내는 Brave Search API 대역 ASGI 앱 - 클라이언트 포트로 새 연결 수를 집계합니다."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.client_ports = set()
+        self.body = json.dumps(FAKE_RESULTS, ensure_ascii=False).encode("utf-8")
+        self.gzipped = gzip.compress(self.body)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.client_ports.add(scope["client"][1])
+        await asyncio.sleep(self.latency)
+
+        headers = dict(scope["headers"])
+        body = self.body
+        response_headers = [(b"content-type", b"application/json")]
+        if b"gzip" in headers.get(b"accept-encoding", b""):
+            body = self.gzipped
+            response_headers.append((b"content-encoding", b"gzip"))
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def start_fake_api(app: FakeBraveAPI) -> str:
+    """대역 서버를 백그라운드 스레드에서 실행하고 API 주소를 반환합니다."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/res/v1/web/search"
+
+
+def legacy_brave_search(query: str, count: int = 10, offset: int = 0, country: str = "KR", language: str = "ko"):
+    """변경 전 brave_search와 같은 방식의 동기 요청"""
+    import requests
+
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+        "X-Subscription-Token": os.environ["BRAVE_API_KEY"],
+    }
+    params = {"q": query, "count": min(count, 20), "offset": offset, "country": country, "language": language}
+    response = requests.get(os.environ["BRAVE_API_URL"], headers=headers, params=params, timeout=10)
+    response.raise_for_status()
+    return {"results": response.json()["web"]["results"]}
+
+
+async def run_round(bench: FastMCP, tool: str, concurrency: int):
+    """도구를 동시에 concurrency번 호출하고 (전체 소요 시간, 호출별 지연 시간 목록)을 반환합니다."""
+    async def call(i):
+        started = time.perf_counter()
+        await bench.call_tool(tool, {"query": f"검색어 {i}"})
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(call(i) for i in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+async def run_benchmark(args, app: FakeBraveAPI):
+    # 대역 서버 주소를 환경변수로 넘긴 뒤 서버 모듈을 불러옵니다
+    import brave_search_mcp_server as server
+
+    bench = FastMCP("bench")
+    bench.add_tool(server.brave_search, name="after")
+    try:
+        import requests  # noqa: F401
+        bench.add_tool(legacy_brave_search, name="before")
+        tools = ["before", "after"]
+    except ImportError:
+        print("⚠️  requests 패키지가 없어 변경 전 경로는 건너뜁니다")
+        tools = ["after"]
+
+    # 클라이언트 생성, TLS 설정 로드 같은 1회성 준비 비용은 측정에서 제외합니다
+    for tool in tools:
+        await bench.call_tool(tool, {"query": "준비"})
+
+    print(f"{'방식':<8}{'동시 호출':>10}{'전체(ms)':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'새 연결':>8}")
+    for concurrency in args.concurrency:
+        for tool in tools:
+            totals, latencies = [], []
+            app.client_ports.clear()
+            for _ in range(args.rounds):
+                total, round_latencies = await run_round(bench, tool, concurrency)
+                totals.append(total)
+                latencies.extend(round_latencies)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            print(
+                f"{tool:<8}{concurrency:>10}{statistics.median(totals) * 1000:>12.1f}"
+                f"{statistics.median(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}{len(app.client_ports):>8}"
+            )
+    await server.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="brave_search 동시성 벤치마크")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50], help="동시 호출 수 목록 (기본값: 1 10 50)")
+    parser.add_argument("--latency", type=float, default=0.1, help="대역 서버의 응답 지연 시간(초) (기본값: 0.1)")
+    parser.add_argument("--rounds", type=int, default=3, help="동시 호출 수마다 반복할 횟수 (기본값: 3)")
+    args = parser.parse_args()
+
+    # 요청마다 찍히는 httpx 로그가 결과 표를 가리지 않도록 합니다
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    app = FakeBraveAPI(args.latency)
+    os.environ["BRAVE_API_URL"] = start_fake_api(app)
+    os.environ.setdefault("BRAVE_API_KEY", "bench")
+    # 연결 재사용 효과만 비교하도록 속도 제한, 결과 캐시, 다음 페이지 선행 조회는 끕니다
+    os.environ["BRAVE_RATE_LIMIT_PER_SECOND"] = "1000000"
+    os.environ["BRAVE_CACHE_TTL"] = "0"
+    os.environ["BRAVE_PREFETCH"] = "0"
+
+    print(f"🧪 brave_search 동시성 벤치마크 (대역 서버 지연 {args.latency * 1000:.0f}ms, {args.rounds}회 반복)\n")
+    asyncio.run(run_benchmark(args, app))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,615 @@
 from mcp.server.fastmcp import FastMCP
-import requests
+import asyncio
+import heapq
+import itertools
+import httpx
 import os
-from typing import Dict, List, Any
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+try:
+    import h2  # noqa: F401  (httpx[http2] 설치 여부 확인용)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # ① FastMCP 인스턴스를 생성
 mcp = FastMCP("Brave Search MCP Server", host="0.0.0.0", port=11001)
 
 # Brave Search API 설정
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
-BRAVE_API_URL = "https://api.search.brave.com/res/v1/web/search"
+BRAVE_API_URL = os.getenv("BRAVE_API_URL", "https://api.search.brave.com/res/v1/web/search")
+
+# HTTP 연결 풀 설정 (환경변수로 조정 가능)
+HTTP_MAX_CONNECTIONS = int(os.getenv("BRAVE_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BRAVE_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("BRAVE_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("BRAVE_HTTP2", "1") == "1" and HTTP2_AVAILABLE
+HTTP_TIMEOUT = float(os.getenv("BRAVE_HTTP_TIMEOUT", "10"))
+
+# 요청 속도 제한 설정
+# X-RateLimit-* 헤더를 받기 전까지 사용할 초당 요청 수 (무료 요금제: 1)
+RATE_LIMIT_PER_SECOND = int(os.getenv("BRAVE_RATE_LIMIT_PER_SECOND", "1"))
+# 요청이 속도 제한 대기열에서 기다릴 수 있는 최대 시간 (초)
+RATE_LIMIT_QUEUE_TIMEOUT = float(os.getenv("BRAVE_RATE_LIMIT_QUEUE_TIMEOUT", "10"))
+# X-RateLimit-Policy 헤더가 없을 때 가정하는 창 길이 (초당, 월간)
+DEFAULT_RATE_LIMIT_WINDOWS = (1, 2592000)
+
+# 요청 우선순위 (숫자가 작을수록 먼저 처리)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# 검색 결과 캐시 설정
+CACHE_TTL = float(os.getenv("BRAVE_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("BRAVE_CACHE_MAX_ENTRIES", "1000"))
+
+# 다음 페이지 선행 조회 설정
+PREFETCH_ENABLED = os.getenv("BRAVE_PREFETCH", "1") == "1"
+# 월간 등 긴 창의 남은 요청 수가 이 비율 이하이면 선행 조회를 하지 않습니다 (대화형 요청 몫으로 남겨 둠)
+PREFETCH_RESERVE_RATIO = float(os.getenv("BRAVE_PREFETCH_RESERVE_RATIO", "0.2"))
+# 선행 조회가 속도 제한 대기열에서 기다릴 수 있는 최대 시간 (초)
+PREFETCH_QUEUE_TIMEOUT = float(os.getenv("BRAVE_PREFETCH_QUEUE_TIMEOUT", "5"))
+PREFETCH_MAX_INFLIGHT = int(os.getenv("BRAVE_PREFETCH_MAX_INFLIGHT", "2"))
+# Brave API가 허용하는 최대 offset (페이지 번호)과 페이지당 최대 결과 수
+BRAVE_MAX_OFFSET = 9
+BRAVE_PAGE_SIZE = 20
+# 여러 페이지를 동시에 요청해 한 번에 돌려줄 수 있는 최대 결과 수
+MAX_COUNT = BRAVE_PAGE_SIZE * (BRAVE_MAX_OFFSET + 1)
+
+
+class RateLimitExceeded(Exception):
+    """요청이 마감 시간 안에 속도 제한 대기열을 통과하지 못했을 때 발생하는 예외"""
+
+
+class RateLimitWindow:
+    """X-RateLimit 헤더의 창(초당/월간 등) 하나의 남은 요청 수"""
+    
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = time.monotonic() + window
+    
+    def refill(self, now: float) -> None:
+        """리셋 시각이 지났으면 남은 요청 수를 한도로 되돌립니다."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+    
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in_seconds": round(max(0.0, self.reset_at - now), 1),
+        }
+
+
+class BraveRateLimiter:
+    """Brave API의 X-RateLimit-* 헤더를 따르는 우선순위 요청 스케줄러
+    
+    요청은 (우선순위, 도착 순서)로 정렬된 대기열에 들어가고, 모든 창(초당/월간)에 남은 요청 수가
+    있을 때 하나씩 통과합니다. 통과시킬 때 남은 수를 미리 줄이고, 응답 헤더를 받으면 서버 값에서
+    아직 응답을 받지 못한 요청 수를 뺀 값으로 맞춥니다 (서버 값에는 진행 중인 요청이 빠져 있을 수 있음).
+    마감 시간이 지났거나 다음 리셋까지 기다리면 마감을 넘기는 요청은 RateLimitExceeded로 버립니다.
+    """
+    
+    def __init__(self, per_second: int = RATE_LIMIT_PER_SECOND):
+        self.windows: List[RateLimitWindow] = [RateLimitWindow(per_second, DEFAULT_RATE_LIMIT_WINDOWS[0])]
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.granted = 0
+        self.in_flight = 0
+        self.dropped = 0
+        self.throttled = 0
+    
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, _, future in self._queue if not future.done())
+    
+    def has_spare_capacity(self, reserve_ratio: float = PREFETCH_RESERVE_RATIO) -> bool:
+        """대기 중인 대화형 요청이 없고 지금 한 건을 더 보내도 여유가 있는지 확인합니다.
+        
+        초당 창은 한 건을 쓴 뒤에도 한 건 이상 남아야 하고 (다음 초의 몫을 미리 가져가지 않도록),
+        월간 등 나머지 창은 예비분보다 많이 남아 있어야 합니다.
+        """
+        if any(priority < PRIORITY_BACKGROUND and not future.done() for priority, _, _, future in self._queue):
+            return False
+        now = time.monotonic()
+        self.windows[0].refill(now)
+        if self.windows[0].remaining <= 1:
+            return False
+        for window in self.windows[1:]:
+            window.refill(now)
+            if window.remaining <= window.limit * reserve_ratio:
+                return False
+        return True
+    
+    async def acquire(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: float = RATE_LIMIT_QUEUE_TIMEOUT,
+    ) -> None:
+        """요청을 보낼 차례가 될 때까지 기다립니다. timeout 안에 차례가 오지 않으면 RateLimitExceeded를 발생시킵니다."""
+        deadline = time.monotonic() + timeout
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), deadline, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            self.dropped += 1
+            raise RateLimitExceeded(f"{timeout:.0f}초 안에 요청 차례가 오지 않았습니다 (대기열 {self.queue_depth()}건)")
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+    
+    def _abandon(self, future: asyncio.Future) -> None:
+        """대기를 포기한 요청을 대기열에서 빼고, 이미 통과시킨 뒤라면 진행 중인 요청 수를 돌려놓습니다."""
+        if future.done() and not future.cancelled() and future.exception() is None:
+            self.release()
+        else:
+            future.cancel()
+    
+    def _wait_time(self, now: float) -> float:
+        """모든 창에 남은 요청 수가 생길 때까지 기다려야 하는 시간(초)을 반환합니다."""
+        wait = 0.0
+        for window in self.windows:
+            window.refill(now)
+            if window.remaining <= 0:
+                wait = max(wait, window.reset_at - now)
+        return wait
+    
+    async def _dispatch(self) -> None:
+        while self._queue:
+            priority, sequence, deadline, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            
+            now = time.monotonic()
+            wait = self._wait_time(now)
+            if wait <= 0:
+                heapq.heappop(self._queue)
+                for window in self.windows:
+                    window.remaining -= 1
+                self.granted += 1
+                self.in_flight += 1
+                future.set_result(None)
+                continue
+            if now + wait > deadline:
+                # 다음 리셋까지 기다리면 마감을 넘기는 요청은 바로 버립니다 (월간 한도 소진 등)
+                heapq.heappop(self._queue)
+                self.dropped += 1
+                future.set_exception(RateLimitExceeded(
+                    f"요청 한도를 모두 사용했습니다 ({wait:.1f}초 후 리셋)"
+                ))
+                continue
+            
+            # 리셋을 기다리는 동안 더 높은 우선순위 요청이 들어오면 다시 판단합니다
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+    
+    def release(self) -> None:
+        """통과시킨 요청이 응답 없이 끝났을 때(연결 오류, 취소) 진행 중인 요청 수에서 뺍니다."""
+        self.in_flight = max(0, self.in_flight - 1)
+    
+    def update(self, headers: httpx.Headers, status_code: int) -> None:
+        """응답의 X-RateLimit-Limit/Remaining/Reset 헤더로 창별 남은 요청 수를 맞춥니다.
+        
+        서버의 남은 수는 이 응답 이후에 통과시킨(아직 응답이 없는) 요청을 반영하지 못하므로
+        진행 중인 요청 수만큼 빼서 한도를 넘겨 보내지 않도록 합니다.
+        """
+        self.release()
+        if status_code == 429:
+            self.throttled += 1
+        
+        limits = _parse_rate_limit_header(headers.get("x-ratelimit-limit"))
+        remaining = _parse_rate_limit_header(headers.get("x-ratelimit-remaining"))
+        resets = _parse_rate_limit_header(headers.get("x-ratelimit-reset"))
+        if not limits or len(remaining) != len(limits) or len(resets) != len(limits):
+            if status_code == 429:
+                # 헤더 없이 429를 받으면 초당 창을 소진된 것으로 처리합니다
+                self.windows[0].remaining = 0
+            return
+        
+        windows = _parse_policy_windows(headers.get("x-ratelimit-policy"), len(limits))
+        now = time.monotonic()
+        updated = []
+        for index, limit in enumerate(limits):
+            window = self.windows[index] if index < len(self.windows) else RateLimitWindow(limit, windows[index])
+            window.limit = limit
+            window.window = windows[index]
+            window.remaining = remaining[index] - self.in_flight
+            window.reset_at = now + resets[index]
+            updated.append(window)
+        if status_code == 429:
+            updated[0].remaining = 0
+        self.windows = updated
+        self._wakeup.set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """대기열 길이와 창별 남은 요청 수를 반환합니다."""
+        now = time.monotonic()
+        for window in self.windows:
+            window.refill(now)
+        names = ["per_second", "per_month"]
+        return {
+            "queue_depth": self.queue_depth(),
+            "granted": self.granted,
+            "in_flight": self.in_flight,
+            "dropped": self.dropped,
+            "throttled_429": self.throttled,
+            **{
+                (names[index] if index < len(names) else f"window_{index}"): window.get_stats(now)
+                for index, window in enumerate(self.windows)
+            },
+        }
+    
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+
+def _parse_rate_limit_header(value: Optional[str]) -> List[int]:
+    """'1, 15000' 형식의 헤더 값을 정수 목록으로 변환합니다."""
+    if not value:
+        return []
+    try:
+        return [int(float(part)) for part in value.split(",")]
+    except ValueError:
+        return []
+
+
+def _parse_policy_windows(value: Optional[str], count: int) -> List[float]:
+    """'1;w=1, 15000;w=2592000' 형식의 X-RateLimit-Policy에서 창 길이(초) 목록을 읽습니다."""
+    windows = list(DEFAULT_RATE_LIMIT_WINDOWS)
+    if value:
+        for index, part in enumerate(value.split(",")):
+            for field in part.split(";")[1:]:
+                key, _, number = field.strip().partition("=")
+                if key == "w" and number.isdigit() and index < len(windows):
+                    windows[index] = float(number)
+                elif key == "w" and number.isdigit():
+                    windows.append(float(number))
+    while len(windows) < count:
+        windows.append(windows[-1])
+    return windows
+
+
+class PageCache:
+    """(검색어, 국가, 언어, 결과 수, offset)별 검색 결과 페이지를 보관하는 TTL/LRU 캐시"""
+    
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(query: str, country: str, language: str, count: int, offset: int) -> Tuple:
+        """대소문자와 공백 차이만 있는 검색어가 같은 항목을 쓰도록 키를 정규화합니다."""
+        return (" ".join(query.lower().split()), country.upper(), language.lower(), count, offset)
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def __contains__(self, key: Tuple) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+    
+    def set(self, key: Tuple, page: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, page)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Brave API 요청 속도 제한 스케줄러
+rate_limiter = BraveRateLimiter()
+
+# 검색 결과 페이지 캐시와 진행 중인 다음 페이지 선행 조회
+page_cache = PageCache()
+_prefetches: Dict[Tuple, asyncio.Task] = {}
+# 속도 제한 대기열을 통과해 API 요청을 보낸 선행 조회의 키
+_prefetches_sent: set = set()
+_prefetched_keys: set = set()
+prefetch_stats = {
+    "scheduled": 0,
+    "completed": 0,
+    "hits": 0,
+    "joined": 0,
+    "superseded": 0,
+    "skipped_budget": 0,
+    "dropped": 0,
+    "failed": 0,
+}
+
+# 모든 검색이 공유하는 HTTP 클라이언트 (keep-alive/HTTP/2 연결 재사용)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """공유 HTTP 클라이언트를 반환합니다 (필요 시 생성)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """속도 제한 스케줄러를 멈추고 공유 HTTP 클라이언트의 연결을 정리합니다."""
+    global _client
+    for task in list(_prefetches.values()):
+        task.cancel()
+    _prefetches.clear()
+    _prefetches_sent.clear()
+    await rate_limiter.close()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def request_brave(
+    params: Dict[str, Any],
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_timeout: float = RATE_LIMIT_QUEUE_TIMEOUT,
+    on_sent: Optional[Callable[[], None]] = None,
+) -> httpx.Response:
+    """속도 제한 스케줄러를 거쳐 Brave Search API를 호출합니다.
+    
+    응답 헤더로 남은 요청 수를 갱신하며, 429를 받으면 리셋을 기다려 한 번 더 시도합니다.
+    on_sent는 대기열을 통과해 요청을 보내기 직전에 호출됩니다.
+    """
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+        "X-Subscription-Token": BRAVE_API_KEY
+    }
+    for _ in range(2):
+        await rate_limiter.acquire(priority, queue_timeout)
+        if on_sent is not None:
+            on_sent()
+        try:
+            response = await get_client().get(BRAVE_API_URL, headers=headers, params=params)
+        except BaseException:
+            rate_limiter.release()
+            raise
+        rate_limiter.update(response.headers, response.status_code)
+        if response.status_code != 429:
+            break
+    return response
+
+
+async def fetch_page(
+    query: str,
+    count: int,
+    offset: int,
+    country: str,
+    language: str,
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_timeout: float = RATE_LIMIT_QUEUE_TIMEOUT,
+    on_sent: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """검색 결과 한 페이지를 API에서 받아 정리합니다."""
+    params = {
+        "q": query,
+        "count": count,
+        "offset": offset,
+        "country": country,
+        "language": language,
+        "safesearch": "moderate"
+    }
+    response = await request_brave(params, priority, queue_timeout, on_sent)
+    response.raise_for_status()
+    
+    data = response.json()
+    
+    # 결과 정리
+    results = []
+    if "web" in data and "results" in data["web"]:
+        for item in data["web"]["results"]:
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("url", ""),
+                "description": item.get("description", ""),
+                "age": item.get("age", ""),
+                "language": item.get("language", ""),
+                "location": item.get("location", "")
+            })
+    
+    more_results = data.get("query", {}).get("more_results_available")
+    return {
+        "results": results,
+        "more_results_available": len(results) >= count if more_results is None else bool(more_results),
+    }
+
+
+async def get_page(
+    query: str,
+    count: int,
+    offset: int,
+    country: str,
+    language: str,
+    prefetch: bool = True,
+) -> Tuple[Dict[str, Any], str]:
+    """캐시, 진행 중인 선행 조회, API 순으로 페이지를 찾고 (페이지, 출처)를 반환합니다.
+    
+    prefetch가 참이면 페이지를 얻은 뒤 다음 페이지(offset + 1)의 선행 조회를 예약합니다.
+    """
+    key = page_cache.make_key(query, country, language, count, offset)
+    page = page_cache.get(key)
+    source = "cache"
+    if page is not None and key in _prefetched_keys:
+        _prefetched_keys.discard(key)
+        prefetch_stats["hits"] += 1
+    
+    prefetching = _prefetches.get(key) if page is None else None
+    if prefetching is not None and key in _prefetches_sent:
+        # 같은 페이지의 선행 조회가 이미 요청을 보냈으면 새로 요청하지 않고 그 결과를 기다립니다
+        page = await asyncio.shield(prefetching)
+        if page is not None:
+            _prefetched_keys.discard(key)
+            prefetch_stats["joined"] += 1
+            source = "prefetch"
+    elif prefetching is not None:
+        # 아직 대기열에서 백그라운드 우선순위로 기다리는 선행 조회는 취소하고 직접 요청합니다
+        del _prefetches[key]
+        prefetching.cancel()
+        prefetch_stats["superseded"] += 1
+    
+    if page is None:
+        page = await fetch_page(query, count, offset, country, language)
+        page_cache.set(key, page)
+        source = "api"
+    
+    if prefetch and page["more_results_available"]:
+        schedule_prefetch(query, count, offset + 1, country, language)
+    return page, source
+
+
+async def get_pages(
+    query: str,
+    count: int,
+    offset: int,
+    country: str,
+    language: str,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[Exception]]:
+    """count가 한 페이지(20개)를 넘으면 필요한 페이지를 동시에 요청해 순서대로 합칩니다.
+    
+    offset은 count개 단위의 페이지 번호로 해석해 offset * count번째 결과부터 count개를 돌려줍니다.
+    count가 20을 넘으면 그 범위를 덮는 20개 단위 API 페이지를 요청하고 첫 페이지의 앞부분을 잘라 내며,
+    중복 URL은 먼저 나온 결과만 남깁니다.
+    (합친 결과, 페이지별 메타데이터, 중간에 실패한 페이지의 예외)를 반환합니다.
+    첫 페이지가 실패하면 예외를 그대로 발생시키고, 이후 페이지가 실패하면 그 앞까지의 결과를 돌려줍니다.
+    """
+    if count <= BRAVE_PAGE_SIZE:
+        page_size, first_page, last_page, skip = count, offset, offset, 0
+    else:
+        first = offset * count
+        page_size = BRAVE_PAGE_SIZE
+        first_page, skip = divmod(first, BRAVE_PAGE_SIZE)
+        last_page = (first + count - 1) // BRAVE_PAGE_SIZE
+    offsets = list(range(first_page, min(last_page, BRAVE_MAX_OFFSET) + 1))
+    if not offsets:
+        return [], [], None
+    
+    # 속도 제한 대기열을 거쳐 동시에 요청하고, 다음 페이지 선행 조회는 마지막 페이지에서만 예약합니다
+    pages = await asyncio.gather(
+        *(
+            get_page(query, page_size, page_offset, country, language, prefetch=page_offset == offsets[-1])
+            for page_offset in offsets
+        ),
+        return_exceptions=True,
+    )
+    
+    results: List[Dict[str, Any]] = []
+    pages_metadata: List[Dict[str, Any]] = []
+    seen_urls = set()
+    error: Optional[Exception] = None
+    for page_offset, outcome in zip(offsets, pages):
+        if isinstance(outcome, BaseException):
+            if not pages_metadata:
+                raise outcome
+            error = outcome
+            break
+        page, source = outcome
+        page_results = page["results"][skip:] if page_offset == first_page else page["results"]
+        for result in page_results:
+            url = result["url"].rstrip("/")
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            results.append(result)
+        pages_metadata.append({"offset": page_offset, "count": len(page["results"]), "source": source})
+        if not page["more_results_available"]:
+            break
+    return results[:count], pages_metadata, error
+
+
+def schedule_prefetch(query: str, count: int, offset: int, country: str, language: str) -> None:
+    """다음 페이지를 낮은 우선순위로 미리 받아 캐시에 넣습니다.
+    
+    대화형 요청이 대기 중이거나, 초당 창에 여유가 없거나, 월간 등 긴 창의 남은 요청 수가 예비분
+    이하이면 건너뛰어 선행 조회가 대화형 요청의 한도를 쓰지 않도록 합니다. 요청을 보내기 전에 같은
+    페이지를 대화형으로 요청하면 get_page가 이 선행 조회를 취소합니다.
+    """
+    if not PREFETCH_ENABLED or offset > BRAVE_MAX_OFFSET:
+        return
+    key = page_cache.make_key(query, country, language, count, offset)
+    if key in page_cache or key in _prefetches or len(_prefetches) >= PREFETCH_MAX_INFLIGHT:
+        return
+    if not rate_limiter.has_spare_capacity():
+        prefetch_stats["skipped_budget"] += 1
+        return
+    
+    async def prefetch() -> Optional[Dict[str, Any]]:
+        task = asyncio.current_task()
+        
+        def mark_sent() -> None:
+            if _prefetches.get(key) is task:
+                _prefetches_sent.add(key)
+        
+        try:
+            page = await fetch_page(
+                query, count, offset, country, language,
+                priority=PRIORITY_BACKGROUND, queue_timeout=PREFETCH_QUEUE_TIMEOUT,
+                on_sent=mark_sent,
+            )
+        except RateLimitExceeded:
+            prefetch_stats["dropped"] += 1
+            return None
+        except Exception:
+            prefetch_stats["failed"] += 1
+            return None
+        finally:
+            # 취소된 뒤 같은 페이지로 새로 예약된 선행 조회의 항목은 건드리지 않습니다
+            if _prefetches.get(key) is task:
+                del _prefetches[key]
+                _prefetches_sent.discard(key)
+        page_cache.set(key, page)
+        _prefetched_keys.add(key)
+        prefetch_stats["completed"] += 1
+        return page
+    
+    prefetch_stats["scheduled"] += 1
+    _prefetches[key] = asyncio.create_task(prefetch())
 
 
 @mcp.tool()  # ② 도구를 정의합니다.
@@ -25,6 +626,9 @@ def health_check() -> Dict[str, Any]:
         "service": "Brave Search MCP Server",
         "version": "1.0.0",
         "brave_api_configured": bool(BRAVE_API_KEY),
+        "rate_limit": rate_limiter.get_stats(),
+        "cache": page_cache.get_stats(),
+        "prefetch": {**prefetch_stats, "in_flight": len(_prefetches)},
         "available_tools": ["hello", "get_prompt", "brave_search", "health_check"],
         "available_resources": ["simple://info"]
     }
@@ -43,13 +647,13 @@ def get_prompt(prompt_type: str = "general") -> str:
 
 
 @mcp.tool()
-def brave_search(query: str, count: int = 10, offset: int = 0, country: str = "KR", language: str = "ko") -> Dict[str, Any]:
+async def brave_search(query: str, count: int = 10, offset: int = 0, country: str = "KR", language: str = "ko") -> Dict[str, Any]:
     """Brave Search API를 사용하여 웹 검색을 수행하는 도구
     
     Args:
         query: 검색할 키워드 또는 질문
-        count: 반환할 결과 수 (기본값: 10, 최대: 20)
-        offset: 결과 오프셋 (기본값: 0)
+        count: 반환할 결과 수 (기본값: 10, 최대: 200, 20개를 넘으면 여러 페이지를 동시에 요청)
+        offset: count개 단위의 결과 페이지 번호 (기본값: 0, offset * count번째 결과부터 반환)
         country: 검색 국가 코드 (기본값: KR)
         language: 검색 언어 코드 (기본값: ko)
     
@@ -64,40 +668,11 @@ def brave_search(query: str, count: int = 10, offset: int = 0, country: str = "K
         }
     
     try:
-        headers = {
-            "Accept": "application/json",
-            "Accept-Encoding": "gzip",
-            "X-Subscription-Token": BRAVE_API_KEY
-        }
+        count = max(1, min(count, MAX_COUNT))
+        results, pages, error = await get_pages(query, count, offset, country, language)
+        sources = {page["source"] for page in pages}
         
-        params = {
-            "q": query,
-            "count": min(count, 20),  # 최대 20개로 제한
-            "offset": offset,
-            "country": country,
-            "language": language,
-            "safesearch": "moderate"
-        }
-        
-        response = requests.get(BRAVE_API_URL, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # 결과 정리
-        results = []
-        if "web" in data and "results" in data["web"]:
-            for item in data["web"]["results"]:
-                results.append({
-                    "title": item.get("title", ""),
-                    "url": item.get("url", ""),
-                    "description": item.get("description", ""),
-                    "age": item.get("age", ""),
-                    "language": item.get("language", ""),
-                    "location": item.get("location", "")
-                })
-        
-        return {
+        response = {
             "query": query,
             "results": results,
             "total_results": len(results),
@@ -105,11 +680,22 @@ def brave_search(query: str, count: int = 10, offset: int = 0, country: str = "K
                 "country": country,
                 "language": language,
                 "count": len(results),
-                "offset": offset
+                "offset": offset,
+                "source": sources.pop() if len(sources) == 1 else "mixed",
+                "pages": pages
             }
         }
+        if error is not None:
+            response["error"] = f"일부 페이지를 가져오지 못해 {len(results)}개 결과만 반환합니다: {str(error)}"
+        return response
         
-    except requests.exceptions.RequestException as e:
+    except RateLimitExceeded as e:
+        return {
+            "error": f"요청 한도 초과: {str(e)}",
+            "results": [],
+            "total_results": 0
+        }
+    except httpx.HTTPError as e:
         return {
             "error": f"검색 요청 중 오류가 발생했습니다: {str(e)}",
             "results": [],
@@ -140,12 +726,24 @@ def get_server_info() -> str:
     제공하는 리소스:
     - simple://info: 서버 정보
     
+    count가 20을 넘으면 필요한 페이지를 동시에 요청해 합친 결과를 돌려줍니다 (최대 200개).
+    검색 결과는 BRAVE_CACHE_TTL초 동안 캐시되며, 한 페이지를 조회하면 남는 요청 한도 안에서
+    다음 페이지를 미리 받아 둡니다.
+    
     환경 설정:
     - BRAVE_API_KEY: Brave Search API 키 (필수)
     """
 
 
+async def run_server() -> None:
+    """공유 HTTP 클라이언트의 생명주기와 함께 streamable-http 서버를 실행합니다."""
+    try:
+        await mcp.run_streamable_http_async()
+    finally:
+        await close_client()
+
+
 if __name__ == "__main__":
     """서버를 실행합니다."""
     # ④ 서버를 실행합니다.
-    mcp.run(transport="streamable-http")
+    asyncio.run(run_server())
@@ -0,0 +1,395 @@
+"""brave_search_mcp_server 단위 테스트
+
+네트워크 없이 httpx.MockTransport로 Brave Search API 응답을 흉내 냅니다.
+
+실행:
+    pip install pytest pytest-asyncio
+    pytest -q
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+os.environ.setdefault("BRAVE_API_KEY", "test-key")
+
+import brave_search_mcp_server as brave  # noqa: E402
+
+
+@pytest.fixture
+def use_transport(monkeypatch):
+    """모듈 전역 상태를 새로 만들고, 공유 클라이언트를 목 전송 계층으로 바꾸는 함수를 돌려줍니다."""
+    monkeypatch.setattr(brave, "rate_limiter", brave.BraveRateLimiter(per_second=1000))
+    monkeypatch.setattr(brave, "page_cache", brave.PageCache())
+    monkeypatch.setattr(brave, "_prefetches", {})
+    monkeypatch.setattr(brave, "_prefetches_sent", set())
+    monkeypatch.setattr(brave, "_prefetched_keys", set())
+    monkeypatch.setattr(brave, "prefetch_stats", dict.fromkeys(brave.prefetch_stats, 0))
+
+    def install(handler: Callable[[httpx.Request], Any]) -> None:
+        monkeypatch.setattr(brave, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    return install
+
+
+def rate_limit_headers(limit: str, remaining: str, reset: str) -> Dict[str, str]:
+    return {
+        "x-ratelimit-limit": limit,
+        "x-ratelimit-remaining": remaining,
+        "x-ratelimit-reset": reset,
+    }
+
+
+# --- 응답 헤더 기반 우선순위 요청 스케줄러 ---
+
+@pytest.mark.asyncio
+async def test_update_subtracts_requests_still_in_flight():
+    limiter = brave.BraveRateLimiter(per_second=3)
+    for _ in range(3):
+        await limiter.acquire()
+    assert limiter.windows[0].remaining == 0
+    assert limiter.in_flight == 3
+
+    # 첫 응답은 자기 요청만 센 값이므로, 아직 응답이 없는 두 요청을 빼야 합니다
+    limiter.update(httpx.Headers(rate_limit_headers("3, 1000", "2, 999", "1, 100000")), 200)
+    assert limiter.in_flight == 2
+    assert limiter.windows[0].remaining == 0
+    assert limiter.windows[1].remaining == 997
+
+    limiter.update(httpx.Headers(rate_limit_headers("3, 1000", "1, 998", "1, 100000")), 200)
+    limiter.update(httpx.Headers(rate_limit_headers("3, 1000", "0, 997", "1, 100000")), 200)
+    assert limiter.in_flight == 0
+    assert limiter.windows[0].remaining == 0
+    assert limiter.windows[1].remaining == 997
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_do_not_exceed_server_limit(use_transport, monkeypatch):
+    monkeypatch.setattr(brave, "rate_limiter", brave.BraveRateLimiter(per_second=3))
+    limit = 3
+    state = {"started": None, "count": 0}
+    throttled: List[int] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # 서버는 도착 시점에 1초 창을 세고, 응답은 조금 늦게 돌려줍니다
+        now = time.monotonic()
+        if state["started"] is None or now - state["started"] >= 1.0:
+            state["started"], state["count"] = now, 0
+        state["count"] += 1
+        remaining = max(0, limit - state["count"])
+        headers = rate_limit_headers(f"{limit}, 1000", f"{remaining}, 900", "1, 100000")
+        await asyncio.sleep(0.05)
+        if state["count"] > limit:
+            throttled.append(state["count"])
+            return httpx.Response(429, headers=headers)
+        return httpx.Response(200, json={"web": {"results": []}}, headers=headers)
+
+    use_transport(handler)
+    responses = await asyncio.gather(*(brave.request_brave({"q": str(i)}) for i in range(6)))
+    assert [response.status_code for response in responses] == [200] * 6
+    assert throttled == []
+    assert brave.rate_limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_transport_error_releases_in_flight_slot(use_transport):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("boom", request=request)
+
+    use_transport(handler)
+    with pytest.raises(httpx.ConnectError):
+        await brave.request_brave({"q": "x"})
+    assert brave.rate_limiter.granted == 1
+    assert brave.rate_limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_returns_granted_slot():
+    limiter = brave.BraveRateLimiter(per_second=1)
+    await limiter.acquire()
+    assert limiter.in_flight == 1
+
+    # 차례를 기다리다 취소된 요청은 대기열에서만 빠집니다
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert limiter.queue_depth() == 0
+    assert limiter.in_flight == 1
+
+    # 취소가 호출자에게 전달되기 전에 스케줄러가 차례를 주면, 통과시킨 요청의 진행 중 수를 돌려놓습니다
+    granted = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.windows[0].remaining = 1
+    granted.cancel()
+    await limiter._dispatch()
+    assert limiter.granted == 2
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    assert limiter.in_flight == 1
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_run_before_background():
+    limiter = brave.BraveRateLimiter(per_second=1)
+    await limiter.acquire()
+    background = asyncio.create_task(limiter.acquire(brave.PRIORITY_BACKGROUND, timeout=5))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(limiter.acquire(brave.PRIORITY_INTERACTIVE, timeout=5))
+    await asyncio.sleep(0)
+
+    # 서버 헤더로 한 건만 허용하면 나중에 들어온 대화형 요청이 먼저 통과합니다
+    limiter.update(httpx.Headers(rate_limit_headers("1", "1", "2")), 200)
+    await asyncio.wait_for(interactive, 1)
+    assert not background.done()
+    assert limiter.queue_depth() == 1
+    background.cancel()
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_request_past_deadline_is_dropped():
+    limiter = brave.BraveRateLimiter(per_second=1)
+    await limiter.acquire()
+    limiter.update(httpx.Headers(rate_limit_headers("1, 10", "0, 0", "1, 100000")), 200)
+    with pytest.raises(brave.RateLimitExceeded):
+        await limiter.acquire(timeout=1)
+    assert limiter.dropped == 1
+    await limiter.close()
+
+
+def results_handler(calls: List[Dict[str, int]], delay: float = 0.0, total: int = 200):
+    """offset·count에 맞춰 번호가 매겨진 결과를 돌려주는 대역 Brave API입니다 (전체 결과 total개)."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        count = int(request.url.params["count"])
+        offset = int(request.url.params["offset"])
+        calls.append({"count": count, "offset": offset})
+        if delay:
+            await asyncio.sleep(delay)
+        first = offset * count
+        results = [
+            {"title": f"result {index}", "url": f"https://example.com/{index}", "description": ""}
+            for index in range(first, min(first + count, total))
+        ]
+        return httpx.Response(200, json={
+            "web": {"results": results},
+            "query": {"more_results_available": first + count < total},
+        })
+
+    return handler
+
+
+def result_numbers(results: List[Dict[str, Any]]) -> List[int]:
+    return [int(result["url"].rstrip("/").rsplit("/", 1)[1]) for result in results]
+
+
+# --- 페이지 캐시와 여유 한도 안에서의 다음 페이지 선행 조회 ---
+
+def test_page_cache_normalizes_query_and_expires(monkeypatch):
+    cache = brave.PageCache(ttl=10, max_entries=2)
+    key = cache.make_key("Hello  World", "kr", "KO", 10, 0)
+    assert key == cache.make_key("hello world", "KR", "ko", 10, 0)
+    cache.set(key, {"results": []})
+    assert cache.get(key) == {"results": []}
+
+    now = time.monotonic()
+    monkeypatch.setattr(brave.time, "monotonic", lambda: now + 11)
+    assert key not in cache
+    assert cache.get(key) is None
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_page_cache_evicts_least_recently_used():
+    cache = brave.PageCache(ttl=60, max_entries=2)
+    cache.set("a", {"page": "a"})
+    cache.set("b", {"page": "b"})
+    cache.get("a")
+    cache.set("c", {"page": "c"})
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+@pytest.mark.asyncio
+async def test_get_page_serves_repeat_from_cache(use_transport, monkeypatch):
+    monkeypatch.setattr(brave, "PREFETCH_ENABLED", False)
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    page, source = await brave.get_page("query", 10, 0, "KR", "ko")
+    assert source == "api"
+    page, source = await brave.get_page("  QUERY ", 10, 0, "kr", "ko")
+    assert source == "cache"
+    assert result_numbers(page["results"]) == list(range(10))
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_prefetched_next_page_is_served_from_cache(use_transport):
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    await brave.get_page("query", 10, 0, "KR", "ko")
+    await asyncio.gather(*brave._prefetches.values())
+    assert calls == [{"count": 10, "offset": 0}, {"count": 10, "offset": 1}]
+
+    page, source = await brave.get_page("query", 10, 1, "KR", "ko", prefetch=False)
+    assert source == "cache"
+    assert result_numbers(page["results"]) == list(range(10, 20))
+    assert brave.prefetch_stats["completed"] == 1
+    assert brave.prefetch_stats["hits"] == 1
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_request_joins_prefetch_in_flight(use_transport):
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls, delay=0.05))
+
+    await brave.get_page("query", 10, 0, "KR", "ko")
+    assert len(brave._prefetches) == 1
+    # 선행 조회가 대기열을 통과해 요청을 보낸 뒤에 같은 페이지를 요청하면 그 결과를 기다립니다
+    while not brave._prefetches_sent:
+        await asyncio.sleep(0.001)
+    page, source = await brave.get_page("query", 10, 1, "KR", "ko", prefetch=False)
+    assert source == "prefetch"
+    assert result_numbers(page["results"]) == list(range(10, 20))
+    assert brave.prefetch_stats["joined"] == 1
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_queued_prefetch_is_superseded_by_interactive_request(use_transport):
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    await brave.get_page("query", 10, 0, "KR", "ko")
+    # 초당 창이 소진되어 선행 조회가 대기열에서 백그라운드 우선순위로 기다리는 동안
+    window = brave.rate_limiter.windows[0]
+    window.remaining, window.reset_at = 0, time.monotonic() + 0.1
+    await asyncio.sleep(0)
+    assert brave.rate_limiter.queue_depth() == 1
+
+    # 같은 페이지를 요청하면 선행 조회를 취소하고 대화형 우선순위로 한 번만 요청합니다
+    page, source = await brave.get_page("query", 10, 1, "KR", "ko", prefetch=False)
+    assert source == "api"
+    assert result_numbers(page["results"]) == list(range(10, 20))
+    assert calls == [{"count": 10, "offset": 0}, {"count": 10, "offset": 1}]
+    assert brave.prefetch_stats["superseded"] == 1
+    assert brave.prefetch_stats["dropped"] == 0
+    assert brave._prefetches == {}
+    assert brave.rate_limiter.queue_depth() == 0
+    assert brave.rate_limiter.in_flight == 0
+
+
+def test_spare_capacity_keeps_a_per_second_slot_for_interactive_requests():
+    limiter = brave.BraveRateLimiter(per_second=2)
+    assert limiter.has_spare_capacity()
+    limiter.windows[0].remaining = 1
+    assert not limiter.has_spare_capacity()
+    # 초당 창이 리셋되면 다시 여유가 생깁니다
+    limiter.windows[0].reset_at = time.monotonic() - 0.01
+    assert limiter.has_spare_capacity()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_skipped_when_per_second_window_is_spent(use_transport, monkeypatch):
+    monkeypatch.setattr(brave, "rate_limiter", brave.BraveRateLimiter(per_second=1))
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    await brave.get_page("query", 10, 0, "KR", "ko")
+    assert brave._prefetches == {}
+    assert brave.prefetch_stats["skipped_budget"] == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_prefetch_skipped_when_long_window_is_low(use_transport):
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+    brave.rate_limiter.windows.append(brave.RateLimitWindow(1000, 2592000))
+    brave.rate_limiter.windows[1].remaining = 100
+
+    await brave.get_page("query", 10, 0, "KR", "ko")
+    assert brave._prefetches == {}
+    assert brave.prefetch_stats["skipped_budget"] == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_prefetch_not_scheduled_on_last_page(use_transport):
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls, total=15))
+
+    page, _ = await brave.get_page("query", 10, 1, "KR", "ko")
+    assert page["more_results_available"] is False
+    assert brave._prefetches == {}
+    assert brave.prefetch_stats["scheduled"] == 0
+
+
+# --- 20개를 넘는 결과 수: 여러 API 페이지 동시 요청과 offset 창 ---
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count, offset, pages", [
+    (10, 0, [0]),
+    (10, 3, [3]),
+    (30, 0, [0, 1]),
+    (30, 1, [1, 2]),
+    (45, 0, [0, 1, 2]),
+    (45, 1, [2, 3, 4]),
+    (60, 1, [3, 4, 5]),
+])
+async def test_brave_search_returns_offset_window(use_transport, monkeypatch, count, offset, pages):
+    monkeypatch.setattr(brave, "PREFETCH_ENABLED", False)
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    response = await brave.brave_search("query", count=count, offset=offset)
+    assert "error" not in response
+    assert result_numbers(response["results"]) == list(range(offset * count, (offset + 1) * count))
+    assert sorted(call["offset"] for call in calls) == pages
+    assert [page["offset"] for page in response["search_metadata"]["pages"]] == pages
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_clipped_to_last_api_page(use_transport, monkeypatch):
+    monkeypatch.setattr(brave, "PREFETCH_ENABLED", False)
+    calls: List[Dict[str, int]] = []
+    use_transport(results_handler(calls))
+
+    response = await brave.brave_search("query", count=45, offset=4)
+    assert result_numbers(response["results"]) == list(range(180, 200))
+    assert sorted(call["offset"] for call in calls) == [9]
+
+    response = await brave.brave_search("query", count=45, offset=5)
+    assert response["results"] == []
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_fan_out_dedupes_urls_and_keeps_partial_results(use_transport, monkeypatch):
+    monkeypatch.setattr(brave, "PREFETCH_ENABLED", False)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        offset = int(request.url.params["offset"])
+        if offset == 2:
+            return httpx.Response(500)
+        # 두 번째 페이지의 첫 결과는 첫 페이지 마지막 결과와 같은 URL입니다 (끝의 / 차이만 있음)
+        start = offset * 20 - offset
+        results = [{"title": "", "url": f"https://example.com/{start + index}/"} for index in range(20)]
+        return httpx.Response(200, json={"web": {"results": results}})
+
+    use_transport(handler)
+    response = await brave.brave_search("query", count=60)
+    assert result_numbers(response["results"]) == list(range(39))
+    assert [page["offset"] for page in response["search_metadata"]["pages"]] == [0, 1]
+    assert "error" in response
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+DuckDuckGo 검색 결과 파서 백엔드 벤치마크
+
+fixtures/ 의 저장된 Lite/대안 검색 페이지를 각 파서 백엔드로 파싱하여
+페이지별 파싱 시간과 최대 메모리 할당량을 비교하고, 모든 백엔드가 같은 결과를 내는지 확인합니다.
+
+사용법:
+    uv run python bench_parsers.py [--iterations 200] [--max-results 30]
+
+참고: 메모리 할당량은 tracemalloc으로 측정하므로 파이썬 힙 할당만 집계됩니다.
+lxml처럼 C 라이브러리 내부에서 할당하는 메모리는 포함되지 않습니다.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from duckduckgo_mcp_server import PARSER_BACKENDS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (페이지 이름, 픽스처 파일, 파서 메서드)
+PAGES = [
+    ("lite", "lite.html", "parse_lite"),
+    ("fallback", "fallback.html", "parse_fallback"),
+]
+
+
+def measure_time(parse, html, max_results, iterations):
+    """파싱 1회당 소요 시간(ms)의 중앙값과 평균을 반환합니다."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        parse(html, max_results)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), statistics.mean(samples)
+
+
+def measure_allocations(parse, html, max_results):
+    """파싱 1회 동안 파이썬 힙에 할당된 최대 메모리(KiB)를 반환합니다."""
+    tracemalloc.start()
+    try:
+        parse(html, max_results)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DuckDuckGo 파서 백엔드 벤치마크")
+    parser.add_argument("--iterations", type=int, default=200, help="페이지별 반복 횟수 (기본값: 200)")
+    parser.add_argument("--max-results", type=int, default=30, help="파싱할 최대 결과 수 (기본값: 30)")
+    args = parser.parse_args()
+
+    backends = {}
+    for name, factory in PARSER_BACKENDS.items():
+        try:
+            backends[name] = factory()
+        except ImportError as e:
+            print(f"⚠️  {name} 백엔드를 건너뜁니다: {e}")
+
+    print(f"🧪 파서 벤치마크 (반복 {args.iterations}회, 최대 결과 {args.max_results}개)\n")
+    print(f"{'페이지':<10}{'백엔드':<8}{'결과':>6}{'중앙값(ms)':>12}{'평균(ms)':>10}{'최대 할당(KiB)':>16}")
+
+    mismatches = []
+    for page, filename, method in PAGES:
+        with open(os.path.join(FIXTURE_DIR, filename), encoding="utf-8") as f:
+            html = f.read()
+
+        outputs = {}
+        for name, backend in backends.items():
+            parse = getattr(backend, method)
+            outputs[name] = parse(html, args.max_results)
+            median_ms, mean_ms = measure_time(parse, html, args.max_results, args.iterations)
+            peak_kib = measure_allocations(parse, html, args.max_results)
+            print(
+                f"{page:<10}{name:<8}{len(outputs[name]):>6}{median_ms:>12.3f}{mean_ms:>10.3f}"
+                f"{peak_kib:>16.1f}"
+            )
+
+        reference_name, reference = next(iter(outputs.items()))
+        for name, output in outputs.items():
+            if output != reference:
+                mismatches.append((page, reference_name, name))
+
+    # Lite 다음 페이지 폼 파라미터도 모든 백엔드에서 같아야 합니다
+    with open(os.path.join(FIXTURE_DIR, "lite.html"), encoding="utf-8") as f:
+        html = f.read()
+    next_params = {name: backend.lite_page(html, args.max_results)[0] for name, backend in backends.items()}
+    reference_name, reference = next(iter(next_params.items()))
+    for name, params in next_params.items():
+        if params != reference:
+            mismatches.append(("lite 다음 페이지", reference_name, name))
+
+    print()
+    if mismatches:
+        for page, expected, actual in mismatches:
+            print(f"❌ {page}: {actual} 결과가 {expected} 결과와 다릅니다")
+        sys.exit(1)
+    print(f"✅ 모든 백엔드가 동일한 결과를 반환했습니다 ({', '.join(backends)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,1493 @@
+import abc
 import asyncio
+import bisect
+import functools
 import json
+import logging
+import os
 import random
-from typing import List, Dict, Any, Optional
-from mcp.server.fastmcp import FastMCP
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Iterator, List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+from mcp.server.fastmcp import Context, FastMCP
 import httpx
 from bs4 import BeautifulSoup
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+try:
+    import h2  # noqa: F401  (httpx[http2] 설치 여부 확인용)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
 
 # FastMCP 인스턴스를 생성 (포트 11005 사용)
 mcp = FastMCP("DuckDuckGo Search MCP Server", host="0.0.0.0", port=11005)
 
+# HTTP 연결 풀 설정 (환경변수로 조정 가능)
+HTTP_MAX_CONNECTIONS = int(os.getenv("DDG_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DDG_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DDG_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("DDG_HTTP2", "1") == "1" and HTTP2_AVAILABLE
 
-class DuckDuckGoSearcher:
-    """DuckDuckGo 검색을 위한 클래스"""
+# 업스트림 호스트별 요청 속도 설정 (초당 요청 수 / 버스트 크기 / 최저 속도)
+RATE_LIMIT_PER_SECOND = float(os.getenv("DDG_RATE_LIMIT_PER_SECOND", "1.0"))
+RATE_LIMIT_BURST = float(os.getenv("DDG_RATE_LIMIT_BURST", "3"))
+RATE_LIMIT_MIN_PER_SECOND = float(os.getenv("DDG_RATE_LIMIT_MIN_PER_SECOND", "0.1"))
+
+# 검색 결과 캐시 설정 (TTL 단위: 초)
+CACHE_MAX_ENTRIES = int(os.getenv("DDG_CACHE_MAX_ENTRIES", "1024"))
+CACHE_WEB_TTL = float(os.getenv("DDG_CACHE_WEB_TTL", "600"))
+CACHE_INSTANT_TTL = float(os.getenv("DDG_CACHE_INSTANT_TTL", "3600"))
+CACHE_NEGATIVE_TTL = float(os.getenv("DDG_CACHE_NEGATIVE_TTL", "60"))
+CACHE_STALE_TTL = float(os.getenv("DDG_CACHE_STALE_TTL", "1800"))
+
+# 디스크 캐시 설정 (memory 또는 sqlite)
+# sqlite 백엔드는 여러 서버 프로세스와 재시작 사이에서 캐시를 공유합니다
+CACHE_BACKEND = os.getenv("DDG_CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("DDG_CACHE_SQLITE_PATH", "duckduckgo_cache.sqlite3")
+CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("DDG_CACHE_SQLITE_MAX_ENTRIES", "50000"))
+CACHE_FLUSH_INTERVAL = float(os.getenv("DDG_CACHE_FLUSH_INTERVAL", "1.0"))
+
+# 헤지 요청 설정: Lite 응답이 HEDGE_DELAY초 안에 오지 않으면 대안 검색을 함께 시작하고,
+# 한 검색어 전체는 SEARCH_DEADLINE초 안에 끝냅니다
+HEDGE_DELAY = float(os.getenv("DDG_HEDGE_DELAY", "1.5"))
+SEARCH_DEADLINE = float(os.getenv("DDG_SEARCH_DEADLINE", "20"))
+
+# Lite 다중 페이지 설정 (최대 페이지 수 / 첫 페이지의 예상 결과 수)
+LITE_MAX_PAGES = int(os.getenv("DDG_LITE_MAX_PAGES", "5"))
+LITE_PAGE_SIZE = int(os.getenv("DDG_LITE_PAGE_SIZE", "30"))
+
+# 엔드포인트별 서킷 브레이커 설정
+# 최근 BREAKER_WINDOW건 중 BREAKER_MIN_REQUESTS건 이상이 쌓였고 실패율이 BREAKER_FAILURE_RATIO 이상이면 차단합니다
+BREAKER_WINDOW = int(os.getenv("DDG_BREAKER_WINDOW", "20"))
+BREAKER_MIN_REQUESTS = int(os.getenv("DDG_BREAKER_MIN_REQUESTS", "5"))
+BREAKER_FAILURE_RATIO = float(os.getenv("DDG_BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("DDG_BREAKER_COOLDOWN", "30"))
+BREAKER_MAX_COOLDOWN = float(os.getenv("DDG_BREAKER_MAX_COOLDOWN", "300"))
+
+# 검색 결과 페이지 읽기(search_and_read) 설정
+READ_TIMEOUT = float(os.getenv("DDG_READ_TIMEOUT", "8"))
+READ_MAX_TOP_N = int(os.getenv("DDG_READ_MAX_TOP_N", "10"))
+READ_MAX_BYTES_LIMIT = int(os.getenv("DDG_READ_MAX_BYTES_LIMIT", "2000000"))
+
+# 본문을 추출할 수 있는 페이지 콘텐츠 타입
+READABLE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# 연합 검색(search_federated) 설정
+# BRAVE_API_KEY가 없으면 DuckDuckGo 결과만 사용합니다
+BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
+BRAVE_API_URL = os.getenv("BRAVE_API_URL", "https://api.search.brave.com/res/v1/web/search")
+BRAVE_COUNTRY = os.getenv("BRAVE_COUNTRY", "KR")
+BRAVE_LANGUAGE = os.getenv("BRAVE_LANGUAGE", "ko")
+FEDERATED_BACKEND_TIMEOUT = float(os.getenv("DDG_FEDERATED_BACKEND_TIMEOUT", "8"))
+FEDERATED_DEADLINE = float(os.getenv("DDG_FEDERATED_DEADLINE", "10"))
+# 첫 백엔드가 결과를 돌려준 뒤 나머지 백엔드를 더 기다리는 시간 (초)
+FEDERATED_GRACE = float(os.getenv("DDG_FEDERATED_GRACE", "0.5"))
+# Reciprocal Rank Fusion 상수 (score = Σ 1 / (k + 순위))
+RRF_K = int(os.getenv("DDG_RRF_K", "60"))
+
+# 단계별 지연 시간 계측 설정
+# DDG_SLOW_QUERY_MS보다 오래 걸린 도구 호출은 단계별 소요 시간과 함께 기록합니다 (0이면 비활성화)
+SLOW_QUERY_MS = float(os.getenv("DDG_SLOW_QUERY_MS", "0"))
+# 느린 쿼리 로그 파일 경로 (비어 있으면 로거로 표준 에러에 기록)
+SLOW_QUERY_LOG = os.getenv("DDG_SLOW_QUERY_LOG", "")
+# 히스토그램 버킷 상한 (초)
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+# 배치 검색 설정 (동시 실행 수 / 한 번에 받을 수 있는 최대 검색어 수)
+BATCH_CONCURRENCY = int(os.getenv("DDG_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUERIES = int(os.getenv("DDG_BATCH_MAX_QUERIES", "50"))
+
+# 검색 결과 HTML 파서 백엔드 ('lxml' 또는 'bs4')
+HTML_PARSER = os.getenv("DDG_HTML_PARSER", "lxml")
+
+# 검색 지역 (DuckDuckGo kl 파라미터)
+SEARCH_REGION = os.getenv("DDG_REGION", "kr-kr")
+
+# 스트리밍 모드에서 파싱된 결과를 하나씩 전달받는 콜백
+ResultCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# 봇 차단/이상 트래픽 페이지를 식별하는 문자열
+BLOCK_PAGE_MARKERS = (
+    'anomaly-modal',
+    'Unfortunately, bots use DuckDuckGo too',
+    'If this error persists',
+)
+
+
+# URL 정규화 시 제거할 추적용 쿼리 파라미터
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'msclkid')
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    max_results: int,
+    k: int = RRF_K,
+) -> List[Dict[str, Any]]:
+    """백엔드별 순위 목록을 Reciprocal Rank Fusion으로 합칩니다.
+    
+    결과는 정규화된 URL로 묶이며, 점수는 각 백엔드에서의 1 / (k + 순위)의 합입니다.
+    제목/설명은 가장 높은 순위로 나온 백엔드의 것을 쓰되, 설명이 없으면 다른 백엔드의 설명으로 채웁니다.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for backend, results in rankings.items():
+        for rank, result in enumerate(results, start=1):
+            canonical = canonicalize_url(result['url'])
+            entry = merged.get(canonical)
+            if entry is None:
+                entry = merged[canonical] = {
+                    'title': result['title'],
+                    'url': result['url'],
+                    'description': result.get('description', ''),
+                    'score': 0.0,
+                    'ranks': {},
+                    '_best_rank': rank,
+                }
+            elif backend in entry['ranks']:
+                # 같은 백엔드 안의 중복은 더 높은 순위만 반영합니다
+                continue
+            else:
+                if rank < entry['_best_rank']:
+                    entry.update({'title': result['title'], 'url': result['url'], '_best_rank': rank})
+                    if result.get('description'):
+                        entry['description'] = result['description']
+                if entry['description'] in ('', '설명 없음') and result.get('description'):
+                    entry['description'] = result['description']
+            entry['ranks'][backend] = rank
+            entry['score'] += 1.0 / (k + rank)
+    
+    fused = sorted(merged.values(), key=lambda entry: (-entry['score'], entry['_best_rank']))
+    for entry in fused:
+        del entry['_best_rank']
+        entry['score'] = round(entry['score'], 6)
+        entry['sources'] = list(entry['ranks'])
+    return fused[:max_results]
+
+
+def parse_rate_limit_header(value: Optional[str]) -> List[float]:
+    """'1, 15000' 형식의 X-RateLimit-* 헤더 값을 숫자 목록으로 변환합니다 (창별 값, 짧은 창부터)."""
+    if not value:
+        return []
+    try:
+        return [float(part) for part in value.split(',')]
+    except ValueError:
+        return []
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 헤더(초 또는 HTTP 날짜)를 기다려야 하는 시간(초)으로 변환합니다."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def canonicalize_url(url: str) -> str:
+    """중복 판별용 정규화 URL을 반환합니다.
+    
+    스킴/호스트 대소문자, www. 접두사, 기본 포트, 프래그먼트, 끝의 슬래시, 추적용 파라미터 차이를 무시합니다.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = '&'.join(
+        pair for pair in parts.query.split('&')
+        if pair and not pair.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip('/') or '/'
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+class Histogram:
+    """Prometheus 형식의 고정 버킷 히스토그램"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = METRIC_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+    
+    def render(self, name: str, labels: str) -> List[str]:
+        """누적 버킷, 합계, 개수를 exposition 형식의 줄 목록으로 반환합니다."""
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class QueryTrace:
+    """도구 호출 하나의 단계별 누적 소요 시간 (느린 쿼리 로그용)
+    
+    헤지 요청처럼 동시에 진행되는 단계는 각각 집계되므로 단계 합이 전체 시간보다 클 수 있습니다.
+    """
+    
+    def __init__(self, tool: str, query: Any):
+        self.tool = tool
+        self.query = query
+        self.stages: Dict[str, float] = {}
+    
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+# 현재 도구 호출의 추적 정보 (asyncio 작업은 생성 시점의 컨텍스트를 물려받습니다)
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar('ddg_query_trace', default=None)
+
+
+class PipelineMetrics:
+    """검색 파이프라인의 단계별 지연 시간 히스토그램
+    
+    단계(stage)는 rate_limit_wait(속도 제한 대기), network(업스트림 응답 수신), parse(HTML/JSON 파싱),
+    cache_lookup(캐시 조회), serialize(응답 JSON 직렬화)이며, 엔드포인트별로 나누어 기록합니다.
+    도구 호출 전체 시간은 도구별로 따로 기록하고, 느린 호출은 단계별 내역을 로그로 남깁니다.
+    """
+    
+    def __init__(
+        self,
+        buckets: Tuple[float, ...] = METRIC_BUCKETS,
+        slow_query_ms: float = SLOW_QUERY_MS,
+        slow_query_log: str = SLOW_QUERY_LOG,
+    ):
+        self.buckets = buckets
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self._stages: Dict[Tuple[str, str], Histogram] = {}
+        self._tools: Dict[str, Histogram] = {}
+        self.slow_queries = 0
+    
+    def observe(self, stage: str, seconds: float, endpoint: str = '') -> None:
+        """단계 소요 시간을 히스토그램과 현재 도구 호출의 추적 정보에 기록합니다."""
+        histogram = self._stages.get((stage, endpoint))
+        if histogram is None:
+            histogram = self._stages[(stage, endpoint)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(f"{stage}:{endpoint}" if endpoint else stage, seconds)
+    
+    @contextmanager
+    def span(self, stage: str, endpoint: str = '') -> Iterator[None]:
+        """with 블록의 실행 시간을 단계 소요 시간으로 기록합니다."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, endpoint)
+    
+    def timed_iter(
+        self,
+        items: Iterator[Any],
+        stage: str,
+        endpoint: str = '',
+        elapsed: float = 0.0,
+    ) -> Iterator[Any]:
+        """제너레이터 파서가 다음 항목을 만드는 데 쓴 시간만 합산하여 한 번 기록합니다.
+        
+        소비자가 항목 사이에 기다리는 시간(스트리밍 전송 등)은 포함하지 않습니다.
+        elapsed에는 이터레이터를 만들기 전에 이미 쓴 파싱 시간(트리 생성 등)을 넘길 수 있습니다.
+        """
+        items = iter(items)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(items)
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield item
+        except StopIteration:
+            return
+        finally:
+            self.observe(stage, elapsed, endpoint)
+    
+    def traced_tool(self, tool: str) -> Callable:
+        """도구 함수의 전체 실행 시간을 기록하고 느린 호출의 단계별 내역을 로그로 남기는 데코레이터"""
+        def decorator(fn: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> str:
+                query = kwargs.get('query', kwargs.get('queries', args[0] if args else None))
+                trace = QueryTrace(tool, query)
+                token = _current_trace.set(trace)
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    _current_trace.reset(token)
+                    histogram = self._tools.get(tool)
+                    if histogram is None:
+                        histogram = self._tools[tool] = Histogram(self.buckets)
+                    histogram.observe(elapsed)
+                    if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+                        self._log_slow_query(trace, elapsed)
+            return wrapper
+        return decorator
+    
+    def _log_slow_query(self, trace: QueryTrace, elapsed: float) -> None:
+        self.slow_queries += 1
+        line = json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'tool': trace.tool,
+            'query': trace.query,
+            'total_ms': round(elapsed * 1000, 1),
+            'stages_ms': {stage: round(seconds * 1000, 1) for stage, seconds in sorted(trace.stages.items())},
+        }, ensure_ascii=False)
+        if not self.slow_query_log:
+            logger.warning("느린 쿼리: %s", line)
+            return
+        try:
+            with open(self.slow_query_log, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            logger.warning("느린 쿼리 로그 기록 중 오류: %s", e)
+    
+    def render(self) -> List[str]:
+        """단계/도구별 히스토그램을 Prometheus exposition 형식의 줄 목록으로 반환합니다."""
+        lines = [
+            '# HELP ddg_stage_duration_seconds Duration of each search pipeline stage.',
+            '# TYPE ddg_stage_duration_seconds histogram',
+        ]
+        for (stage, endpoint), histogram in sorted(self._stages.items()):
+            lines.extend(histogram.render(
+                'ddg_stage_duration_seconds', f'stage="{stage}",endpoint="{endpoint}"'
+            ))
+        lines.extend([
+            '# HELP ddg_tool_duration_seconds Total duration of each MCP tool call.',
+            '# TYPE ddg_tool_duration_seconds histogram',
+        ])
+        for tool, histogram in sorted(self._tools.items()):
+            lines.extend(histogram.render('ddg_tool_duration_seconds', f'tool="{tool}"'))
+        lines.extend([
+            '# HELP ddg_slow_queries_total Tool calls slower than DDG_SLOW_QUERY_MS.',
+            '# TYPE ddg_slow_queries_total counter',
+            f'ddg_slow_queries_total {self.slow_queries}',
+        ])
+        return lines
+
+
+class TokenBucket:
+    """적응형 토큰 버킷
+    
+    토큰이 남아 있으면 즉시 통과시키고, 부족하면 호출자마다 다음 토큰 시점을 예약하여
+    동시에 몰린 요청을 일정한 간격으로 흘려보냅니다. 업스트림 오류 시 속도를 절반으로 줄이고
+    (multiplicative decrease), 성공할 때마다 기본 속도까지 조금씩 회복합니다 (additive increase).
+    """
+    
+    def __init__(self, rate: float, burst: float, min_rate: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.waits = 0
+        self.penalties = 0
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def reserve(self) -> float:
+        """토큰 하나를 예약하고 기다려야 하는 시간(초)을 반환합니다."""
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        self.waits += 1
+        return -self.tokens / self.rate
+    
+    def penalize(self) -> None:
+        """오류/차단 응답 시 속도를 낮추고 남은 버스트를 비웁니다."""
+        self._refill()
+        self.penalties += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+    
+    def reward(self) -> None:
+        """정상 응답 시 기본 속도 쪽으로 천천히 회복합니다."""
+        self._refill()
+        self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class HostRateLimiter:
+    """업스트림 호스트별 토큰 버킷을 관리하는 속도 제한기"""
+    
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: float = RATE_LIMIT_BURST,
+        min_rate: float = RATE_LIMIT_MIN_PER_SECOND,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+    
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst, self.min_rate)
+        return bucket
+    
+    async def acquire(self, host: str) -> None:
+        """호스트의 토큰을 얻을 때까지 대기합니다 (유휴 상태면 즉시 반환)."""
+        delay = self._bucket(host).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def penalize(self, host: str) -> None:
+        self._bucket(host).penalize()
+    
+    def set_rate(self, host: str, rate: float) -> None:
+        """업스트림이 알려 준 한도로 호스트의 기본 속도를 바꿉니다 (감속 중이면 감속 상태 유지)."""
+        bucket = self._bucket(host)
+        bucket._refill()
+        bucket.base_rate = rate
+        bucket.rate = min(bucket.rate, rate)
+        bucket.burst = min(bucket.burst, max(1.0, rate))
+    
+    def reward(self, host: str) -> None:
+        self._bucket(host).reward()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """호스트별 현재 속도와 대기/감속 횟수를 반환합니다."""
+        stats = {}
+        for host, bucket in self._buckets.items():
+            bucket._refill()
+            stats[host] = {
+                'rate_per_second': round(bucket.rate, 3),
+                'base_rate_per_second': bucket.base_rate,
+                'tokens': round(bucket.tokens, 3),
+                'waits': bucket.waits,
+                'penalties': bucket.penalties,
+            }
+        return stats
+
+
+class CircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 요청을 보내지 않았을 때 발생하는 예외"""
+    
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"{endpoint} 엔드포인트 차단 중 ({retry_in:.1f}초 후 재시도)")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """엔드포인트 하나의 서킷 브레이커
+    
+    최근 window건의 성공/실패와 지연 시간을 기록합니다. 실패율이 기준을 넘으면 열림(open)
+    상태가 되어 cooldown 동안 요청을 즉시 거절합니다. cooldown이 지나면 반열림(half_open)
+    상태에서 한 번에 하나의 실제 요청만 탐색(probe)으로 통과시키고, 성공하면 닫힘(closed)으로
+    돌아가며 실패하면 cooldown을 두 배로 늘려(최대 max_cooldown) 다시 엽니다.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_requests: int = BREAKER_MIN_REQUESTS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN,
+    ):
+        self.min_requests = min_requests
+        self.failure_ratio = failure_ratio
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        # (성공 여부, 지연 시간(초)) 최근 기록
+        self._outcomes: "deque[Tuple[bool, float]]" = deque(maxlen=window)
+        self.opens = 0
+        self.rejected = 0
+        self.probes = 0
+    
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+    
+    def available(self) -> bool:
+        """지금 요청을 보낼 수 있는지 확인합니다 (탐색 슬롯을 차지하지 않음)."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return self.retry_in() == 0
+        return not self.probing
+    
+    def allow(self) -> bool:
+        """요청 전에 호출합니다. 반열림 상태에서는 탐색 요청 하나만 통과시킵니다."""
+        if self.state == self.OPEN and self.retry_in() == 0:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+    
+    def release(self) -> None:
+        """결과 없이 끝난 요청(취소 등)의 탐색 슬롯을 반환합니다."""
+        self.probing = False
+    
+    def hold(self, seconds: float) -> None:
+        """업스트림이 알려 준 시간(한도 리셋, Retry-After) 동안 실패율과 무관하게 엽니다."""
+        if self.state == self.OPEN and self.retry_in() >= seconds:
+            return
+        self.probing = False
+        self._open(seconds)
+    
+    def record(self, ok: bool, latency: float) -> None:
+        """요청 결과를 기록하고 상태를 전이합니다."""
+        self._outcomes.append((ok, latency))
+        if self.state == self.HALF_OPEN:
+            self.probing = False
+            if ok:
+                self.state = self.CLOSED
+                self.cooldown = self.base_cooldown
+                # 열리기 전의 실패 기록은 버리고 탐색 결과부터 다시 집계합니다
+                self._outcomes.clear()
+                self._outcomes.append((ok, latency))
+            else:
+                self._open(min(self.max_cooldown, self.cooldown * 2))
+        elif self.state == self.CLOSED and not ok:
+            failures = sum(1 for success, _ in self._outcomes if not success)
+            if (
+                len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.failure_ratio
+            ):
+                self._open(self.base_cooldown)
+    
+    def _open(self, cooldown: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.cooldown = cooldown
+        self.opens += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """현재 상태와 최근 실패율/지연 시간 통계를 반환합니다."""
+        latencies = sorted(latency for _, latency in self._outcomes)
+        failures = sum(1 for success, _ in self._outcomes if not success)
+        
+        def percentile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1)
+        
+        return {
+            'state': self.state,
+            'samples': len(self._outcomes),
+            'failure_rate': round(failures / len(self._outcomes), 4) if self._outcomes else 0.0,
+            'latency_p50_ms': percentile(0.5),
+            'latency_p95_ms': percentile(0.95),
+            'retry_in_seconds': round(self.retry_in(), 1) if self.state == self.OPEN else 0.0,
+            'opens': self.opens,
+            'probes': self.probes,
+            'rejected': self.rejected,
+        }
+
+
+class EndpointBreakers:
+    """엔드포인트 이름별 서킷 브레이커를 관리합니다."""
+    
+    def __init__(self, **breaker_options: Any):
+        self._options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+    
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(**self._options)
+        return breaker
+    
+    def available(self, endpoint: str) -> bool:
+        return self.get(endpoint).available()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {endpoint: breaker.get_stats() for endpoint, breaker in self._breakers.items()}
+
+
+class SearchCache:
+    """TTL + LRU 검색 결과 캐시
+    
+    항목은 만료 시각(expires_at)까지 신선(fresh)하고, 그 뒤 stale_ttl 동안은 오래된(stale)
+    상태로 보관되어 백그라운드 갱신이 끝날 때까지 대신 응답합니다. max_entries를 넘으면
+    가장 오래 사용되지 않은 항목부터 제거합니다.
+    """
+    
+    FRESH = 'fresh'
+    STALE = 'stale'
+    
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, stale_ttl: float = CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """대소문자, 유니코드 표기, 연속 공백 차이를 무시하도록 검색어를 정규화합니다."""
+        return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
+    
+    async def start(self) -> None:
+        """메모리 캐시는 준비할 것이 없습니다."""
+    
+    async def close(self) -> None:
+        """메모리 캐시는 정리할 것이 없습니다."""
+    
+    async def lookup(self, key: Tuple[Any, ...]) -> Tuple[Optional[str], Any]:
+        """get()의 비동기 버전입니다. 디스크 백엔드는 메모리에 없는 항목을 디스크에서 읽어옵니다."""
+        return self.get(key)
+    
+    def get(self, key: Tuple[Any, ...]) -> Tuple[Optional[str], Any]:
+        """(상태, 값)을 반환합니다. 상태는 FRESH, STALE 또는 None(미스)입니다."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+        
+        expires_at, value = entry
+        now = time.monotonic()
+        if now >= expires_at + self.stale_ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None, None
+        
+        self._entries.move_to_end(key)
+        if now < expires_at:
+            self.hits += 1
+            return self.FRESH, value
+        self.stale_hits += 1
+        return self.STALE, value
+    
+    def set(self, key: Tuple[Any, ...], value: Any, ttl: float) -> None:
+        """값을 ttl초 동안 신선한 상태로 저장합니다."""
+        self._store(key, time.monotonic() + ttl, value)
+    
+    def _store(self, key: Tuple[Any, ...], expires_at: float, value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """캐시 적중률과 크기를 반환합니다."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SqliteSearchCache(SearchCache):
+    """SQLite(WAL 모드)에 영속화되는 2단계 검색 결과 캐시
+    
+    메모리 LRU 캐시를 앞단에 두고, 메모리에 없는 항목만 디스크에서 읽어옵니다.
+    여러 서버 프로세스가 같은 파일을 공유할 수 있도록 만료 시각은 벽시계 시간(time.time)으로 저장합니다.
+    
+    쓰기와 접근 시각 갱신은 버퍼에 모았다가 flush_interval마다 한 트랜잭션으로 기록하며,
+    디스크 입출력은 모두 asyncio.to_thread로 실행하여 이벤트 루프를 막지 않습니다.
+    기록할 때 오래된(stale 기간까지 지난) 항목을 지우고, disk_max_entries를 넘으면
+    가장 오래 접근하지 않은 항목부터 제거합니다.
+    """
+    
+    def __init__(
+        self,
+        path: str = CACHE_SQLITE_PATH,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        disk_max_entries: int = CACHE_SQLITE_MAX_ENTRIES,
+        stale_ttl: float = CACHE_STALE_TTL,
+        flush_interval: float = CACHE_FLUSH_INTERVAL,
+    ):
+        super().__init__(max_entries=max_entries, stale_ttl=stale_ttl)
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.flush_interval = flush_interval
+        # WAL 모드에서는 읽기와 쓰기가 서로를 막지 않으므로 연결을 분리합니다
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._pending_writes: Dict[str, Tuple[str, float]] = {}
+        self._pending_touches: Dict[str, float] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # 스레드에서 진행 중인 일괄 기록 (close()가 끝날 때까지 기다립니다)
+        self._flushing: Optional[asyncio.Future] = None
+        self.disk_hits = 0
+        self.disk_entries = 0
+        self.disk_evictions = 0
+        self.flushes = 0
+        self.flush_errors = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _open(self) -> None:
+        self._writer = self._connect()
+        self._writer.execute(
+            'CREATE TABLE IF NOT EXISTS search_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._writer.execute(
+            'CREATE INDEX IF NOT EXISTS search_cache_accessed_at ON search_cache (accessed_at)'
+        )
+        self._reader = self._connect()
+        self.disk_entries = self._writer.execute('SELECT COUNT(*) FROM search_cache').fetchone()[0]
+    
+    async def start(self) -> None:
+        """데이터베이스를 열고 주기적인 일괄 기록 작업을 시작합니다."""
+        if self._writer is None:
+            await asyncio.to_thread(self._open)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def close(self) -> None:
+        """남은 버퍼를 기록하고 데이터베이스를 닫습니다."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._writer is not None:
+            # 루프를 취소해도 스레드의 기록은 계속되므로, 끝날 때까지 기다린 뒤 남은 버퍼를 기록합니다
+            await self._wait_flushing()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"캐시 기록 중 오류: {e}")
+            for conn in (self._reader, self._writer):
+                conn.close()
+            self._reader = self._writer = None
+    
+    @staticmethod
+    def _encode_key(key: Tuple[Any, ...]) -> str:
+        return json.dumps(list(key), ensure_ascii=False)
+    
+    async def lookup(self, key: Tuple[Any, ...]) -> Tuple[Optional[str], Any]:
+        """메모리 캐시를 먼저 확인하고, 없으면 디스크에서 읽어 메모리 캐시에 올립니다."""
+        state, value = self.get(key)
+        encoded = self._encode_key(key)
+        if state is not None:
+            self._pending_touches[encoded] = time.time()
+            return state, value
+        if self._reader is None:
+            return None, None
+        
+        row = await asyncio.to_thread(self._read, encoded)
+        if row is None:
+            return None, None
+        value_json, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining + self.stale_ttl <= 0:
+            return None, None
+        
+        # get()에서 센 미스를 디스크 적중으로 바로잡습니다
+        self.misses -= 1
+        self.disk_hits += 1
+        value = json.loads(value_json)
+        self._store(key, time.monotonic() + remaining, value)
+        self._pending_touches[encoded] = time.time()
+        if remaining > 0:
+            self.hits += 1
+            return self.FRESH, value
+        self.stale_hits += 1
+        return self.STALE, value
+    
+    def _read(self, encoded: str) -> Optional[Tuple[str, float]]:
+        with self._reader_lock:
+            return self._reader.execute(
+                'SELECT value, expires_at FROM search_cache WHERE key = ?', (encoded,)
+            ).fetchone()
+    
+    def set(self, key: Tuple[Any, ...], value: Any, ttl: float) -> None:
+        """메모리 캐시에 저장하고 디스크 기록 버퍼에 추가합니다."""
+        super().set(key, value, ttl)
+        encoded = self._encode_key(key)
+        self._pending_writes[encoded] = (json.dumps(value, ensure_ascii=False), time.time() + ttl)
+        self._pending_touches.pop(encoded, None)
+    
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # 실패한 배치는 버퍼로 되돌아갔으므로 다음 주기에 다시 기록합니다
+                print(f"캐시 기록 중 오류: {e}")
+    
+    async def _wait_flushing(self) -> None:
+        """진행 중인 일괄 기록이 (성공이든 실패든) 끝날 때까지 기다립니다."""
+        if self._flushing is not None:
+            try:
+                await asyncio.shield(self._flushing)
+            except Exception:
+                pass
+    
+    async def flush(self) -> None:
+        """버퍼에 모인 쓰기/접근 시각 갱신을 한 트랜잭션으로 기록합니다.
+        
+        기록이 실패하거나 취소되면 배치를 버퍼로 되돌립니다 (그 사이 들어온 더 새로운 항목은 유지).
+        호출자가 취소되어도 스레드의 기록은 shield로 보호되어 끝까지 진행됩니다.
+        """
+        await self._wait_flushing()
+        if self._writer is None or not (self._pending_writes or self._pending_touches):
+            return
+        writes, self._pending_writes = self._pending_writes, {}
+        touches, self._pending_touches = self._pending_touches, {}
+        future = asyncio.ensure_future(asyncio.to_thread(self._write_batch, writes, touches))
+        future.add_done_callback(lambda done: self._finish_flush(done, writes, touches))
+        self._flushing = future
+        await asyncio.shield(future)
+    
+    def _finish_flush(
+        self,
+        future: asyncio.Future,
+        writes: Dict[str, Tuple[str, float]],
+        touches: Dict[str, float],
+    ) -> None:
+        if self._flushing is future:
+            self._flushing = None
+        if not future.cancelled() and future.exception() is None:
+            self.flushes += 1
+            return
+        self.flush_errors += 1
+        for key, entry in writes.items():
+            self._pending_writes.setdefault(key, entry)
+        for key, accessed_at in touches.items():
+            self._pending_touches[key] = max(accessed_at, self._pending_touches.get(key, accessed_at))
+    
+    def _write_batch(self, writes: Dict[str, Tuple[str, float]], touches: Dict[str, float]) -> None:
+        now = time.time()
+        with self._writer_lock:
+            conn = self._writer
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO search_cache (key, value, expires_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(key, value, expires_at, now) for key, (value, expires_at) in writes.items()],
+                )
+                conn.executemany(
+                    'UPDATE search_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?',
+                    [(accessed_at, key) for key, accessed_at in touches.items()],
+                )
+                conn.execute('DELETE FROM search_cache WHERE expires_at + ? < ?', (self.stale_ttl, now))
+                count = conn.execute('SELECT COUNT(*) FROM search_cache').fetchone()[0]
+                if count > self.disk_max_entries:
+                    evicted = conn.execute(
+                        'DELETE FROM search_cache WHERE key IN ('
+                        'SELECT key FROM search_cache ORDER BY accessed_at LIMIT ?)',
+                        (count - self.disk_max_entries,),
+                    ).rowcount
+                    self.disk_evictions += evicted
+                    count -= evicted
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        self.disk_entries = count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """메모리/디스크 캐시의 적중률과 크기를 반환합니다."""
+        stats = super().get_stats()
+        disk_bytes = 0
+        for suffix in ('', '-wal'):
+            try:
+                disk_bytes += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        stats.update({
+            'backend': 'sqlite',
+            'path': self.path,
+            'disk_hits': self.disk_hits,
+            'disk_entries': self.disk_entries,
+            'disk_max_entries': self.disk_max_entries,
+            'disk_evictions': self.disk_evictions,
+            'disk_bytes': disk_bytes,
+            'pending_writes': len(self._pending_writes),
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+        })
+        return stats
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> SearchCache:
+    """설정된 캐시 백엔드를 생성합니다."""
+    if backend == 'sqlite':
+        return SqliteSearchCache()
+    if backend != 'memory':
+        print(f"알 수 없는 캐시 백엔드 '{backend}', memory 백엔드를 사용합니다")
+    return SearchCache()
+
+
+class SingleFlight:
+    """동일한 키의 동시 요청을 하나의 진행 중 작업으로 합치는 도우미
+    
+    먼저 도착한 호출자가 작업을 시작하고, 같은 키로 뒤따르는 호출자는 그 결과를 함께 받습니다.
+    작업은 shield로 보호되므로 호출자 한 명이 취소되어도 나머지 호출자에게는 영향이 없습니다.
+    
+    fetch는 emit 콜백을 받아 중간 결과를 내보낼 수 있으며, on_item을 넘긴 호출자는
+    (늦게 합류했더라도 이미 내보낸 항목부터) 모든 중간 결과를 전달받습니다.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[Tuple[Any, ...], asyncio.Task] = {}
+        self._emitted: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._listeners: Dict[Tuple[Any, ...], List[ResultCallback]] = {}
+        self.executions = 0
+        self.coalesced = 0
+    
+    async def do(
+        self,
+        key: Tuple[Any, ...],
+        fetch: Callable[[ResultCallback], Awaitable[Any]],
+        on_item: Optional[ResultCallback] = None,
+    ) -> Any:
+        task = self._inflight.get(key)
+        replay: List[Any] = []
+        if task is not None:
+            self.coalesced += 1
+            if on_item is not None:
+                replay = list(self._emitted[key])
+        else:
+            self.executions += 1
+            self._emitted[key] = []
+            self._listeners[key] = []
+            task = asyncio.create_task(fetch(lambda item: self._emit(key, item)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._finish(key))
+        
+        listeners = self._listeners[key]
+        if on_item is not None:
+            listeners.append(on_item)
+        try:
+            for item in replay:
+                await on_item(item)
+            return await asyncio.shield(task)
+        finally:
+            if on_item in listeners:
+                listeners.remove(on_item)
+    
+    async def _emit(self, key: Tuple[Any, ...], item: Any) -> None:
+        """진행 중인 작업의 중간 결과를 기록하고 대기 중인 모든 호출자에게 전달합니다."""
+        self._emitted[key].append(item)
+        listeners = self._listeners[key]
+        for listener in list(listeners):
+            try:
+                await listener(item)
+            except Exception as e:
+                # 전달에 실패한 호출자(연결 종료 등)는 이후 전달 대상에서 제외합니다
+                logger.warning("중간 결과 전달 중 오류: %s", e)
+                if listener in listeners:
+                    listeners.remove(listener)
+    
+    def _finish(self, key: Tuple[Any, ...]) -> None:
+        self._inflight.pop(key, None)
+        self._emitted.pop(key, None)
+        self._listeners.pop(key, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """업스트림 실행 수와 합쳐진 호출 수를 반환합니다."""
+        total = self.executions + self.coalesced
+        return {
+            'in_flight': len(self._inflight),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+class ResultParser(abc.ABC):
+    """검색 결과 HTML 파서 백엔드의 기본 클래스
+    
+    parse_lite()는 DuckDuckGo Lite의 표(tr) 레이아웃을, parse_fallback()은 일반 검색 페이지의
+    결과 블록 레이아웃을 파싱하여 {'title', 'url', 'description'} 딕셔너리 목록을 반환합니다.
+    모든 백엔드는 같은 HTML에 대해 같은 결과를 반환해야 합니다.
+    
+    백엔드는 iter_lite()/iter_fallback() 제너레이터를 구현하며, 결과를 파싱하는 즉시 하나씩
+    내보내므로 스트리밍 모드에서 첫 결과를 페이지 전체 파싱 전에 전달할 수 있습니다.
+    """
+    
+    name = 'base'
+    
+    # 대안 검색 페이지에서 결과 블록을 찾는 셀렉터 (앞에서부터 처음으로 일치하는 것을 사용)
+    FALLBACK_SELECTORS = [
+        'article[data-testid="result"]',
+        'div[data-testid="result"]',
+        '.result',
+        '.web-result',
+        'div.result__body',
+        'li[data-layout="organic"]'
+    ]
+    
+    @abc.abstractmethod
+    def iter_lite(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        ...
+    
+    @abc.abstractmethod
+    def iter_fallback(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        ...
+    
+    @abc.abstractmethod
+    def lite_page(
+        self, html: str, max_results: int
+    ) -> Tuple[Optional[Dict[str, str]], Iterator[Dict[str, Any]]]:
+        """Lite 페이지를 한 번만 파싱하여 (다음 페이지 폼 파라미터, 결과 이터레이터)를 반환합니다.
+        
+        다음 페이지 파라미터를 결과보다 먼저 돌려주므로, 호출자는 현재 페이지를 파싱하는 동안
+        다음 페이지 요청을 미리 시작할 수 있습니다. 다음 페이지가 없으면 None입니다.
+        """
+    
+    # 본문 추출 시 제거하는 태그 (스크립트, 내비게이션, 광고성 영역 등)
+    NON_CONTENT_TAGS = (
+        'script', 'style', 'noscript', 'template', 'svg', 'iframe',
+        'nav', 'header', 'footer', 'aside', 'form', 'button', 'select',
+    )
+    # 줄바꿈으로 구분할 블록 태그
+    BLOCK_TAGS = (
+        'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'br', 'tr', 'table',
+        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'blockquote', 'dd', 'dt',
+    )
+    # 본문 후보 영역과, 후보로 인정할 최소 글자 수
+    MAIN_CONTENT_MIN_CHARS = 200
+    
+    @abc.abstractmethod
+    def extract_text(self, content: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+        """웹 페이지 HTML에서 (제목, 본문 텍스트)를 추출합니다.
+        
+        스크립트/내비게이션 등 본문이 아닌 영역을 제거하고, article/main 영역이 충분히 길면
+        그 영역만, 아니면 body 전체의 텍스트를 블록 단위 줄바꿈으로 반환합니다.
+        """
+    
+    @staticmethod
+    def _clean_lines(text: str) -> str:
+        """줄마다 연속 공백을 합치고 빈 줄을 제거합니다."""
+        lines = (' '.join(line.split()) for line in text.splitlines())
+        return '\n'.join(line for line in lines if line)
+    
+    def parse_lite(self, html: str, max_results: int) -> List[Dict[str, Any]]:
+        return list(self.iter_lite(html, max_results))
+    
+    def parse_fallback(self, html: str, max_results: int) -> List[Dict[str, Any]]:
+        return list(self.iter_fallback(html, max_results))
+
+
+class BeautifulSoupParser(ResultParser):
+    """BeautifulSoup(html.parser) 기반 파서 - 순수 파이썬, 추가 의존성 없음"""
+    
+    name = 'bs4'
+    
+    def iter_lite(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        # HTML 파싱
+        return self._iter_lite_rows(BeautifulSoup(html, 'html.parser'), max_results)
+    
+    def lite_page(
+        self, html: str, max_results: int
+    ) -> Tuple[Optional[Dict[str, str]], Iterator[Dict[str, Any]]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        next_params = None
+        for form in soup.find_all('form'):
+            submit = form.find('input', attrs={'type': 'submit'})
+            if submit and 'Next' in submit.get('value', ''):
+                next_params = {
+                    hidden['name']: hidden.get('value', '')
+                    for hidden in form.find_all('input', attrs={'type': 'hidden'})
+                    if hidden.get('name')
+                }
+                break
+        
+        return next_params, self._iter_lite_rows(soup, max_results)
+    
+    def _iter_lite_rows(self, soup: BeautifulSoup, max_results: int) -> Iterator[Dict[str, Any]]:
+        count = 0
+        
+        # DuckDuckGo Lite의 검색 결과 구조 파싱
+        result_elements = soup.find_all('tr')
+        
+        for element in result_elements:
+            try:
+                # 링크 찾기
+                link_elem = element.find('a', href=True)
+                if not link_elem:
+                    continue
+                    
+                url = link_elem.get('href', '')
+                if not url or url.startswith('/'):
+                    continue
+                    
+                title = link_elem.get_text(strip=True)
+                if not title:
+                    continue
+                
+                # 설명 찾기 (같은 행의 다른 td 또는 다음 행에서)
+                description = ""
+                
+                # 먼저 같은 행에서 설명 찾기
+                td_elements = element.find_all('td')
+                if len(td_elements) > 1:
+                    for td in td_elements[1:]:  # 첫 번째 td는 보통 링크
+                        desc_text = td.get_text(strip=True)
+                        if desc_text and desc_text != title:
+                            description = desc_text
+                            break
+                
+                # 다음 행에서도 설명 찾기
+                if not description:
+                    next_row = element.find_next_sibling('tr')
+                    if next_row:
+                        desc_elem = next_row.find('td')
+                        if desc_elem:
+                            desc_text = desc_elem.get_text(strip=True)
+                            # 링크가 아닌 텍스트만 설명으로 사용
+                            if desc_text and not next_row.find('a', href=True):
+                                description = desc_text
+                
+                if title and url:
+                    yield {
+                        'title': title,
+                        'url': url,
+                        'description': description or "설명 없음"
+                    }
+                    
+                    count += 1
+                    if count >= max_results:
+                        break
+                        
+            except Exception as e:
+                print(f"결과 파싱 중 오류: {e}")
+                continue
+    
+    def iter_fallback(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        # 기본적인 HTML 파싱 시도
+        soup = BeautifulSoup(html, 'html.parser')
+        count = 0
+        
+        # 다양한 셀렉터로 검색 결과 찾기
+        for selector in self.FALLBACK_SELECTORS:
+            elements = soup.select(selector)
+            if elements:
+                for element in elements[:max_results]:
+                    try:
+                        # 제목과 링크 찾기
+                        title_elem = element.select_one('h3 a, h2 a, .result__title a, a[data-testid="result-title-a"]')
+                        if not title_elem:
+                            continue
+                        
+                        title = title_elem.get_text(strip=True)
+                        url = title_elem.get('href', '')
+                        
+                        # 설명 찾기
+                        desc_elem = element.select_one('.result__snippet, [data-testid="result-snippet"], .snippet')
+                        description = desc_elem.get_text(strip=True) if desc_elem else "설명 없음"
+                        
+                        if title and url:
+                            yield {
+                                'title': title,
+                                'url': url,
+                                'description': description
+                            }
+                            count += 1
+                            
+                    except Exception as e:
+                        print(f"대안 파싱 중 오류: {e}")
+                        continue
+                
+                if count:
+                    break
+    
+    def extract_text(self, content: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+        soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+        title = ' '.join(soup.title.get_text().split()) if soup.title else ''
+        
+        for tag in soup.find_all(self.NON_CONTENT_TAGS):
+            tag.decompose()
+        for tag in soup.find_all(self.BLOCK_TAGS):
+            tag.insert_after('\n')
+        
+        for candidate in soup.find_all(['article', 'main']) + soup.find_all(attrs={'role': 'main'}):
+            text = candidate.get_text()
+            if len(text.strip()) >= self.MAIN_CONTENT_MIN_CHARS:
+                return title, self._clean_lines(text)
+        return title, self._clean_lines((soup.body or soup).get_text())
+
+
+def _xpath_has_class(name: str) -> str:
+    """CSS 클래스 셀렉터(.name)에 해당하는 XPath 조건식을 반환합니다."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+class LxmlParser(ResultParser):
+    """lxml(libxml2) 기반 파서
+    
+    C로 구현된 파서로 트리를 만들고, 미리 컴파일한 XPath로 결과 행/블록만 골라냅니다.
+    결과는 BeautifulSoupParser와 동일합니다 (bench_parsers.py로 검증).
+    """
+    
+    name = 'lxml'
     
     def __init__(self):
+        from lxml import etree, html as lxml_html
+        
+        self._etree = etree
+        self._lxml_html = lxml_html
+        # 링크가 있는 행만 결과 후보입니다 (링크 없는 행은 BeautifulSoup 파서도 건너뜁니다)
+        self._lite_rows = etree.XPath('//tr[.//a[@href]]')
+        self._first_link = etree.XPath('(.//a[@href])[1]')
+        self._cells = etree.XPath('.//td')
+        self._first_cell = etree.XPath('(.//td)[1]')
+        self._next_row = etree.XPath('following-sibling::tr[1]')
+        self._has_link = etree.XPath('boolean(.//a[@href])')
+        self._next_form = etree.XPath(
+            '//form[.//input[@type="submit" and contains(@value, "Next")]][1]'
+        )
+        self._hidden_inputs = etree.XPath('.//input[@type="hidden" and @name]')
+        # FALLBACK_SELECTORS와 같은 순서의 XPath
+        self._fallback_blocks = [
+            etree.XPath('//article[@data-testid="result"]'),
+            etree.XPath('//div[@data-testid="result"]'),
+            etree.XPath(f'//*[{_xpath_has_class("result")}]'),
+            etree.XPath(f'//*[{_xpath_has_class("web-result")}]'),
+            etree.XPath(f'//div[{_xpath_has_class("result__body")}]'),
+            etree.XPath('//li[@data-layout="organic"]'),
+        ]
+        self._fallback_title = etree.XPath(
+            '(.//h3//a | .//h2//a'
+            f' | .//*[{_xpath_has_class("result__title")}]//a'
+            ' | .//a[@data-testid="result-title-a"])[1]'
+        )
+        self._fallback_snippet = etree.XPath(
+            f'(.//*[{_xpath_has_class("result__snippet")}]'
+            ' | .//*[@data-testid="result-snippet"]'
+            f' | .//*[{_xpath_has_class("snippet")}])[1]'
+        )
+        self._title = etree.XPath('string((//title)[1])')
+        self._non_content = etree.XPath(
+            ' | '.join(f'//{tag}' for tag in self.NON_CONTENT_TAGS)
+        )
+        self._blocks = etree.XPath(' | '.join(f'//{tag}' for tag in self.BLOCK_TAGS))
+        self._main_candidates = etree.XPath('//article | //main | //*[@role="main"]')
+        self._body = etree.XPath('(//body)[1]')
+    
+    def _parse(self, html: str) -> Any:
+        if not html.strip():
+            return None
+        return self._lxml_html.document_fromstring(html)
+    
+    @staticmethod
+    def _text(element: Any) -> str:
+        """BeautifulSoup의 get_text(strip=True)와 같은 방식으로 텍스트를 추출합니다."""
+        return ''.join(
+            piece.strip() for piece in element.itertext() if piece.strip()
+        )
+    
+    def iter_lite(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        root = self._parse(html)
+        if root is None:
+            return iter(())
+        return self._iter_lite_rows(root, max_results)
+    
+    def lite_page(
+        self, html: str, max_results: int
+    ) -> Tuple[Optional[Dict[str, str]], Iterator[Dict[str, Any]]]:
+        root = self._parse(html)
+        if root is None:
+            return None, iter(())
+        
+        next_params = None
+        forms = self._next_form(root)
+        if forms:
+            next_params = {
+                hidden.get('name'): hidden.get('value', '')
+                for hidden in self._hidden_inputs(forms[0])
+            }
+        return next_params, self._iter_lite_rows(root, max_results)
+    
+    def _iter_lite_rows(self, root: Any, max_results: int) -> Iterator[Dict[str, Any]]:
+        count = 0
+        
+        for element in self._lite_rows(root):
+            link_elem = self._first_link(element)[0]
+            url = link_elem.get('href', '')
+            if not url or url.startswith('/'):
+                continue
+            
+            title = self._text(link_elem)
+            if not title:
+                continue
+            
+            # 설명 찾기 (같은 행의 다른 td 또는 다음 행에서)
+            description = ""
+            td_elements = self._cells(element)
+            for td in td_elements[1:]:
+                desc_text = self._text(td)
+                if desc_text and desc_text != title:
+                    description = desc_text
+                    break
+            
+            if not description:
+                next_rows = self._next_row(element)
+                if next_rows:
+                    desc_elems = self._first_cell(next_rows[0])
+                    if desc_elems:
+                        desc_text = self._text(desc_elems[0])
+                        if desc_text and not self._has_link(next_rows[0]):
+                            description = desc_text
+            
+            yield {
+                'title': title,
+                'url': url,
+                'description': description or "설명 없음"
+            }
+            count += 1
+            if count >= max_results:
+                break
+    
+    def iter_fallback(self, html: str, max_results: int) -> Iterator[Dict[str, Any]]:
+        root = self._parse(html)
+        if root is None:
+            return
+        count = 0
+        
+        for blocks in self._fallback_blocks:
+            elements = blocks(root)
+            if not elements:
+                continue
+            for element in elements[:max_results]:
+                title_elems = self._fallback_title(element)
+                if not title_elems:
+                    continue
+                
+                title = self._text(title_elems[0])
+                url = title_elems[0].get('href', '')
+                
+                desc_elems = self._fallback_snippet(element)
+                description = self._text(desc_elems[0]) if desc_elems else "설명 없음"
+                
+                if title and url:
+                    yield {
+                        'title': title,
+                        'url': url,
+                        'description': description
+                    }
+                    count += 1
+            
+            if count:
+                break
+    
+    def extract_text(self, content: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+        if not content.strip():
+            return '', ''
+        parser = self._lxml_html.HTMLParser(encoding=encoding) if encoding else None
+        root = self._lxml_html.document_fromstring(content, parser=parser)
+        title = ' '.join(self._title(root).split())
+        
+        for element in self._non_content(root):
+            # 제거되는 요소의 tail 텍스트는 본문이므로 보존합니다
+            element.drop_tree()
+        for element in self._blocks(root):
+            element.tail = '\n' + (element.tail or '')
+        
+        for candidate in self._main_candidates(root):
+            text = candidate.text_content()
+            if len(text.strip()) >= self.MAIN_CONTENT_MIN_CHARS:
+                return title, self._clean_lines(text)
+        body = self._body(root)
+        return title, self._clean_lines((body[0] if body else root).text_content())
+
+
+PARSER_BACKENDS: Dict[str, Callable[[], ResultParser]] = {
+    'bs4': BeautifulSoupParser,
+    'lxml': LxmlParser,
+}
+
+
+def get_parser(name: str = HTML_PARSER) -> ResultParser:
+    """이름에 해당하는 파서 백엔드를 생성합니다. lxml을 쓸 수 없으면 bs4로 대체합니다."""
+    factory = PARSER_BACKENDS.get(name, BeautifulSoupParser)
+    try:
+        return factory()
+    except ImportError:
+        print(f"{name} 파서를 사용할 수 없어 bs4 파서를 사용합니다.")
+        return BeautifulSoupParser()
+
+
+class DuckDuckGoSearcher:
+    """DuckDuckGo 검색을 위한 클래스
+    
+    하나의 httpx.AsyncClient를 공유하여 keep-alive/HTTP/2 연결을 재사용합니다.
+    start()/close()로 생명주기를 관리하며, start() 전에 호출되어도 클라이언트는 지연 생성됩니다.
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        breakers: Optional[EndpointBreakers] = None,
+        cache: Optional[SearchCache] = None,
+        region: str = SEARCH_REGION,
+        parser: Optional[ResultParser] = None,
+        metrics: Optional[PipelineMetrics] = None,
+    ):
         self.base_url = "https://duckduckgo.com"
         self.lite_url = "https://lite.duckduckgo.com/lite"
         self.user_agents = [
@@ -23,6 +1497,160 @@ class DuckDuckGoSearcher:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:121.0) Gecko/20100101 Firefox/121.0'
         ]
+        
+        # 공유 HTTP 클라이언트 설정
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # 연결 재사용 통계
+        self._request_count = 0
+        self._connections_opened = 0
+        
+        # 봇 탐지를 피하기 위한 호스트별 요청 속도 제한
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        
+        # 엔드포인트(lite/fallback/instant)별 서킷 브레이커
+        self.breakers = breakers or EndpointBreakers()
+        
+        # 검색 결과 HTML 파서 백엔드
+        self.parser = parser or get_parser()
+        
+        # 단계별 지연 시간 계측
+        self.metrics = metrics or PipelineMetrics()
+        
+        # 검색 결과 캐시와 진행 중인 백그라운드 갱신 작업
+        self.region = region
+        self.cache = cache or create_cache()
+        self._refresh_tasks: Dict[Tuple[Any, ...], asyncio.Task] = {}
+        
+        # 동일한 검색어의 동시 요청 합치기
+        self.single_flight = SingleFlight()
+        
+        # 헤지 요청 통계
+        self.hedge_stats = {
+            'searches': 0,
+            'hedged': 0,
+            'lite_skipped': 0,
+            'lite_wins': 0,
+            'fallback_wins': 0,
+            'no_results': 0,
+            'deadline_exceeded': 0,
+        }
+    
+    async def start(self) -> None:
+        """공유 HTTP 클라이언트를 생성하고 캐시 백엔드를 엽니다."""
+        await self.cache.start()
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                follow_redirects=True,
+            )
+    
+    async def close(self) -> None:
+        """백그라운드 갱신을 취소하고 캐시 백엔드와 공유 HTTP 클라이언트의 연결을 정리합니다."""
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        self._refresh_tasks.clear()
+        await self.cache.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """공유 HTTP 클라이언트를 반환합니다 (필요 시 생성)."""
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        return self._client
+    
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace 훅 - 새 TCP 연결이 열릴 때마다 집계합니다."""
+        if event_name == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+    
+    @staticmethod
+    def _is_blocked(response: httpx.Response) -> bool:
+        """차단/이상 트래픽 응답인지 확인합니다."""
+        if response.status_code in (202, 403, 429) or response.status_code >= 500:
+            return True
+        if 'html' in response.headers.get('content-type', ''):
+            text = response.text
+            return any(marker in text for marker in BLOCK_PAGE_MARKERS)
+        return False
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        endpoint: Optional[str] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """호스트별 속도 제한을 거쳐 공유 클라이언트로 요청을 보냅니다.
+        
+        응답 상태에 따라 해당 호스트의 요청 속도를 줄이거나 회복시킵니다.
+        endpoint를 지정하면 해당 엔드포인트의 서킷 브레이커가 열려 있을 때 CircuitOpenError를
+        즉시 발생시키고, 요청 결과와 지연 시간을 브레이커에 기록합니다.
+        """
+        breaker = self.breakers.get(endpoint) if endpoint else None
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(endpoint, breaker.retry_in())
+        
+        host = urlsplit(url).hostname or ''
+        label = endpoint or host
+        try:
+            with self.metrics.span('rate_limit_wait', label):
+                await self.rate_limiter.acquire(host)
+            
+            client = await self._get_client()
+            self._request_count += 1
+            started = time.monotonic()
+            try:
+                with self.metrics.span('network', label):
+                    response = await client.request(
+                        method,
+                        url,
+                        extensions={"trace": self._trace},
+                        **kwargs,
+                    )
+            except httpx.HTTPError:
+                self.rate_limiter.penalize(host)
+                if breaker is not None:
+                    breaker.record(False, time.monotonic() - started)
+                    breaker = None
+                raise
+            
+            ok = not self._is_blocked(response)
+            if ok:
+                self.rate_limiter.reward(host)
+            else:
+                self.rate_limiter.penalize(host)
+            if breaker is not None:
+                breaker.record(ok, time.monotonic() - started)
+                breaker = None
+            return response
+        finally:
+            # 취소 등으로 결과 없이 끝난 요청은 실패로 기록하지 않고 탐색 슬롯만 돌려줍니다
+            if breaker is not None:
+                breaker.release()
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """연결 재사용 통계를 반환합니다."""
+        reused = max(self._request_count - self._connections_opened, 0)
+        return {
+            'http2': self.http2,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections,
+            'keepalive_expiry': self.limits.keepalive_expiry,
+            'requests': self._request_count,
+            'connections_opened': self._connections_opened,
+            'connections_reused': reused,
+            'reuse_ratio': round(reused / self._request_count, 4) if self._request_count else 0.0,
+        }
     
     def _get_headers(self) -> Dict[str, str]:
         """랜덤한 User-Agent를 포함한 헤더를 반환합니다."""
@@ -32,285 +1660,699 @@ class DuckDuckGoSearcher:
             'Accept-Language': 'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7',
             'Accept-Encoding': 'identity',  # 압축 비활성화
             'DNT': '1',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
     
-    async def search_web_lite(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-        """DuckDuckGo Lite를 사용한 웹 검색 (더 안정적)"""
+    @staticmethod
+    async def _collect(
+        results: Iterator[Dict[str, Any]],
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """파서가 내보내는 결과를 모으면서, 스트리밍 콜백이 있으면 하나씩 바로 전달합니다."""
+        collected = []
+        for result in results:
+            collected.append(result)
+            if on_result is not None:
+                await on_result(result)
+        return collected
+    
+    async def _fetch_lite_page(self, data: Dict[str, str]) -> httpx.Response:
+        """Lite 검색 페이지 하나를 요청합니다."""
+        # POST 방식으로 검색 (더 안정적)
+        return await self._request(
+            'POST',
+            self.lite_url,
+            endpoint='lite',
+            data=data,
+            headers=self._get_headers(),
+            timeout=httpx.Timeout(15.0),
+        )
+    
+    async def search_web_lite(
+        self,
+        query: str,
+        max_results: int = 10,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """DuckDuckGo Lite를 사용한 웹 검색 (더 안정적)
+        
+        한 페이지로 max_results를 채우지 못하면 Lite 폼의 다음 페이지 파라미터를 따라
+        최대 LITE_MAX_PAGES 페이지까지 이어서 가져옵니다. 페이지 크기로 보아 다음 페이지가
+        필요할 것이 확실하면 현재 페이지를 파싱하기 전에 다음 페이지 요청을 먼저 시작합니다.
+        결과는 정규화된 URL 기준으로 중복을 제거하며, max_results를 채우면 즉시 멈춥니다.
+        """
+        results: List[Dict[str, Any]] = []
+        seen_urls = set()
+        page_size = LITE_PAGE_SIZE
+        page_task: Optional[asyncio.Task] = asyncio.create_task(
+            self._fetch_lite_page({'q': query, 'kl': self.region})
+        )
+        pages = 0
+        
         try:
-            # 짧은 지연 추가 (봇 탐지 방지)
-            await asyncio.sleep(random.uniform(0.5, 1.5))
-            
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(15.0),
-                follow_redirects=True
-            ) as client:
-                # POST 방식으로 검색 (더 안정적)
-                data = {
-                    'q': query,
-                    'kl': 'kr-kr'
-                }
-                
-                response = await client.post(
-                    self.lite_url,
-                    data=data,
-                    headers=self._get_headers(),
-                )
+            while page_task is not None:
+                response = await page_task
+                page_task = None
+                pages += 1
                 
                 if response.status_code != 200:
                     print(f"HTTP 오류: {response.status_code}")
-                    return await self._fallback_search(query, max_results)
+                    break
                 
-                # HTML 파싱
-                soup = BeautifulSoup(response.text, 'html.parser')
-                results = []
+                parse_started = time.perf_counter()
+                next_params, page_results = self.parser.lite_page(response.text, max_results)
+                parse_elapsed = time.perf_counter() - parse_started
+                can_continue = next_params is not None and pages < LITE_MAX_PAGES
                 
-                # DuckDuckGo Lite의 검색 결과 구조 파싱
-                result_elements = soup.find_all('tr')
+                # 이 페이지만으로는 부족할 것이 확실하면 파싱 전에 다음 페이지를 미리 요청합니다
+                if can_continue and len(results) + page_size < max_results:
+                    page_task = asyncio.create_task(self._fetch_lite_page(next_params))
                 
-                for i, element in enumerate(result_elements):
-                    try:
-                        # 링크 찾기
-                        link_elem = element.find('a', href=True)
-                        if not link_elem:
-                            continue
-                            
-                        url = link_elem.get('href', '')
-                        if not url or url.startswith('/'):
-                            continue
-                            
-                        title = link_elem.get_text(strip=True)
-                        if not title:
-                            continue
-                        
-                        # 설명 찾기 (같은 행의 다른 td 또는 다음 행에서)
-                        description = ""
-                        
-                        # 먼저 같은 행에서 설명 찾기
-                        td_elements = element.find_all('td')
-                        if len(td_elements) > 1:
-                            for td in td_elements[1:]:  # 첫 번째 td는 보통 링크
-                                desc_text = td.get_text(strip=True)
-                                if desc_text and desc_text != title:
-                                    description = desc_text
-                                    break
-                        
-                        # 다음 행에서도 설명 찾기
-                        if not description:
-                            next_row = element.find_next_sibling('tr')
-                            if next_row:
-                                desc_elem = next_row.find('td')
-                                if desc_elem:
-                                    desc_text = desc_elem.get_text(strip=True)
-                                    # 링크가 아닌 텍스트만 설명으로 사용
-                                    if desc_text and not next_row.find('a', href=True):
-                                        description = desc_text
-                        
-                        if title and url:
-                            results.append({
-                                'title': title,
-                                'url': url,
-                                'description': description or "설명 없음"
-                            })
-                            
-                            if len(results) >= max_results:
-                                break
-                                
-                    except Exception as e:
-                        print(f"결과 파싱 중 오류: {e}")
+                page_count = 0
+                for result in self.metrics.timed_iter(page_results, 'parse', 'lite', parse_elapsed):
+                    page_count += 1
+                    canonical = canonicalize_url(result['url'])
+                    if canonical in seen_urls:
                         continue
+                    seen_urls.add(canonical)
+                    results.append(result)
+                    if on_result is not None:
+                        await on_result(result)
+                    if len(results) >= max_results:
+                        break
                 
-                return results
+                if len(results) >= max_results or page_count == 0:
+                    break
+                page_size = page_count
                 
+                # 미리 요청하지 않았지만 결과가 아직 부족하면 다음 페이지를 요청합니다
+                if page_task is None and can_continue:
+                    page_task = asyncio.create_task(self._fetch_lite_page(next_params))
+            
+            return results
+            
         except Exception as e:
             print(f"Lite 검색 중 오류: {e}")
-            return await self._fallback_search(query, max_results)
+            return results
+        finally:
+            if page_task is not None and not page_task.done():
+                page_task.cancel()
     
-    async def _fallback_search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    async def _fallback_search(
+        self,
+        query: str,
+        max_results: int = 10,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Dict[str, Any]]:
         """대안 검색 방법"""
         try:
-            await asyncio.sleep(random.uniform(1.0, 2.0))
+            # 간단한 GET 방식으로 시도
+            params = {
+                'q': query,
+                'ia': 'web'
+            }
             
-            async with httpx.AsyncClient(
+            response = await self._request(
+                'GET',
+                f"{self.base_url}/",
+                endpoint='fallback',
+                params=params,
+                headers=self._get_headers(),
                 timeout=httpx.Timeout(20.0),
-                follow_redirects=True
-            ) as client:
-                # 간단한 GET 방식으로 시도
-                params = {
-                    'q': query,
-                    'ia': 'web'
-                }
-                
-                response = await client.get(
-                    f"{self.base_url}/",
-                    params=params,
-                    headers=self._get_headers(),
-                )
-                
-                if response.status_code != 200:
-                    return []
-                
-                # 기본적인 HTML 파싱 시도
-                soup = BeautifulSoup(response.text, 'html.parser')
-                results = []
-                
-                # 다양한 셀렉터로 검색 결과 찾기
-                selectors = [
-                    'article[data-testid="result"]',
-                    'div[data-testid="result"]',
-                    '.result',
-                    '.web-result',
-                    'div.result__body',
-                    'li[data-layout="organic"]'
-                ]
-                
-                for selector in selectors:
-                    elements = soup.select(selector)
-                    if elements:
-                        for element in elements[:max_results]:
-                            try:
-                                # 제목과 링크 찾기
-                                title_elem = element.select_one('h3 a, h2 a, .result__title a, a[data-testid="result-title-a"]')
-                                if not title_elem:
-                                    continue
-                                
-                                title = title_elem.get_text(strip=True)
-                                url = title_elem.get('href', '')
-                                
-                                # 설명 찾기
-                                desc_elem = element.select_one('.result__snippet, [data-testid="result-snippet"], .snippet')
-                                description = desc_elem.get_text(strip=True) if desc_elem else "설명 없음"
-                                
-                                if title and url:
-                                    results.append({
-                                        'title': title,
-                                        'url': url,
-                                        'description': description
-                                    })
-                                    
-                            except Exception as e:
-                                print(f"대안 파싱 중 오류: {e}")
-                                continue
-                        
-                        if results:
-                            break
-                
-                return results
-                
+            )
+            
+            if response.status_code != 200:
+                return []
+            
+            return await self._collect(
+                self.metrics.timed_iter(self.parser.iter_fallback(response.text, max_results), 'parse', 'fallback'),
+                on_result,
+            )
+            
         except Exception as e:
             print(f"대안 검색 중 오류: {e}")
             return []
     
-    async def search_web(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-        """웹 검색을 수행합니다."""
-        # 먼저 Lite 버전 시도
-        results = await self.search_web_lite(query, max_results)
+    async def _cached(
+        self,
+        key: Tuple[Any, ...],
+        fetch: Callable[[ResultCallback], Awaitable[Any]],
+        ttl: float,
+        on_result: Optional[ResultCallback] = None,
+    ) -> Any:
+        """캐시를 거쳐 fetch 결과를 반환합니다.
         
-        # 결과가 없으면 대안 방법 시도
-        if not results:
-            results = await self._fallback_search(query, max_results)
+        신선한 항목은 바로 반환하고, 오래된 항목은 반환과 동시에 백그라운드 갱신을 예약합니다.
+        캐시 미스는 single-flight로 합쳐 같은 키에 대해 업스트림 요청을 한 번만 보냅니다.
+        빈 결과(빈 리스트, None)는 CACHE_NEGATIVE_TTL 동안만 캐시합니다.
+        on_result가 있으면 결과 목록의 각 항목을 (캐시 적중 시에는 즉시) 하나씩 전달합니다.
+        """
+        with self.metrics.span('cache_lookup', key[0]):
+            state, value = await self.cache.lookup(key)
+        if state is not None:
+            if state == SearchCache.STALE and key not in self._refresh_tasks:
+                task = asyncio.create_task(self._refresh(key, fetch, ttl))
+                self._refresh_tasks[key] = task
+                task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+            if on_result is not None and isinstance(value, list):
+                await self._collect(iter(value), on_result)
+            return value
         
-        # 검색 결과가 없는 경우
-        if not results:
-            return []
+        async def fetch_and_store(emit: ResultCallback) -> Any:
+            value = await fetch(emit)
+            self.cache.set(key, value, ttl if value else CACHE_NEGATIVE_TTL)
+            return value
+        
+        return await self.single_flight.do(key, fetch_and_store, on_result)
+    
+    async def _refresh(
+        self,
+        key: Tuple[Any, ...],
+        fetch: Callable[[ResultCallback], Awaitable[Any]],
+        ttl: float,
+    ) -> None:
+        """오래된 캐시 항목을 백그라운드에서 갱신합니다."""
+        try:
+            value = await self.single_flight.do(key, fetch)
+        except Exception as e:
+            print(f"캐시 갱신 중 오류: {e}")
+            return
+        # 갱신이 빈 결과를 돌려주면 기존의 유효한 결과를 덮어쓰지 않습니다
+        if value:
+            self.cache.set(key, value, ttl)
+    
+    def _cache_key(self, kind: str, query: str, max_results: Optional[int] = None) -> Tuple[Any, ...]:
+        """(도구 종류, 정규화된 검색어, 지역, 결과 수) 캐시 키를 만듭니다."""
+        return (kind, SearchCache.normalize_query(query), self.region, max_results)
+    
+    async def search_web(
+        self,
+        query: str,
+        max_results: int = 10,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """웹 검색을 수행합니다 (캐시 사용).
         
-        return results
+        on_result를 넘기면 파싱된 결과를 전체 검색이 끝나기 전에 하나씩 전달받습니다.
+        """
+        return await self._cached(
+            self._cache_key('web', query, max_results),
+            lambda emit: self._search_web_uncached(query, max_results, emit),
+            CACHE_WEB_TTL,
+            on_result,
+        )
     
     async def search_instant_answer(self, query: str) -> Optional[Dict[str, Any]]:
-        """즉석 답변을 검색합니다."""
+        """즉석 답변을 검색합니다 (캐시 사용)."""
+        return await self._cached(
+            self._cache_key('instant', query),
+            lambda emit: self._search_instant_answer_uncached(query),
+            CACHE_INSTANT_TTL,
+        )
+    
+    async def search_batch(
+        self,
+        queries: List[str],
+        max_results: int = 10,
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> Dict[str, Dict[str, Any]]:
+        """여러 검색어를 제한된 동시성으로 검색하고 검색어별 결과와 상태를 반환합니다.
+        
+        각 검색은 search_web을 거치므로 속도 제한기, 캐시, single-flight를 그대로 공유합니다.
+        한 검색어의 실패는 해당 항목의 status에만 기록되고 나머지 검색에는 영향을 주지 않습니다.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    results = await self.search_web(query, max_results)
+                except Exception as e:
+                    return {'status': 'error', 'error': str(e), 'results_count': 0, 'results': []}
+            return {
+                'status': 'success' if results else 'no_results',
+                'results_count': len(results),
+                'results': results,
+            }
+        
+        # 중복 검색어는 한 번만 검색합니다 (입력 순서 유지)
+        unique_queries = list(dict.fromkeys(queries))
+        outcomes = await asyncio.gather(*(run(query) for query in unique_queries))
+        return dict(zip(unique_queries, outcomes))
+    
+    async def search_brave(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        """Brave Search API로 웹 검색을 수행합니다 (캐시 사용, BRAVE_API_KEY 필요)."""
+        return await self._cached(
+            self._cache_key('brave', query, count),
+            lambda emit: self._search_brave_uncached(query, count),
+            CACHE_WEB_TTL,
+        )
+    
+    async def _search_brave_uncached(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        """캐시를 거치지 않고 Brave Search API를 호출합니다. 실패하면 예외를 그대로 전달합니다.
+        
+        brave_search_mcp_server와는 별도로 배포되는 패키지이므로 그 서버의 요청 경로와
+        스케줄러(우선순위 큐, 동시 요청 수 관리, 프리페치)를 거치지 않는 독립적인 할당량 소비자입니다.
+        두 서버는 응답 헤더로 같은 토큰의 남은 요청 수만 공유하므로, 동시에 요청하면 마지막 남은 요청을
+        서로 다투다 429를 받을 수 있으며 이때는 _apply_brave_rate_limit이 brave 브레이커를 엽니다.
+        """
+        response = await self._request(
+            'GET',
+            BRAVE_API_URL,
+            endpoint='brave',
+            headers={
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip',
+                'X-Subscription-Token': BRAVE_API_KEY,
+            },
+            params={
+                'q': query,
+                'count': min(count, 20),  # Brave API는 최대 20개
+                'country': BRAVE_COUNTRY,
+                'search_lang': BRAVE_LANGUAGE,
+                'safesearch': 'moderate',
+            },
+            timeout=httpx.Timeout(FEDERATED_BACKEND_TIMEOUT),
+        )
+        self._apply_brave_rate_limit(response)
+        response.raise_for_status()
+        with self.metrics.span('parse', 'brave'):
+            data = response.json()
+        return [
+            {
+                'title': item.get('title', ''),
+                'url': item.get('url', ''),
+                'description': item.get('description', ''),
+            }
+            for item in data.get('web', {}).get('results', [])
+            if item.get('url')
+        ]
+    
+    def _apply_brave_rate_limit(self, response: httpx.Response) -> None:
+        """Brave 응답의 속도 제한 헤더를 반영합니다.
+        
+        Brave 서버(brave_search_mcp_server)와 같은 구독 토큰을 쓰므로, 서버가 돌려주는 남은 요청 수가
+        두 서버의 요청을 모두 반영한 값입니다. X-RateLimit-Limit의 초당 한도로 요청 간격을 맞추고,
+        어떤 창이든 X-RateLimit-Remaining이 0이면 X-RateLimit-Reset까지, 429 응답이면 Retry-After
+        (없으면 가장 긴 리셋 시간, 그것도 없으면 1초)까지 brave 브레이커를 열어 요청을 보내지 않습니다.
+        """
+        headers = response.headers
+        host = urlsplit(BRAVE_API_URL).hostname or ''
+        limits = parse_rate_limit_header(headers.get('x-ratelimit-limit'))
+        remaining = parse_rate_limit_header(headers.get('x-ratelimit-remaining'))
+        resets = parse_rate_limit_header(headers.get('x-ratelimit-reset'))
+        if limits and limits[0] > 0:
+            self.rate_limiter.set_rate(host, limits[0])
+        
+        wait = max(
+            (reset for left, reset in zip(remaining, resets) if left <= 0),
+            default=0.0,
+        )
+        if response.status_code == 429:
+            retry_after = parse_retry_after(headers.get('retry-after'))
+            wait = max(wait, retry_after if retry_after is not None else max(resets, default=1.0))
+        if wait > 0:
+            self.breakers.get('brave').hold(wait)
+    
+    async def search_federated(
+        self,
+        query: str,
+        max_results: int = 10,
+        deadline: float = FEDERATED_DEADLINE,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """DuckDuckGo와 Brave를 동시에 검색하여 RRF로 합친 결과와 백엔드별 상태를 반환합니다.
+        
+        각 백엔드는 FEDERATED_BACKEND_TIMEOUT 안에 끝나야 합니다. 첫 백엔드가 결과를 돌려주면
+        나머지는 FEDERATED_GRACE만큼만 더 기다리므로, 응답 시간은 두 백엔드의 합이 아니라
+        빠른 쪽에 가깝습니다. deadline에 도달하면 그때까지 도착한 결과만으로 응답합니다.
+        늦은 백엔드의 검색은 single-flight 안에서 끝까지 진행되어 캐시에 저장됩니다.
+        """
+        backends: Dict[str, Callable[[], Awaitable[List[Dict[str, Any]]]]] = {
+            'duckduckgo': lambda: self.search_web(query, max_results),
+        }
+        if BRAVE_API_KEY:
+            backends['brave'] = lambda: self.search_brave(query, max_results)
+        
+        started = time.monotonic()
+        status: Dict[str, Dict[str, Any]] = {}
+        rankings: Dict[str, List[Dict[str, Any]]] = {}
+        
+        async def run(name: str) -> None:
+            try:
+                async with asyncio.timeout(FEDERATED_BACKEND_TIMEOUT):
+                    results = await backends[name]()
+                rankings[name] = results
+                status[name] = {'status': 'success' if results else 'no_results', 'results_count': len(results)}
+            except TimeoutError:
+                status[name] = {'status': 'timeout', 'results_count': 0}
+            except Exception as e:
+                status[name] = {'status': 'error', 'error': str(e), 'results_count': 0}
+            status[name]['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        
+        tasks = {asyncio.create_task(run(name)) for name in backends}
+        # 기다림을 멈춘 이유: 전체 마감(deadline_exceeded) 또는 유예 시간 초과(late)
+        cut_status = 'deadline_exceeded'
         try:
-            await asyncio.sleep(random.uniform(0.3, 0.8))
-            
-            async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
-                params = {
-                    'q': query,
-                    'format': 'json',
-                    'no_redirect': '1',
-                    'no_html': '1',
-                    'skip_disambig': '1'
-                }
-                
-                response = await client.get(
-                    f"{self.base_url}/",
-                    params=params,
-                    headers=self._get_headers(),
+            pending = tasks
+            while pending:
+                remaining = deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                grace = any(rankings.values()) and FEDERATED_GRACE < remaining
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=FEDERATED_GRACE if grace else remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
                 )
-                
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
+                if not done:
+                    if grace:
+                        cut_status = 'late'
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        backend_status = {
+            name: status.get(name, {'status': cut_status, 'results_count': 0})
+            for name in backends
+        }
+        if not BRAVE_API_KEY:
+            backend_status['brave'] = {'status': 'disabled', 'results_count': 0}
+        return reciprocal_rank_fusion(rankings, max_results), backend_status
+    
+    async def search_and_read(
+        self,
+        query: str,
+        top_n: int = 3,
+        max_bytes: int = 200000,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """웹 검색 후 상위 top_n개 페이지를 동시에 읽어 (검색 결과, 페이지 본문 목록)을 반환합니다."""
+        results = await self.search_web(query, top_n)
+        pages = await asyncio.gather(
+            *(self.read_page(result['url'], max_bytes) for result in results[:top_n])
+        )
+        return results, [
+            {'rank': rank, 'title': result['title'], **page}
+            for rank, (result, page) in enumerate(zip(results, pages), start=1)
+        ]
+    
+    async def read_page(self, url: str, max_bytes: int = 200000) -> Dict[str, Any]:
+        """웹 페이지 하나를 읽어 본문 텍스트를 추출합니다.
+        
+        공유 클라이언트로 응답 본문을 스트리밍하며 max_bytes에서 읽기를 멈추고,
+        전체 과정(연결, 리다이렉트, 다운로드)은 URL마다 READ_TIMEOUT 안에 끝납니다.
+        실패해도 예외를 던지지 않고 status가 success가 아닌 결과를 반환합니다.
+        """
+        page: Dict[str, Any] = {'url': url}
+        if urlsplit(url).scheme not in ('http', 'https'):
+            page.update({'status': 'error', 'error': '지원하지 않는 URL입니다.'})
+            return page
+        
+        started = time.monotonic()
+        try:
+            client = await self._get_client()
+            headers = self._get_headers()
+            headers['Accept-Encoding'] = 'gzip, deflate'
+            async with asyncio.timeout(READ_TIMEOUT):
+                with self.metrics.span('network', 'page'):
+                    async with client.stream(
+                        'GET', url, headers=headers, timeout=httpx.Timeout(READ_TIMEOUT)
+                    ) as response:
+                        page['final_url'] = str(response.url)
+                        if response.status_code != 200:
+                            page.update({'status': 'http_error', 'http_status': response.status_code})
+                            return page
                         
-                        # 즉석 답변이 있는지 확인
-                        if data.get('AbstractText'):
-                            return {
-                                'answer': data.get('AbstractText'),
-                                'source': data.get('AbstractSource', ''),
-                                'url': data.get('AbstractURL', ''),
-                                'type': 'abstract'
-                            }
-                        elif data.get('Answer'):
-                            return {
-                                'answer': data.get('Answer'),
-                                'source': data.get('AnswerType', ''),
-                                'url': '',
-                                'type': 'answer'
-                            }
-                    except json.JSONDecodeError:
-                        print("JSON 파싱 오류")
-                
+                        content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+                        page['content_type'] = content_type
+                        if content_type not in READABLE_CONTENT_TYPES:
+                            page.update({'status': 'unsupported', 'error': '본문을 추출할 수 없는 콘텐츠 타입입니다.'})
+                            return page
+                        
+                        chunks = []
+                        size = 0
+                        truncated = False
+                        async for chunk in response.aiter_bytes():
+                            if size >= max_bytes:
+                                # 한도를 정확히 채운 뒤에도 데이터가 이어지면 잘린 것입니다
+                                truncated = True
+                                break
+                            chunks.append(chunk)
+                            size += len(chunk)
+                            if size > max_bytes:
+                                truncated = True
+                                break
+                            if size == max_bytes and self._body_length(response) == max_bytes:
+                                break
+                        content = b''.join(chunks)[:max_bytes]
+                        encoding = response.charset_encoding
+            
+            if content_type == 'text/plain':
+                title = ''
+                text = ResultParser._clean_lines(content.decode(encoding or 'utf-8', errors='replace'))
+            else:
+                # 큰 페이지의 파싱이 이벤트 루프를 오래 잡지 않도록 스레드에서 실행합니다
+                with self.metrics.span('parse', 'page'):
+                    title, text = await asyncio.to_thread(self.parser.extract_text, content, encoding)
+            
+            page.update({
+                'status': 'success',
+                'page_title': title,
+                'bytes': len(content),
+                'truncated': truncated,
+                'text': text,
+            })
+        except TimeoutError:
+            page.update({'status': 'timeout', 'error': f'{READ_TIMEOUT}초 안에 페이지를 읽지 못했습니다.'})
+        except Exception as e:
+            page.update({'status': 'error', 'error': str(e)})
+        finally:
+            page['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return page
+    
+    @staticmethod
+    def _body_length(response: httpx.Response) -> Optional[int]:
+        """압축되지 않은 응답의 Content-Length를 반환합니다 (알 수 없으면 None)."""
+        if response.headers.get('content-encoding', 'identity') != 'identity':
+            return None
+        try:
+            return int(response.headers['content-length'])
+        except (KeyError, ValueError):
+            return None
+    
+    async def _search_web_uncached(
+        self,
+        query: str,
+        max_results: int = 10,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """캐시를 거치지 않고 헤지 방식으로 웹 검색을 수행합니다.
+        
+        Lite 검색을 먼저 시작하고, HEDGE_DELAY 안에 쓸 만한 결과가 오지 않으면 대안 검색을
+        함께 시작합니다. 먼저 결과를 돌려준 쪽을 사용하고 나머지는 취소합니다.
+        전체 검색은 SEARCH_DEADLINE 안에 끝나며, 시간을 넘기면 빈 결과를 반환합니다.
+        
+        스트리밍 중에는 처음 결과를 내보낸 엔드포인트가 스트림을 차지하며,
+        최종 결과도 그 엔드포인트의 것을 사용합니다.
+        
+        서킷 브레이커가 열린 엔드포인트는 건너뜁니다. Lite가 차단 중이면 헤지 지연 없이
+        바로 대안 검색을 시작합니다.
+        """
+        self.hedge_stats['searches'] += 1
+        stream_owner: Optional[str] = None
+        
+        def stream_to(name: str) -> Optional[ResultCallback]:
+            if on_result is None:
                 return None
+            
+            async def emit(result: Dict[str, Any]) -> None:
+                nonlocal stream_owner
+                if stream_owner is None:
+                    stream_owner = name
+                if stream_owner == name:
+                    await on_result(result)
+            return emit
+        
+        lite_task: Optional[asyncio.Task] = None
+        fallback_task: Optional[asyncio.Task] = None
+        if self.breakers.available('lite'):
+            lite_task = asyncio.create_task(self.search_web_lite(query, max_results, stream_to('lite')))
+        else:
+            self.hedge_stats['lite_skipped'] += 1
+        
+        def winner() -> Optional[List[Dict[str, Any]]]:
+            # 동시에 끝났다면 Lite 결과를 우선하되, 스트림을 차지한 쪽이 있으면 그 결과만 사용합니다
+            for name, task in (('lite', lite_task), ('fallback', fallback_task)):
+                if task is None or (stream_owner is not None and stream_owner != name):
+                    continue
+                if task.done() and task.result():
+                    self.hedge_stats[f'{name}_wins'] += 1
+                    return task.result()
+            return None
+        
+        try:
+            async with asyncio.timeout(SEARCH_DEADLINE):
+                # 먼저 Lite 버전 시도
+                if lite_task is not None:
+                    await asyncio.wait({lite_task}, timeout=HEDGE_DELAY)
+                    results = winner()
+                    if results:
+                        return results
+                
+                # Lite가 느리거나 결과가 없으면 대안 방법을 함께 시도
+                if self.breakers.available('fallback'):
+                    if lite_task is not None:
+                        self.hedge_stats['hedged'] += 1
+                    fallback_task = asyncio.create_task(
+                        self._fallback_search(query, max_results, stream_to('fallback'))
+                    )
+                pending = {
+                    task for task in (lite_task, fallback_task)
+                    if task is not None and not task.done()
+                }
+                while pending:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    results = winner()
+                    if results:
+                        return results
                 
+                # 검색 결과가 없는 경우
+                self.hedge_stats['no_results'] += 1
+                return []
+        except TimeoutError:
+            self.hedge_stats['deadline_exceeded'] += 1
+            print(f"검색 시간 초과 ({SEARCH_DEADLINE}초): {query}")
+            return []
+        finally:
+            for task in (lite_task, fallback_task):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    async def _search_instant_answer_uncached(self, query: str) -> Optional[Dict[str, Any]]:
+        """캐시를 거치지 않고 즉석 답변을 검색합니다."""
+        try:
+            params = {
+                'q': query,
+                'format': 'json',
+                'no_redirect': '1',
+                'no_html': '1',
+                'skip_disambig': '1'
+            }
+            
+            response = await self._request(
+                'GET',
+                f"{self.base_url}/",
+                endpoint='instant',
+                params=params,
+                headers=self._get_headers(),
+                timeout=httpx.Timeout(10.0),
+                follow_redirects=False,
+            )
+            
+            if response.status_code == 200:
+                try:
+                    with self.metrics.span('parse', 'instant'):
+                        data = response.json()
+                    
+                    # 즉석 답변이 있는지 확인
+                    if data.get('AbstractText'):
+                        return {
+                            'answer': data.get('AbstractText'),
+                            'source': data.get('AbstractSource', ''),
+                            'url': data.get('AbstractURL', ''),
+                            'type': 'abstract'
+                        }
+                    elif data.get('Answer'):
+                        return {
+                            'answer': data.get('Answer'),
+                            'source': data.get('AnswerType', ''),
+                            'url': '',
+                            'type': 'answer'
+                        }
+                except json.JSONDecodeError:
+                    print("JSON 파싱 오류")
+            
+            return None
+            
         except Exception as e:
             print(f"즉석 답변 검색 중 오류: {e}")
             return None
 
 
 # DuckDuckGo 검색기 인스턴스 생성
-searcher = DuckDuckGoSearcher()
+metrics = PipelineMetrics()
+searcher = DuckDuckGoSearcher(metrics=metrics)
+
+
+def dump_json(payload: Any, indent: Optional[int] = 2) -> str:
+    """도구 응답을 JSON으로 직렬화하면서 직렬화 시간을 기록합니다."""
+    with metrics.span('serialize'):
+        return json.dumps(payload, ensure_ascii=False, indent=indent)
 
 
 @mcp.tool()
-async def search_web(query: str, max_results: int = 10) -> str:
+@metrics.traced_tool("search_web")
+async def search_web(query: str, max_results: int = 10, stream: bool = False, ctx: Context = None) -> str:
     """
     DuckDuckGo를 사용하여 웹 검색을 수행합니다.
     
     Args:
         query: 검색할 키워드
         max_results: 반환할 최대 결과 수 (기본값: 10)
+        stream: True이면 각 결과를 파싱되는 즉시 MCP 진행 알림(progress notification)의
+                message로 먼저 보내고, 마지막에 전체 결과를 반환합니다 (기본값: False)
     
     Returns:
         검색 결과를 JSON 형태의 문자열로 반환
     """
+    streamed = 0
+    
+    async def send_progress(result: Dict[str, Any]) -> None:
+        nonlocal streamed
+        streamed += 1
+        await ctx.report_progress(
+            streamed,
+            max_results,
+            dump_json(result, None),
+        )
+    
+    on_result = send_progress if stream and ctx is not None else None
+    # 스트리밍 모드의 최종 응답은 들여쓰기 없이 직렬화하여 전송량과 직렬화 시간을 줄입니다
+    indent = None if on_result else 2
+    
     try:
-        results = await searcher.search_web(query, max_results)
+        results = await searcher.search_web(query, max_results, on_result)
         
         if not results:
-            return json.dumps({
+            return dump_json({
                 'status': 'success',
                 'query': query,
                 'results_count': 0,
                 'results': [],
                 'message': '검색 결과가 없습니다.'
-            }, ensure_ascii=False, indent=2)
+            }, indent)
         
-        return json.dumps({
+        payload = {
             'status': 'success',
             'query': query,
             'results_count': len(results),
             'results': results
-        }, ensure_ascii=False, indent=2)
+        }
+        if on_result:
+            payload['streamed_count'] = streamed
+        return dump_json(payload, indent)
         
     except Exception as e:
-        return json.dumps({
+        return dump_json({
             'status': 'error',
             'query': query,
             'error': str(e),
             'message': '검색 중 오류가 발생했습니다.'
-        }, ensure_ascii=False, indent=2)
+        }, indent)
 
 
 @mcp.tool()
+@metrics.traced_tool("search_instant_answer")
 async def search_instant_answer(query: str) -> str:
     """
     DuckDuckGo의 즉석 답변 기능을 사용하여 직접적인 답변을 검색합니다.
@@ -325,30 +2367,31 @@ async def search_instant_answer(query: str) -> str:
         result = await searcher.search_instant_answer(query)
         
         if not result:
-            return json.dumps({
+            return dump_json({
                 'status': 'success',
                 'query': query,
                 'has_answer': False,
                 'message': '즉석 답변을 찾을 수 없습니다.'
-            }, ensure_ascii=False, indent=2)
+            })
         
-        return json.dumps({
+        return dump_json({
             'status': 'success',
             'query': query,
             'has_answer': True,
             'answer': result
-        }, ensure_ascii=False, indent=2)
+        })
         
     except Exception as e:
-        return json.dumps({
+        return dump_json({
             'status': 'error',
             'query': query,
             'error': str(e),
             'message': '즉석 답변 검색 중 오류가 발생했습니다.'
-        }, ensure_ascii=False, indent=2)
+        })
 
 
 @mcp.tool()
+@metrics.traced_tool("search_combined")
 async def search_combined(query: str, max_results: int = 5) -> str:
     """
     즉석 답변과 웹 검색을 동시에 수행하여 통합된 결과를 제공합니다.
@@ -367,7 +2410,7 @@ async def search_combined(query: str, max_results: int = 5) -> str:
         
         instant_result, web_results = await asyncio.gather(instant_task, web_task)
         
-        return json.dumps({
+        return dump_json({
             'status': 'success',
             'query': query,
             'instant_answer': instant_result,
@@ -375,21 +2418,152 @@ async def search_combined(query: str, max_results: int = 5) -> str:
                 'count': len(web_results),
                 'results': web_results
             }
-        }, ensure_ascii=False, indent=2)
+        })
         
     except Exception as e:
-        return json.dumps({
+        return dump_json({
             'status': 'error',
             'query': query,
             'error': str(e),
             'message': '통합 검색 중 오류가 발생했습니다.'
-        }, ensure_ascii=False, indent=2)
+        })
+
+
+@mcp.tool()
+@metrics.traced_tool("search_batch")
+async def search_batch(queries: List[str], max_results: int = 5) -> str:
+    """
+    여러 검색어를 한 번의 호출로 동시에 웹 검색합니다.
+    
+    Args:
+        queries: 검색할 키워드 목록 (최대 50개)
+        max_results: 검색어별 최대 결과 수 (기본값: 5)
+    
+    Returns:
+        검색어를 키로 하는 검색어별 상태(success/no_results/error)와 결과를 JSON 형태로 반환
+    """
+    if not queries:
+        return dump_json({
+            'status': 'error',
+            'error': 'queries가 비어 있습니다.',
+            'message': '검색할 키워드를 하나 이상 입력해주세요.'
+        })
+    
+    if len(queries) > BATCH_MAX_QUERIES:
+        return dump_json({
+            'status': 'error',
+            'error': f'queries는 최대 {BATCH_MAX_QUERIES}개까지 가능합니다. (입력: {len(queries)}개)',
+            'message': '검색어 수를 줄여 다시 요청해주세요.'
+        })
+    
+    try:
+        results = await searcher.search_batch(queries, max_results)
+        succeeded = sum(1 for outcome in results.values() if outcome['status'] == 'success')
+        
+        return dump_json({
+            'status': 'success',
+            'queries_count': len(results),
+            'succeeded_count': succeeded,
+            'results': results
+        })
+        
+    except Exception as e:
+        return dump_json({
+            'status': 'error',
+            'queries': queries,
+            'error': str(e),
+            'message': '배치 검색 중 오류가 발생했습니다.'
+        })
+
+
+@mcp.tool()
+@metrics.traced_tool("search_federated")
+async def search_federated(query: str, max_results: int = 10) -> str:
+    """
+    DuckDuckGo와 Brave를 동시에 검색하고 Reciprocal Rank Fusion으로 합친 결과를 반환합니다.
+    
+    Args:
+        query: 검색할 키워드
+        max_results: 반환할 최대 결과 수 (기본값: 10)
+    
+    Returns:
+        URL 기준으로 중복을 제거하고 점수순으로 정렬한 결과와 백엔드별 상태를 JSON 형태로 반환
+    """
+    try:
+        results, backends = await searcher.search_federated(query, max_results)
+        
+        return dump_json({
+            'status': 'success',
+            'query': query,
+            'results_count': len(results),
+            'results': results,
+            'backends': backends
+        })
+        
+    except Exception as e:
+        return dump_json({
+            'status': 'error',
+            'query': query,
+            'error': str(e),
+            'message': '연합 검색 중 오류가 발생했습니다.'
+        })
+
+
+@mcp.tool()
+@metrics.traced_tool("search_and_read")
+async def search_and_read(query: str, top_n: int = 3, max_bytes: int = 200000) -> str:
+    """
+    웹 검색 후 상위 결과 페이지들을 동시에 읽어 본문 텍스트를 함께 반환합니다.
+    
+    Args:
+        query: 검색할 키워드
+        top_n: 읽을 상위 결과 수 (기본값: 3, 최대 10)
+        max_bytes: 페이지마다 읽을 최대 바이트 수 (기본값: 200000)
+    
+    Returns:
+        검색 결과 순위별 페이지 제목, URL, 상태(success/timeout/http_error/unsupported/error), 본문 텍스트를 JSON 형태로 반환
+    """
+    top_n = max(1, min(top_n, READ_MAX_TOP_N))
+    max_bytes = max(1024, min(max_bytes, READ_MAX_BYTES_LIMIT))
+    
+    try:
+        results, pages = await searcher.search_and_read(query, top_n, max_bytes)
+        
+        if not results:
+            return dump_json({
+                'status': 'success',
+                'query': query,
+                'count': 0,
+                'pages': [],
+                'message': '검색 결과가 없습니다.'
+            })
+        
+        return dump_json({
+            'status': 'success',
+            'query': query,
+            'count': len(pages),
+            'succeeded_count': sum(1 for page in pages if page['status'] == 'success'),
+            'pages': pages
+        })
+        
+    except Exception as e:
+        return dump_json({
+            'status': 'error',
+            'query': query,
+            'error': str(e),
+            'message': '검색 결과 페이지를 읽는 중 오류가 발생했습니다.'
+        })
 
 
 @mcp.resource("duckduckgo://info")
 def get_server_info() -> str:
-    """서버 정보를 제공하는 리소스"""
-    return """
+    """서버 정보와 엔드포인트별 서킷 브레이커 상태를 제공하는 리소스"""
+    breaker_lines = "\n".join(
+        f"    - {endpoint}: {stats['state']} (실패율 {stats['failure_rate']:.0%}, "
+        f"p95 {stats['latency_p95_ms'] if stats['samples'] else '-'}ms, 재시도까지 {stats['retry_in_seconds']}초)"
+        for endpoint, stats in searcher.breakers.get_stats().items()
+    ) or "    - 아직 요청 기록이 없습니다"
+    return f"""
     DuckDuckGo Search MCP Server 정보
     =================================
     
@@ -399,9 +2573,17 @@ def get_server_info() -> str:
     - search_web: 일반 웹 검색 (최대 결과 수 지정 가능)
     - search_instant_answer: 즉석 답변 검색 (계산, 정의, 간단한 질문 등)
     - search_combined: 즉석 답변과 웹 검색을 동시에 수행
+    - search_batch: 여러 검색어를 동시에 웹 검색 (검색어별 상태 포함)
+    - search_and_read: 웹 검색 후 상위 결과 페이지들의 본문을 동시에 읽어 함께 반환
+    - search_federated: DuckDuckGo와 Brave를 동시에 검색하여 순위를 합친 결과 (BRAVE_API_KEY 필요)
     
     제공하는 리소스:
     - duckduckgo://info: 서버 정보
+    - duckduckgo://usage: 사용 예시
+    - duckduckgo://stats: HTTP 연결 재사용, 요청 속도 제한, 서킷 브레이커, 캐시, 요청 합치기, 헤지 요청 통계
+    
+    엔드포인트 상태 (서킷 브레이커):
+{breaker_lines}
     
     포트: 11005
     프로토콜: MCP (Model Context Protocol)
@@ -417,6 +2599,7 @@ def get_usage_examples() -> str:
     
     1. 일반 웹 검색:
        search_web("파이썬 튜토리얼", max_results=5)
+       search_web("파이썬 튜토리얼", max_results=5, stream=True)  # 결과를 진행 알림으로 먼저 전송
     
     2. 즉석 답변 검색:
        search_instant_answer("2+2는 무엇인가요?")
@@ -425,15 +2608,91 @@ def get_usage_examples() -> str:
     3. 통합 검색:
        search_combined("인공지능이란 무엇인가", max_results=3)
     
+    4. 배치 검색:
+       search_batch(["파이썬 asyncio", "httpx 연결 풀", "토큰 버킷 알고리즘"], max_results=3)
+    
+    5. 검색 후 페이지 읽기:
+       search_and_read("파이썬 asyncio 튜토리얼", top_n=3, max_bytes=200000)
+    
+    6. 연합 검색 (DuckDuckGo + Brave):
+       search_federated("파이썬 asyncio 튜토리얼", max_results=10)
+    
     검색 결과는 모두 JSON 형태로 반환되며, 한국어를 지원합니다.
     """
 
 
-if __name__ == "__main__":
+@mcp.resource("duckduckgo://stats")
+def get_server_stats() -> str:
+    """HTTP 연결 풀, 속도 제한, 서킷 브레이커, 캐시, 요청 합치기, 헤지 요청 통계를 제공하는 리소스"""
+    return json.dumps({
+        'connections': searcher.get_connection_stats(),
+        'rate_limiter': searcher.rate_limiter.get_stats(),
+        'breakers': searcher.breakers.get_stats(),
+        'cache': searcher.cache.get_stats(),
+        'single_flight': searcher.single_flight.get_stats(),
+        'hedging': searcher.hedge_stats,
+    }, ensure_ascii=False, indent=2)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """단계별 지연 시간 히스토그램과 주요 카운터를 Prometheus exposition 형식으로 제공합니다."""
+    lines = metrics.render()
+    
+    connections = searcher.get_connection_stats()
+    cache = searcher.cache.get_stats()
+    single_flight = searcher.single_flight.get_stats()
+    lines.extend([
+        '# HELP ddg_upstream_requests_total Requests sent to upstream search endpoints.',
+        '# TYPE ddg_upstream_requests_total counter',
+        f"ddg_upstream_requests_total {connections['requests']}",
+        '# HELP ddg_connections_opened_total New TCP connections opened by the shared client.',
+        '# TYPE ddg_connections_opened_total counter',
+        f"ddg_connections_opened_total {connections['connections_opened']}",
+        '# HELP ddg_cache_lookups_total Result cache lookups by outcome.',
+        '# TYPE ddg_cache_lookups_total counter',
+        f'ddg_cache_lookups_total{{result="hit"}} {cache["hits"]}',
+        f'ddg_cache_lookups_total{{result="stale"}} {cache["stale_hits"]}',
+        f'ddg_cache_lookups_total{{result="miss"}} {cache["misses"]}',
+        '# HELP ddg_cache_entries Entries in the in-memory result cache.',
+        '# TYPE ddg_cache_entries gauge',
+        f"ddg_cache_entries {cache['entries']}",
+        '# HELP ddg_single_flight_coalesced_total Calls that joined an in-flight identical search.',
+        '# TYPE ddg_single_flight_coalesced_total counter',
+        f"ddg_single_flight_coalesced_total {single_flight['coalesced']}",
+        '# HELP ddg_breaker_state Circuit breaker state per endpoint (1 for the current state).',
+        '# TYPE ddg_breaker_state gauge',
+    ])
+    for endpoint, stats in searcher.breakers.get_stats().items():
+        for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+            lines.append(
+                f'ddg_breaker_state{{endpoint="{endpoint}",state="{state}"}} {int(stats["state"] == state)}'
+            )
+    
+    return PlainTextResponse('\n'.join(lines) + '\n', media_type='text/plain; version=0.0.4')
+
+
+async def run_server() -> None:
+    """공유 HTTP 클라이언트의 생명주기와 함께 streamable-http 서버를 실행합니다."""
+    await searcher.start()
+    try:
+        await mcp.run_streamable_http_async()
+    finally:
+        await searcher.close()
+
+
+def main() -> None:
     """서버를 실행합니다."""
     print("DuckDuckGo Search MCP Server 시작 중...")
     print("포트: 11005")
     print("프로토콜: streamable-http")
+    print(f"HTTP/2: {'활성화' if HTTP2_ENABLED else '비활성화'}")
+    print("메트릭: http://0.0.0.0:11005/metrics")
     
     # 서버를 실행합니다.
-    mcp.run(transport="streamable-http")
+    asyncio.run(run_server())
+
+
+if __name__ == "__main__":
+    main()
+
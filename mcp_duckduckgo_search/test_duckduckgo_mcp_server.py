@@ -0,0 +1,985 @@
+"""duckduckgo_mcp_server 단위 테스트
+
+네트워크 없이 httpx.MockTransport로 DuckDuckGo 응답을 흉내 냅니다.
+
+실행:
+    uv run pytest -q
+"""
+
+import asyncio
+import http.server
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+import duckduckgo_mcp_server as ddg
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def make_searcher(handler: Callable[[httpx.Request], Any], **kwargs: Any) -> ddg.DuckDuckGoSearcher:
+    """목 전송 계층을 쓰는 검색기를 만듭니다 (속도 제한은 사실상 끔)."""
+    kwargs.setdefault("rate_limiter", ddg.HostRateLimiter(rate=1000, burst=1000, min_rate=1000))
+    kwargs.setdefault("cache", ddg.SearchCache())
+    kwargs.setdefault("parser", ddg.get_parser("bs4"))
+    searcher = ddg.DuckDuckGoSearcher(**kwargs)
+    searcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+    return searcher
+
+
+def html_response(text: str) -> httpx.Response:
+    return httpx.Response(200, text=text, headers={"content-type": "text/html; charset=utf-8"})
+
+
+async def wait_for(predicate: Callable[[], bool], timeout: float = 2.0) -> bool:
+    """조건이 참이 되거나 제한 시간이 지날 때까지 기다립니다."""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    return predicate()
+
+
+# --- 공유 HTTP 클라이언트 연결 재사용 ---
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    """keep-alive로 짧은 HTML을 돌려주는 로컬 HTTP/1.1 서버 핸들러"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"<html><body>ok</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reuses_keepalive_connection():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    searcher = ddg.DuckDuckGoSearcher(
+        http2=False,
+        rate_limiter=ddg.HostRateLimiter(rate=1000, burst=1000, min_rate=1000),
+        cache=ddg.SearchCache(),
+    )
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        for _ in range(3):
+            response = await searcher._request("GET", url)
+            assert response.status_code == 200
+        # 세 요청이 하나의 TCP 연결을 재사용합니다
+        stats = searcher.get_connection_stats()
+        assert stats["requests"] == 3
+        assert stats["connections_opened"] == 1
+        assert stats["connections_reused"] == 2
+        assert stats["reuse_ratio"] == pytest.approx(2 / 3, abs=1e-4)
+        assert stats["http2"] is False
+
+        # 닫힌 뒤 다시 요청하면 새 클라이언트와 새 연결을 사용합니다
+        await searcher.close()
+        await searcher._request("GET", url)
+        assert searcher.get_connection_stats()["connections_opened"] == 2
+    finally:
+        await searcher.close()
+        server.shutdown()
+        server.server_close()
+
+
+# --- 호스트별 토큰 버킷 속도 제한 ---
+
+def test_token_bucket_spaces_out_burst():
+    bucket = ddg.TokenBucket(rate=2.0, burst=2, min_rate=0.5)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    # 버스트를 넘긴 요청은 1/rate 간격으로 예약됩니다
+    assert delays[2] == pytest.approx(0.5, abs=0.01)
+    assert delays[3] == pytest.approx(1.0, abs=0.01)
+    assert bucket.waits == 2
+
+
+def test_token_bucket_penalize_and_recover():
+    bucket = ddg.TokenBucket(rate=1.0, burst=3, min_rate=0.2)
+    bucket.penalize()
+    assert bucket.rate == 0.5
+    assert bucket.tokens <= 0
+    for _ in range(3):
+        bucket.penalize()
+    assert bucket.rate == 0.2
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == 1.0
+
+
+# --- TTL/LRU 캐시와 stale-while-revalidate ---
+
+def test_search_cache_ttl_and_lru():
+    cache = ddg.SearchCache(max_entries=2, stale_ttl=0)
+    cache.set(("a",), 1, ttl=60)
+    cache.set(("b",), 2, ttl=60)
+    assert cache.get(("a",)) == (ddg.SearchCache.FRESH, 1)
+    # "a"를 방금 사용했으므로 가장 오래된 "b"가 밀려납니다
+    cache.set(("c",), 3, ttl=60)
+    assert cache.get(("b",)) == (None, None)
+    assert cache.evictions == 1
+    cache.set(("d",), 4, ttl=-1)
+    assert cache.get(("d",)) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refreshing():
+    searcher = make_searcher(lambda request: httpx.Response(500))
+    key = ("web", "python", "kr-kr", 5)
+    searcher.cache.set(key, ["old"], ttl=-1)
+    calls = []
+
+    async def fetch(emit):
+        calls.append(1)
+        return ["new"]
+
+    # 오래된 값을 바로 돌려주고 백그라운드에서 한 번만 갱신합니다
+    assert await searcher._cached(key, fetch, ttl=60) == ["old"]
+    assert await searcher._cached(key, fetch, ttl=60) == ["old"]
+    await asyncio.gather(*searcher._refresh_tasks.values())
+    assert calls == [1]
+    assert searcher.cache.get(key) == (ddg.SearchCache.FRESH, ["new"])
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_empty_refresh_keeps_previous_value():
+    searcher = make_searcher(lambda request: httpx.Response(500))
+    key = ("web", "python", "kr-kr", 5)
+    searcher.cache.set(key, ["old"], ttl=-1)
+
+    async def fetch(emit):
+        return []
+
+    await searcher._cached(key, fetch, ttl=60)
+    await asyncio.gather(*searcher._refresh_tasks.values())
+    assert searcher.cache.get(key) == (ddg.SearchCache.STALE, ["old"])
+    await searcher.close()
+
+
+# --- single-flight 요청 합치기 ---
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_searches_share_one_request():
+    lite_html = load_fixture("lite.html")
+    requests: List[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        return html_response(lite_html)
+
+    searcher = make_searcher(handler)
+    # 대소문자/공백만 다른 검색어도 같은 키로 합쳐집니다
+    queries = ["python httpx", "Python  HTTPX", "PYTHON httpx", "python httpx", " python httpx "]
+    results = await asyncio.gather(*(searcher.search_web(query, 5) for query in queries))
+
+    assert len(requests) == 1
+    assert all(result == results[0] for result in results)
+    assert len(results[0]) == 5
+    assert searcher.single_flight.get_stats()["executions"] == 1
+    assert searcher.single_flight.get_stats()["coalesced"] == 4
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_fetch():
+    flight = ddg.SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch(emit):
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do(("key",), fetch))
+    second = asyncio.create_task(flight.do(("key",), fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "done"
+    assert first.cancelled()
+    assert flight.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_late_joiner_receives_replayed_items():
+    flight = ddg.SingleFlight()
+    halfway = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fetch(emit):
+        await emit(1)
+        halfway.set()
+        await release.wait()
+        await emit(2)
+        return [1, 2]
+
+    first_items: List[int] = []
+    late_items: List[int] = []
+
+    def collect(target: List[int]):
+        async def on_item(item):
+            target.append(item)
+        return on_item
+
+    first = asyncio.create_task(flight.do(("key",), fetch, collect(first_items)))
+    await halfway.wait()
+    late = asyncio.create_task(flight.do(("key",), fetch, collect(late_items)))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == await late == [1, 2]
+    assert first_items == late_items == [1, 2]
+
+
+# --- Lite/폴백 헤지 요청과 검색 마감 시간 ---
+
+def routing_handler(lite_delay: float, fallback_delay: float, events: Dict[str, List[str]]):
+    """Lite/대안 검색 요청을 각자의 지연 후에 응답하고, 시작/취소/완료를 기록합니다."""
+    pages = {"lite": load_fixture("lite.html"), "fallback": load_fixture("fallback.html")}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        name = "lite" if request.url.host == "lite.duckduckgo.com" else "fallback"
+        events.setdefault(name, []).append("started")
+        try:
+            await asyncio.sleep(lite_delay if name == "lite" else fallback_delay)
+        except asyncio.CancelledError:
+            events[name].append("cancelled")
+            raise
+        events[name].append("completed")
+        return html_response(pages[name])
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_slow_lite_is_hedged_and_cancelled(monkeypatch):
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 0.05)
+    events: Dict[str, List[str]] = {}
+    searcher = make_searcher(routing_handler(lite_delay=5, fallback_delay=0.01, events=events))
+
+    results = await searcher._search_web_uncached("python httpx", 5)
+    await asyncio.sleep(0)
+
+    assert results and results == searcher.parser.parse_fallback(load_fixture("fallback.html"), 5)
+    assert events["lite"] == ["started", "cancelled"]
+    assert events["fallback"] == ["started", "completed"]
+    assert searcher.hedge_stats["hedged"] == 1
+    assert searcher.hedge_stats["fallback_wins"] == 1
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_fast_lite_does_not_start_fallback(monkeypatch):
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 1.0)
+    events: Dict[str, List[str]] = {}
+    searcher = make_searcher(routing_handler(lite_delay=0.01, fallback_delay=0.01, events=events))
+
+    results = await searcher._search_web_uncached("python httpx", 5)
+
+    assert len(results) == 5
+    assert "fallback" not in events
+    assert searcher.hedge_stats["lite_wins"] == 1
+    assert searcher.hedge_stats["hedged"] == 0
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_search_deadline_returns_empty_and_cancels_both(monkeypatch):
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 0.01)
+    monkeypatch.setattr(ddg, "SEARCH_DEADLINE", 0.1)
+    events: Dict[str, List[str]] = {}
+    searcher = make_searcher(routing_handler(lite_delay=5, fallback_delay=5, events=events))
+
+    assert await searcher._search_web_uncached("python httpx", 5) == []
+    await asyncio.sleep(0)
+
+    assert events["lite"] == events["fallback"] == ["started", "cancelled"]
+    assert searcher.hedge_stats["deadline_exceeded"] == 1
+    await searcher.close()
+
+
+# --- HTML 파서 백엔드 (bs4/lxml) 결과 일치 ---
+
+def test_result_parser_requires_backend_methods():
+    with pytest.raises(TypeError):
+        ddg.ResultParser()
+
+
+def test_parsers_agree_on_fixture_pages():
+    pytest.importorskip("lxml")
+    bs4_parser, lxml_parser = ddg.BeautifulSoupParser(), ddg.LxmlParser()
+    lite, fallback = load_fixture("lite.html"), load_fixture("fallback.html")
+
+    expected = bs4_parser.parse_lite(lite, 50)
+    assert expected
+    assert lxml_parser.parse_lite(lite, 50) == expected
+    expected = bs4_parser.parse_fallback(fallback, 50)
+    assert expected
+    assert lxml_parser.parse_fallback(fallback, 50) == expected
+
+    bs4_next, bs4_items = bs4_parser.lite_page(lite, 50)
+    lxml_next, lxml_items = lxml_parser.lite_page(lite, 50)
+    assert lxml_next == bs4_next
+    assert list(lxml_items) == list(bs4_items)
+
+    for name in ("lite.html", "fallback.html"):
+        content = load_fixture(name).encode("utf-8")
+        assert lxml_parser.extract_text(content, "utf-8") == bs4_parser.extract_text(content, "utf-8")
+
+
+# --- 배치 검색: 중복 제거, 순서, 동시성 제한, 부분 실패 ---
+
+def fake_search_web(calls: List[str], active: List[int], delay: float = 0.02):
+    """검색어별로 결과 수나 실패를 흉내 내고 동시에 실행 중인 검색 수의 최댓값을 기록합니다."""
+    async def search_web(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        calls.append(query)
+        active[0] += 1
+        active[1] = max(active[1], active[0])
+        try:
+            await asyncio.sleep(delay)
+            if query.startswith("error"):
+                raise RuntimeError(f"{query} 실패")
+            if query.startswith("empty"):
+                return []
+            return [{"title": query, "url": f"https://{query}.example/", "description": ""}]
+        finally:
+            active[0] -= 1
+    return search_web
+
+
+@pytest.mark.asyncio
+async def test_search_batch_dedupes_and_keeps_input_order(monkeypatch):
+    calls: List[str] = []
+    searcher = make_searcher(lambda request: html_response(""))
+    monkeypatch.setattr(searcher, "search_web", fake_search_web(calls, [0, 0]))
+
+    results = await searcher.search_batch(["b", "a", "b", "c", "a"], max_results=3)
+    assert list(results) == ["b", "a", "c"]
+    assert sorted(calls) == ["a", "b", "c"]
+    assert results["a"]["results"][0]["title"] == "a"
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_search_batch_caps_concurrency(monkeypatch):
+    calls: List[str] = []
+    active = [0, 0]
+    searcher = make_searcher(lambda request: html_response(""))
+    monkeypatch.setattr(searcher, "search_web", fake_search_web(calls, active))
+
+    results = await searcher.search_batch([f"q{i}" for i in range(7)], concurrency=2)
+    assert len(results) == 7
+    assert active[1] == 2
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_search_batch_isolates_failures(monkeypatch):
+    calls: List[str] = []
+    searcher = make_searcher(lambda request: html_response(""))
+    monkeypatch.setattr(searcher, "search_web", fake_search_web(calls, [0, 0]))
+    monkeypatch.setattr(ddg, "searcher", searcher)
+
+    results = await searcher.search_batch(["ok", "error-1", "empty", "ok-2"])
+    assert [outcome["status"] for outcome in results.values()] == ["success", "error", "no_results", "success"]
+    assert results["error-1"] == {"status": "error", "error": "error-1 실패", "results_count": 0, "results": []}
+
+    # MCP 도구는 실패한 검색어가 있어도 전체 호출은 성공으로 응답합니다
+    response = json.loads(await ddg.search_batch(["ok", "error-1", "ok"]))
+    assert response["status"] == "success"
+    assert (response["queries_count"], response["succeeded_count"]) == (2, 1)
+
+    assert json.loads(await ddg.search_batch([]))["status"] == "error"
+    too_many = [f"q{i}" for i in range(ddg.BATCH_MAX_QUERIES + 1)]
+    assert json.loads(await ddg.search_batch(too_many))["status"] == "error"
+    await searcher.close()
+
+
+# --- 스트리밍 검색: 진행 알림과 늦게 합류한 호출자의 재전송 ---
+
+class FakeContext:
+    """report_progress로 받은 진행 알림을 기록하는 MCP Context 대역 (fail이면 전송 실패를 흉내 냄)"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.progress: List[Any] = []
+
+    async def report_progress(self, progress: float, total: float = None, message: str = None) -> None:
+        if self.fail:
+            raise ConnectionResetError("클라이언트 연결 종료")
+        self.progress.append((progress, total, json.loads(message)))
+
+    def urls(self) -> List[str]:
+        return [item["url"] for _, _, item in self.progress]
+
+
+@pytest.mark.asyncio
+async def test_stream_follower_receives_replayed_and_live_progress(monkeypatch):
+    monkeypatch.setattr(ddg, "LITE_PAGE_SIZE", 3)
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 10)
+    first_urls = ["https://a.example/", "https://b.example/", "https://c.example/"]
+    second_urls = ["https://d.example/", "https://e.example/", "https://f.example/"]
+    release = asyncio.Event()
+    requests: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        offset = dict(httpx.QueryParams(request.content.decode())).get("s", "")
+        requests.append(offset)
+        if offset:
+            await release.wait()
+            return html_response(lite_page_html(second_urls))
+        return html_response(lite_page_html(first_urls, 3))
+
+    searcher = make_searcher(handler)
+    monkeypatch.setattr(ddg, "searcher", searcher)
+    leader_ctx, follower_ctx = FakeContext(), FakeContext()
+
+    leader = asyncio.create_task(ddg.search_web("python", 6, stream=True, ctx=leader_ctx))
+    assert await wait_for(lambda: len(leader_ctx.progress) == 3)
+    follower = asyncio.create_task(ddg.search_web("python", 6, stream=True, ctx=follower_ctx))
+    # 뒤따른 호출자는 이미 전달된 결과를 먼저 재전송받습니다
+    assert await wait_for(lambda: len(follower_ctx.progress) == 3)
+    release.set()
+    leader_response, follower_response = map(json.loads, await asyncio.gather(leader, follower))
+
+    assert requests == ["", "3"]
+    assert searcher.single_flight.get_stats()["coalesced"] == 1
+    assert leader_ctx.urls() == follower_ctx.urls() == first_urls + second_urls
+    assert [progress for progress, _, _ in follower_ctx.progress] == [1, 2, 3, 4, 5, 6]
+    assert all(total == 6 for _, total, _ in follower_ctx.progress)
+    assert leader_response == follower_response
+    assert leader_response["streamed_count"] == 6
+    assert [result["url"] for result in leader_response["results"]] == first_urls + second_urls
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_listener_failure_is_logged_and_dropped(monkeypatch, caplog):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.02)
+        return html_response(load_fixture("lite.html"))
+
+    searcher = make_searcher(handler)
+    monkeypatch.setattr(ddg, "searcher", searcher)
+    broken_ctx, healthy_ctx = FakeContext(fail=True), FakeContext()
+
+    responses = await asyncio.gather(
+        ddg.search_web("python", 5, stream=True, ctx=broken_ctx),
+        ddg.search_web("python", 5, stream=True, ctx=healthy_ctx),
+    )
+    broken, healthy = map(json.loads, responses)
+
+    # 전송에 실패한 호출자는 한 번만 기록되고 이후 전달 대상에서 빠지며, 다른 호출자는 영향을 받지 않습니다
+    assert [record.getMessage() for record in caplog.records] == ["중간 결과 전달 중 오류: 클라이언트 연결 종료"]
+    assert len(healthy_ctx.progress) == 5
+    assert healthy["streamed_count"] == 5
+    assert broken["status"] == healthy["status"] == "success"
+    assert broken["results"] == healthy["results"]
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_with_failing_engine_returns_empty_to_every_caller(monkeypatch):
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 0.01)
+    requests: List[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.02)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    searcher = make_searcher(handler)
+    monkeypatch.setattr(ddg, "searcher", searcher)
+    contexts = [FakeContext(), FakeContext()]
+
+    responses = await asyncio.gather(*(
+        ddg.search_web("python", 5, stream=True, ctx=ctx) for ctx in contexts
+    ))
+
+    first, second = map(json.loads, responses)
+    assert first == second
+    # Lite와 폴백이 모두 실패하면 모든 호출자가 같은 빈 결과를 받고 진행 알림은 없습니다
+    assert first["status"] == "success"
+    assert first["results_count"] == 0
+    assert all(ctx.progress == [] for ctx in contexts)
+    assert searcher.single_flight.get_stats()["executions"] == 1
+    await searcher.close()
+
+
+# --- Lite 다음 페이지 따라가기와 URL 중복 제거 ---
+
+def lite_page_html(urls: List[str], next_offset: int = 0) -> str:
+    """결과 행과 (next_offset이 있으면) 다음 페이지 폼을 가진 Lite 페이지를 만듭니다."""
+    rows = "".join(
+        f'<tr><td><a rel="nofollow" href="{url}" class="result-link">Result {url}</a></td></tr>'
+        f'<tr><td class="result-snippet">Snippet for {url}</td></tr>'
+        for url in urls
+    )
+    form = (
+        '<form action="/lite/" method="post">'
+        '<input type="submit" class="navbutton" value="Next Page &gt;">'
+        '<input type="hidden" name="q" value="python">'
+        f'<input type="hidden" name="s" value="{next_offset}">'
+        '</form>'
+    ) if next_offset else ""
+    return f"<html><body><table>{rows}</table>{form}</body></html>"
+
+
+@pytest.mark.asyncio
+async def test_lite_pagination_follows_next_form_and_dedupes(monkeypatch):
+    monkeypatch.setattr(ddg, "LITE_PAGE_SIZE", 3)
+    pages = {
+        "": lite_page_html(["https://a.example/", "https://b.example/x", "https://c.example/"], 3),
+        # www., 끝의 슬래시, 추적 파라미터만 다른 URL은 중복으로 처리됩니다
+        "3": lite_page_html([
+            "https://www.a.example",
+            "https://b.example/x/?utm_source=ddg",
+            "https://d.example/",
+            "https://e.example/",
+        ], 7),
+        "7": lite_page_html(["https://f.example/", "https://g.example/"]),
+    }
+    offsets: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = dict(httpx.QueryParams(request.content.decode()))
+        offsets.append(form.get("s", ""))
+        return html_response(pages[form.get("s", "")])
+
+    for parser in ("bs4", "lxml"):
+        offsets.clear()
+        searcher = make_searcher(handler, parser=ddg.get_parser(parser))
+        results = await searcher.search_web_lite("python", 6)
+
+        assert [result["url"] for result in results] == [
+            "https://a.example/",
+            "https://b.example/x",
+            "https://c.example/",
+            "https://d.example/",
+            "https://e.example/",
+            "https://f.example/",
+        ]
+        assert offsets == ["", "3", "7"]
+        await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_lite_pagination_stops_when_enough_results():
+    offsets: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = dict(httpx.QueryParams(request.content.decode()))
+        offsets.append(form.get("s", ""))
+        return html_response(lite_page_html([f"https://{i}.example/" for i in range(5)], 5))
+
+    searcher = make_searcher(handler)
+    results = await searcher.search_web_lite("python", 3)
+
+    assert len(results) == 3
+    assert offsets == [""]
+    await searcher.close()
+
+
+# --- 엔드포인트별 서킷 브레이커 ---
+
+def time_travel(breaker: ddg.CircuitBreaker, seconds: float) -> None:
+    """브레이커가 열린 시각을 seconds만큼 앞당겨 cooldown 대기를 건너뜁니다."""
+    breaker.opened_at -= seconds
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = ddg.CircuitBreaker(window=4, min_requests=4, failure_ratio=0.5, cooldown=0.05, max_cooldown=0.2)
+    for ok in (True, False, True):
+        breaker.record(ok, 0.01)
+    assert breaker.state == breaker.CLOSED
+    breaker.record(False, 0.01)
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+    # cooldown이 지나면 탐색 요청 하나만 통과시킵니다
+    time_travel(breaker, 0.05)
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()
+
+    # 탐색이 실패하면 cooldown을 두 배로 늘려 다시 엽니다
+    breaker.record(False, 0.01)
+    assert breaker.state == breaker.OPEN
+    assert breaker.cooldown == pytest.approx(0.1)
+
+    time_travel(breaker, 0.1)
+    assert breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == breaker.CLOSED
+    assert breaker.cooldown == pytest.approx(0.05)
+    assert breaker.get_stats()["failure_rate"] == 0.0
+
+
+def test_breaker_release_frees_probe_slot():
+    breaker = ddg.CircuitBreaker(window=2, min_requests=1, failure_ratio=0.5, cooldown=0.05)
+    breaker.record(False, 0.01)
+    time_travel(breaker, 0.05)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_rejects_without_network_and_skips_lite(monkeypatch):
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 5)
+    hosts: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "lite.duckduckgo.com":
+            return httpx.Response(503)
+        return html_response(load_fixture("fallback.html"))
+
+    searcher = make_searcher(
+        handler,
+        breakers=ddg.EndpointBreakers(window=2, min_requests=2, failure_ratio=0.5, cooldown=60),
+    )
+    for _ in range(2):
+        await searcher._fetch_lite_page({"q": "python"})
+    assert searcher.breakers.get("lite").state == ddg.CircuitBreaker.OPEN
+
+    with pytest.raises(ddg.CircuitOpenError):
+        await searcher._fetch_lite_page({"q": "python"})
+    assert hosts.count("lite.duckduckgo.com") == 2
+
+    # Lite가 차단 중이면 헤지 지연 없이 대안 검색으로 바로 응답합니다
+    results = await asyncio.wait_for(searcher._search_web_uncached("python", 5), timeout=1)
+    assert results
+    assert searcher.hedge_stats["lite_skipped"] == 1
+    assert hosts.count("lite.duckduckgo.com") == 2
+    await searcher.close()
+
+
+# --- SQLite 영속 캐시와 백그라운드 플러시 ---
+
+async def read_back(path: str, key) -> Any:
+    """같은 파일을 새 캐시로 열어 디스크에 기록된 값을 읽습니다."""
+    cache = ddg.SqliteSearchCache(path=str(path), flush_interval=3600)
+    await cache.start()
+    try:
+        return (await cache.lookup(key))[1]
+    finally:
+        await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_persists_across_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ddg.SqliteSearchCache(path=str(path), flush_interval=3600)
+    await cache.start()
+    cache.set(("web", "python"), ["result"], ttl=60)
+    await cache.close()
+
+    assert await read_back(path, ("web", "python")) == ["result"]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_requeued_without_overwriting_newer_writes(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ddg.SqliteSearchCache(path=str(path), flush_interval=3600)
+    await cache.start()
+    write_batch = cache._write_batch
+    entered = threading.Event()
+    release = threading.Event()
+
+    def failing_write_batch(writes, touches):
+        entered.set()
+        release.wait(5)
+        raise sqlite3.OperationalError("database is locked")
+
+    cache._write_batch = failing_write_batch
+    cache.set(("web", "a"), ["old a"], ttl=60)
+    cache.set(("web", "b"), ["b"], ttl=60)
+    flush = asyncio.create_task(cache.flush())
+    await asyncio.to_thread(entered.wait, 5)
+    # 기록이 진행되는 동안 들어온 더 새로운 값은 되돌아온 배치에 덮어쓰이지 않습니다
+    cache.set(("web", "a"), ["new a"], ttl=60)
+    release.set()
+    with pytest.raises(sqlite3.OperationalError):
+        await flush
+    assert cache.flush_errors == 1
+    assert len(cache._pending_writes) == 2
+
+    cache._write_batch = write_batch
+    await cache.close()
+    assert await read_back(path, ("web", "a")) == ["new a"]
+    assert await read_back(path, ("web", "b")) == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_flush_loop_survives_unexpected_errors(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ddg.SqliteSearchCache(path=str(path), flush_interval=0.01)
+    await cache.start()
+    write_batch = cache._write_batch
+    failures = []
+
+    def flaky_write_batch(writes, touches):
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("disk full")
+        write_batch(writes, touches)
+
+    cache._write_batch = flaky_write_batch
+    cache.set(("web", "python"), ["result"], ttl=60)
+    for _ in range(100):
+        if cache.flushes:
+            break
+        await asyncio.sleep(0.01)
+
+    assert failures and cache.flushes >= 1
+    assert not cache._flush_task.done()
+    assert not cache._pending_writes
+    await cache.close()
+    assert await read_back(path, ("web", "python")) == ["result"]
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_in_flight_flush(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ddg.SqliteSearchCache(path=str(path), flush_interval=0.01)
+    await cache.start()
+    write_batch = cache._write_batch
+    entered = threading.Event()
+
+    def slow_write_batch(writes, touches):
+        entered.set()
+        time.sleep(0.2)
+        write_batch(writes, touches)
+
+    cache._write_batch = slow_write_batch
+    cache.set(("web", "python"), ["result"], ttl=60)
+    await asyncio.to_thread(entered.wait, 5)
+    # 주기적 기록 루프가 스레드에서 기록하는 도중에 닫습니다
+    await cache.close()
+
+    assert cache.flushes == 1
+    assert cache.flush_errors == 0
+    assert await read_back(path, ("web", "python")) == ["result"]
+
+
+# --- 페이지 본문 스트리밍 읽기와 크기 제한 ---
+
+def chunked(*chunks: bytes):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+    return body()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "make_response, truncated, size",
+    [
+        # 한도를 정확히 채운 청크 뒤에 데이터가 더 있으면 잘린 것입니다
+        (lambda: httpx.Response(200, content=chunked(b"a" * 100, b"b" * 100)), True, 100),
+        (lambda: httpx.Response(200, content=chunked(b"a" * 100)), False, 100),
+        (lambda: httpx.Response(200, content=b"a" * 100), False, 100),
+        (lambda: httpx.Response(200, content=chunked(b"a" * 60, b"b" * 60)), True, 100),
+        (lambda: httpx.Response(200, content=chunked(b"a" * 60)), False, 60),
+    ],
+)
+async def test_read_page_reports_truncation(make_response, truncated, size):
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = make_response()
+        response.headers["content-type"] = "text/plain; charset=utf-8"
+        return response
+
+    searcher = make_searcher(handler)
+    page = await searcher.read_page("https://example.com/page", max_bytes=100)
+
+    assert page["status"] == "success"
+    assert page["truncated"] is truncated
+    assert page["bytes"] == size
+    await searcher.close()
+
+
+# --- 연합 검색: RRF와 Brave 응답 헤더 기반 속도 제한 ---
+
+def test_reciprocal_rank_fusion_orders_by_summed_score():
+    rankings = {
+        "duckduckgo": [
+            {"title": "A", "url": "https://a.example/", "description": "설명 없음"},
+            {"title": "B", "url": "https://b.example/", "description": "b from ddg"},
+            {"title": "C", "url": "https://c.example/", "description": "c"},
+        ],
+        "brave": [
+            {"title": "B (brave)", "url": "https://b.example/", "description": "b from brave"},
+            {"title": "D", "url": "https://d.example/", "description": "d"},
+            {"title": "A (brave)", "url": "https://www.a.example?utm_source=x", "description": "a from brave"},
+        ],
+    }
+    fused = ddg.reciprocal_rank_fusion(rankings, max_results=10, k=60)
+
+    # B: 1/62 + 1/61, A: 1/61 + 1/63, D: 1/62, C: 1/63
+    assert [entry["url"] for entry in fused] == [
+        "https://b.example/", "https://a.example/", "https://d.example/", "https://c.example/",
+    ]
+    assert fused[0]["title"] == "B (brave)"
+    assert fused[0]["ranks"] == {"duckduckgo": 2, "brave": 1}
+    assert fused[0]["score"] == round(1 / 62 + 1 / 61, 6)
+    # 더 높은 순위의 설명이 비어 있으면 다른 백엔드의 설명으로 채웁니다
+    assert fused[1]["description"] == "a from brave"
+    assert fused[1]["sources"] == ["duckduckgo", "brave"]
+    assert len(ddg.reciprocal_rank_fusion(rankings, max_results=2)) == 2
+
+
+def brave_handler(calls: List[httpx.Request], status: int = 200, headers: Dict[str, str] = None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        body = {"web": {"results": [{"title": "T", "url": "https://t.example/", "description": "d"}]}}
+        return httpx.Response(status, json=body, headers=headers or {})
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_brave_quota_exhaustion_holds_breaker_until_reset(monkeypatch):
+    monkeypatch.setattr(ddg, "BRAVE_API_KEY", "test-key")
+    calls: List[httpx.Request] = []
+    searcher = make_searcher(brave_handler(calls, headers={
+        "X-RateLimit-Limit": "1, 15000",
+        "X-RateLimit-Remaining": "0, 0",
+        "X-RateLimit-Reset": "1, 3600",
+    }))
+
+    assert len(await searcher.search_brave("first")) == 1
+    breaker = searcher.breakers.get("brave")
+    assert breaker.state == ddg.CircuitBreaker.OPEN
+    assert breaker.retry_in() == pytest.approx(3600, abs=1)
+    # 초당 한도에 맞춰 요청 간격을 줄입니다
+    assert searcher.rate_limiter.get_stats()["api.search.brave.com"]["base_rate_per_second"] == 1
+
+    with pytest.raises(ddg.CircuitOpenError):
+        await searcher.search_brave("second")
+    assert len(calls) == 1
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "headers, expected_wait",
+    [
+        ({"Retry-After": "7"}, 7),
+        ({"X-RateLimit-Limit": "1, 15000", "X-RateLimit-Remaining": "0, 10", "X-RateLimit-Reset": "1, 900"}, 900),
+        ({}, 1),
+    ],
+)
+async def test_brave_429_opens_breaker_for_retry_after(monkeypatch, headers, expected_wait):
+    monkeypatch.setattr(ddg, "BRAVE_API_KEY", "test-key")
+    calls: List[httpx.Request] = []
+    searcher = make_searcher(brave_handler(calls, status=429, headers=headers))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await searcher.search_brave("python")
+    breaker = searcher.breakers.get("brave")
+    assert breaker.state == ddg.CircuitBreaker.OPEN
+    assert breaker.retry_in() == pytest.approx(expected_wait, abs=0.5)
+    await searcher.close()
+
+
+@pytest.mark.asyncio
+async def test_brave_remaining_quota_keeps_breaker_closed(monkeypatch):
+    monkeypatch.setattr(ddg, "BRAVE_API_KEY", "test-key")
+    calls: List[httpx.Request] = []
+    searcher = make_searcher(brave_handler(calls, headers={
+        "X-RateLimit-Limit": "20, 15000",
+        "X-RateLimit-Remaining": "19, 14000",
+        "X-RateLimit-Reset": "1, 3600",
+    }))
+
+    await searcher.search_brave("python")
+    assert searcher.breakers.get("brave").state == ddg.CircuitBreaker.CLOSED
+    await searcher.close()
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert ddg.parse_retry_after("12") == 12
+    assert ddg.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert ddg.parse_retry_after("soon") is None
+    assert ddg.parse_retry_after(None) is None
+
+
+# --- /metrics 노출: 단계별 히스토그램, 카운터, 느린 쿼리 로그 ---
+
+def metric_value(body: str, sample: str) -> float:
+    """exposition 본문에서 이름과 레이블이 정확히 일치하는 샘플의 값을 찾습니다."""
+    for line in body.splitlines():
+        name, _, value = line.rpartition(" ")
+        if name == sample:
+            return float(value)
+    raise AssertionError(f"{sample} 샘플이 없습니다")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_after_one_search(monkeypatch, caplog):
+    # 모듈의 도구들이 기록하는 전역 metrics의 상태를 이 테스트 동안만 비웁니다
+    monkeypatch.setattr(ddg.metrics, "_stages", {})
+    monkeypatch.setattr(ddg.metrics, "_tools", {})
+    monkeypatch.setattr(ddg.metrics, "slow_queries", 0)
+    monkeypatch.setattr(ddg.metrics, "slow_query_ms", 0.001)
+    monkeypatch.setattr(ddg.metrics, "slow_query_log", "")
+    monkeypatch.setattr(ddg, "HEDGE_DELAY", 10)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return html_response(load_fixture("lite.html"))
+
+    searcher = make_searcher(handler, metrics=ddg.metrics)
+    monkeypatch.setattr(ddg, "searcher", searcher)
+    assert json.loads(await ddg.search_web("python asyncio", 5))["results_count"] == 5
+
+    transport = httpx.ASGITransport(app=ddg.mcp.streamable_http_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+
+    assert metric_value(body, "ddg_upstream_requests_total") == 1
+    assert metric_value(body, 'ddg_cache_lookups_total{result="miss"}') == 1
+    assert metric_value(body, 'ddg_cache_lookups_total{result="hit"}') == 0
+    assert metric_value(body, "ddg_single_flight_coalesced_total") == 0
+    assert metric_value(body, 'ddg_breaker_state{endpoint="lite",state="closed"}') == 1
+    assert metric_value(body, 'ddg_tool_duration_seconds_count{tool="search_web"}') == 1
+    assert metric_value(body, 'ddg_tool_duration_seconds_bucket{tool="search_web",le="+Inf"}') == 1
+    for stage in ("rate_limit_wait", "network", "parse"):
+        assert metric_value(body, f'ddg_stage_duration_seconds_count{{stage="{stage}",endpoint="lite"}}') == 1
+    assert metric_value(body, 'ddg_stage_duration_seconds_sum{stage="network",endpoint="lite"}') >= 0.01
+    assert metric_value(body, 'ddg_stage_duration_seconds_count{stage="serialize",endpoint=""}') == 1
+
+    # 느린 쿼리는 표준 출력이 아니라 로거로 단계별 내역과 함께 기록됩니다
+    assert metric_value(body, "ddg_slow_queries_total") == 1
+    [record] = [record for record in caplog.records if record.getMessage().startswith("느린 쿼리: ")]
+    entry = json.loads(record.getMessage().split(": ", 1)[1])
+    assert (entry["tool"], entry["query"]) == ("search_web", "python asyncio")
+    assert "network:lite" in entry["stages_ms"]
+    await searcher.close()
@@ -0,0 +1,3 @@
+# test_setup.py is a manual smoke script that calls the live Upbit API and a running server;
+# run it with `uv run python test_setup.py` instead of collecting it.
+collect_ignore = ["test_setup.py"]
@@ -0,0 +1,373 @@
+"""Historical candle backfill into a local NumPy columnar store."""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .resample import bucket_start, parse_timeframe, resample
+from .upbit_client import UpbitClient, get_upbit_client
+
+# Store settings (overridable via environment variables)
+CANDLE_DIR = os.path.expanduser(os.getenv("UPBIT_CANDLE_DIR", "~/.cache/mcp-upbit/candles"))
+# Candle pages requested at once; the client's rate limiter still paces them
+BACKFILL_CONCURRENCY = int(os.getenv("UPBIT_BACKFILL_CONCURRENCY", "4"))
+# Fetched rows held in memory before a long backfill writes them out (one write per backfill below this)
+BACKFILL_FLUSH_ROWS = int(os.getenv("UPBIT_BACKFILL_FLUSH_ROWS", "100000"))
+
+# Upbit returns at most this many candles per request
+PAGE_SIZE = 200
+
+# Supported units in minutes (1440 = daily candles)
+CANDLE_UNITS = [1, 3, 5, 10, 15, 30, 60, 240, 1440]
+DAY_UNIT = 1440
+
+# Stored columns: candle start time (epoch seconds, UTC) and OHLCV values
+COLUMNS = {
+    "time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "value": np.float64,
+}
+
+# Upbit candle fields for each stored column
+SOURCE_FIELDS = {
+    "open": "opening_price",
+    "high": "high_price",
+    "low": "low_price",
+    "close": "trade_price",
+    "volume": "candle_acc_trade_volume",
+    "value": "candle_acc_trade_price",
+}
+
+
+def parse_time(value: str) -> int:
+    """Parse an ISO 8601 date or datetime (UTC unless an offset is given) into epoch seconds."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def format_time(epoch: int) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def candles_to_columns(candles: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Convert Upbit candle dicts into column arrays."""
+    columns = {
+        "time": np.array(
+            [parse_time(candle["candle_date_time_utc"]) for candle in candles], dtype=COLUMNS["time"]
+        )
+    }
+    for column, field in SOURCE_FIELDS.items():
+        columns[column] = np.array([candle[field] for candle in candles], dtype=COLUMNS[column])
+    return columns
+
+
+def columns_to_rows(columns: Dict[str, np.ndarray], limit: Optional[int]) -> List[Dict[str, Any]]:
+    """The last `limit` rows (all when limit is falsy) as JSON-friendly dicts."""
+    rows = len(columns["time"])
+    first = 0 if not limit else max(0, rows - limit)
+    return [
+        {
+            "time": format_time(columns["time"][index]),
+            **{name: float(columns[name][index]) for name in SOURCE_FIELDS},
+        }
+        for index in range(first, rows)
+    ]
+
+
+class CandleSeries:
+    """Candles of one (market, unit) stored as one .npy file per column plus coverage metadata.
+
+    Rows are sorted by time and unique. The covered range is kept separately from the
+    rows because Upbit omits candles for periods without trades, so the data alone
+    cannot tell a quiet period from a range that was never fetched.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.covered_from: Optional[int] = None
+        self.covered_to: Optional[int] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._pending: List[Dict[str, np.ndarray]] = []
+        self._pending_range: Optional[Tuple[int, int]] = None
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.covered_from = meta["covered_from"]
+            self.covered_to = meta["covered_to"]
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Column arrays, memory-mapped from disk on first access."""
+        if self._columns is None:
+            if self.covered_from is None:
+                self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            else:
+                self._columns = {
+                    name: np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+                    for name in COLUMNS
+                }
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Column views of rows with start <= time < end."""
+        times = self.columns["time"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+    @property
+    def pending_rows(self) -> int:
+        return sum(len(rows["time"]) for rows in self._pending)
+
+    def stage(self, new: Dict[str, np.ndarray], covered_from: int, covered_to: int) -> None:
+        """Hold fetched rows in memory until the next flush, extending the range they cover."""
+        self._pending.append(new)
+        if self._pending_range is None:
+            self._pending_range = (covered_from, covered_to)
+        else:
+            self._pending_range = (min(self._pending_range[0], covered_from), max(self._pending_range[1], covered_to))
+
+    async def flush(self) -> None:
+        """Merge all staged rows in a single write, run in a worker thread to keep the event loop free."""
+        if self._pending_range is None:
+            return
+        new = {name: np.concatenate([rows[name] for rows in self._pending]) for name in COLUMNS}
+        covered_from, covered_to = self._pending_range
+        self._pending, self._pending_range = [], None
+        await asyncio.to_thread(self.merge, new, covered_from, covered_to)
+
+    def merge(self, new: Dict[str, np.ndarray], covered_from: int, covered_to: int) -> None:
+        """Merge new rows, extend the covered range and persist every column atomically."""
+        current = self.columns
+        merged_time = np.concatenate([current["time"], new["time"]])
+        # Keep the newest copy of a duplicated candle (new rows come last)
+        order = np.argsort(merged_time, kind="stable")
+        sorted_time = merged_time[order]
+        keep = np.ones(len(sorted_time), dtype=bool)
+        keep[:-1] = sorted_time[:-1] != sorted_time[1:]
+        rows = order[keep]
+
+        os.makedirs(self.directory, exist_ok=True)
+        columns = {}
+        for name in COLUMNS:
+            columns[name] = np.concatenate([current[name], new[name]])[rows]
+            temp_path = os.path.join(self.directory, f"{name}.tmp.npy")
+            np.save(temp_path, columns[name])
+            os.replace(temp_path, os.path.join(self.directory, f"{name}.npy"))
+
+        self.covered_from = covered_from if self.covered_from is None else min(self.covered_from, covered_from)
+        self.covered_to = covered_to if self.covered_to is None else max(self.covered_to, covered_to)
+        temp_path = os.path.join(self.directory, "meta.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"covered_from": self.covered_from, "covered_to": self.covered_to}, f)
+        os.replace(temp_path, os.path.join(self.directory, "meta.json"))
+        self._columns = columns
+
+
+class CandleStore:
+    """Backfills Upbit candles into per-(market, unit) columnar files.
+
+    A request for [start, end) only fetches what lies outside the covered range: the
+    missing tail is paged forward from the last stored candle and the missing head is
+    paged backwards with the `to` parameter. Pages are fixed windows of PAGE_SIZE
+    periods, so several of them can be requested at once under the client's rate
+    limiter. Finished batches are staged in memory and written once per backfill
+    (or every BACKFILL_FLUSH_ROWS rows), so long ranges do not rewrite the files per batch.
+    """
+
+    def __init__(self, client: Optional[UpbitClient] = None, directory: str = CANDLE_DIR):
+        self.client = client or get_upbit_client()
+        self.directory = directory
+        self._series: Dict[Tuple[str, int], CandleSeries] = {}
+        self._locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+
+    def series(self, market: str, unit: int) -> CandleSeries:
+        key = (market, unit)
+        series = self._series.get(key)
+        if series is None:
+            folder = "days" if unit == DAY_UNIT else f"minutes_{unit}"
+            series = self._series[key] = CandleSeries(os.path.join(self.directory, market, folder))
+        return series
+
+    async def _fetch_page(self, market: str, unit: int, to: int) -> Dict[str, np.ndarray]:
+        """Fetch up to PAGE_SIZE candles that start before `to`."""
+        if unit == DAY_UNIT:
+            candles = await self.client.get_candles_days(market, PAGE_SIZE, format_time(to))
+        else:
+            candles = await self.client.get_candles_minutes(unit, market, PAGE_SIZE, format_time(to))
+        return candles_to_columns(candles)
+
+    async def _fetch_windows(
+        self,
+        market: str,
+        unit: int,
+        window_ends: List[int],
+        start: int,
+        end: int,
+    ) -> Tuple[Dict[str, np.ndarray], bool, int]:
+        """Fetch a batch of windows; returns (rows in [start, end), data exhausted, requests)."""
+        pages = await asyncio.gather(*(self._fetch_page(market, unit, to) for to in window_ends))
+        exhausted = any(len(page["time"]) == 0 for page in pages)
+        merged = {name: np.concatenate([page[name] for page in pages]) for name in COLUMNS}
+        mask = (merged["time"] >= start) & (merged["time"] < end)
+        return {name: column[mask] for name, column in merged.items()}, exhausted, len(pages)
+
+    async def _fill_backward(self, market: str, unit: int, series: CandleSeries, start: int, end: int) -> int:
+        """Page backwards from end to start, newest window first; returns the number of requests."""
+        window = PAGE_SIZE * unit * 60
+        window_ends = list(range(end, start, -window))
+        requests = 0
+        for index in range(0, len(window_ends), BACKFILL_CONCURRENCY):
+            batch = window_ends[index:index + BACKFILL_CONCURRENCY]
+            rows, exhausted, count = await self._fetch_windows(market, unit, batch, start, end)
+            requests += count
+            covered_from = start if exhausted else max(start, batch[-1] - window)
+            series.stage(rows, covered_from, end)
+            if series.pending_rows >= BACKFILL_FLUSH_ROWS:
+                await series.flush()
+            if exhausted:
+                # No candles exist before this point (e.g. before the market was listed)
+                break
+        return requests
+
+    async def _fill_forward(self, market: str, unit: int, series: CandleSeries, start: int, end: int) -> int:
+        """Page forwards from start to end, oldest window first; returns the number of requests."""
+        window = PAGE_SIZE * unit * 60
+        window_ends = [min(to, end) for to in range(start + window, end + window, window)]
+        requests = 0
+        for index in range(0, len(window_ends), BACKFILL_CONCURRENCY):
+            batch = window_ends[index:index + BACKFILL_CONCURRENCY]
+            rows, _, count = await self._fetch_windows(market, unit, batch, start, end)
+            requests += count
+            series.stage(rows, start, batch[-1])
+            if series.pending_rows >= BACKFILL_FLUSH_ROWS:
+                await series.flush()
+        return requests
+
+    async def backfill(self, market: str, unit: int, start: int, end: Optional[int] = None) -> Dict[str, Any]:
+        """Make sure [start, end) is stored locally, fetching only the missing head and tail.
+
+        Only completed candles are stored, so end is clamped to the start of the current period.
+        """
+        if unit not in CANDLE_UNITS:
+            raise ValueError(f"unit must be one of {CANDLE_UNITS}")
+        market = (await self.client.validate_markets([market]))[0]
+        period = unit * 60
+        now = int(time.time())
+        end = min(now if end is None else end, now) // period * period
+        start = start // period * period
+        if start >= end:
+            raise ValueError("start must be before end")
+
+        key = (market, unit)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            series = self.series(market, unit)
+            stored = len(series)
+            requests = 0
+            try:
+                if series.covered_from is None:
+                    requests += await self._fill_backward(market, unit, series, start, end)
+                else:
+                    covered_from, covered_to = series.covered_from, series.covered_to
+                    if end > covered_to:
+                        requests += await self._fill_forward(market, unit, series, covered_to, end)
+                    if start < covered_from:
+                        requests += await self._fill_backward(market, unit, series, start, covered_from)
+            finally:
+                # Keep the batches fetched so far even when a later page fails
+                await series.flush()
+            fetched = len(series) - stored
+
+        return {
+            "market": market,
+            "unit": unit,
+            "start": start,
+            "end": end,
+            "fetched_candles": fetched,
+            "requests": requests,
+        }
+
+    async def get_history(
+        self,
+        market: str,
+        unit: int,
+        start: int,
+        end: Optional[int] = None,
+        limit: Optional[int] = PAGE_SIZE,
+    ) -> Dict[str, Any]:
+        """Backfill [start, end) and return a summary with the last `limit` candles of the range."""
+        result = await self.backfill(market, unit, start, end)
+        series = self.series(result["market"], unit)
+        columns = series.read(result["start"], result["end"])
+        return {
+            "market": result["market"],
+            "unit": unit,
+            "start": format_time(result["start"]),
+            "end": format_time(result["end"]),
+            "candles_in_range": len(columns["time"]),
+            "stored_candles": len(series),
+            "fetched_candles": result["fetched_candles"],
+            "requests": result["requests"],
+            "candles": columns_to_rows(columns, limit),
+        }
+
+    async def get_resampled(
+        self,
+        market: str,
+        timeframe: str,
+        start: int,
+        end: Optional[int] = None,
+        limit: Optional[int] = PAGE_SIZE,
+    ) -> Dict[str, Any]:
+        """Build `timeframe` candles (e.g. '2h', '1w') for [start, end) from stored 1-minute candles.
+
+        Only the 1-minute candles missing from the store are fetched, so a range that is
+        already covered needs no network request. Only complete buckets are returned.
+        """
+        period, origin = parse_timeframe(timeframe)
+        now = int(time.time())
+        start = bucket_start(start, period, origin)
+        end = bucket_start(min(now if end is None else end, now), period, origin)
+        if start >= end:
+            raise ValueError(f"Range must cover at least one complete {timeframe} candle")
+
+        result = await self.backfill(market, 1, start, end)
+        columns = resample(self.series(result["market"], 1).read(start, end), period, origin)
+        return {
+            "market": result["market"],
+            "timeframe": timeframe,
+            "start": format_time(start),
+            "end": format_time(end),
+            "candles_in_range": len(columns["time"]),
+            "fetched_candles": result["fetched_candles"],
+            "requests": result["requests"],
+            "candles": columns_to_rows(columns, limit),
+        }
+
+
+# Process-wide candle store shared by the MCP and HTTP servers
+_shared_store: Optional[CandleStore] = None
+
+
+def get_candle_store() -> CandleStore:
+    """Return the shared candle store (created on first use)."""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = CandleStore()
+    return _shared_store
@@ -7,7 +7,10 @@ import os
 from typing import Any, Dict, List, Optional
 
 from fastmcp import FastMCP, Context
-import httpx
+
+from .candles import CANDLE_UNITS, get_candle_store, parse_time
+from .indicators import get_indicator_engine, parse_indicator
+from .upbit_client import get_upbit_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -17,76 +20,8 @@ logger = logging.getLogger(__name__)
 mcp = FastMCP("Upbit Market Data")
 
 
-class UpbitClient:
-    """Client for Upbit public API."""
-
-    def __init__(self):
-        self.base_url = "https://api.upbit.com/v1"
-        self.client = httpx.AsyncClient()
-
-    async def get_markets(self) -> List[Dict[str, Any]]:
-        """Get all available markets."""
-        response = await self.client.get(f"{self.base_url}/market/all")
-        response.raise_for_status()
-        return response.json()
-
-    async def get_ticker(self, markets: str) -> List[Dict[str, Any]]:
-        """Get ticker information for specified markets."""
-        params = {"markets": markets}
-        response = await self.client.get(f"{self.base_url}/ticker", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def get_orderbook(self, markets: str) -> List[Dict[str, Any]]:
-        """Get orderbook for specified markets."""
-        params = {"markets": markets}
-        response = await self.client.get(f"{self.base_url}/orderbook", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def get_trades(self, market: str, count: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get recent trades for a market."""
-        params = {"market": market}
-        if count:
-            params["count"] = count
-        response = await self.client.get(f"{self.base_url}/trades/ticks", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def get_candles_minutes(
-        self,
-        unit: int,
-        market: str,
-        count: Optional[int] = None
-    ) -> List[Dict[str, Any]]:
-        """Get minute candles for a market."""
-        params = {"market": market}
-        if count:
-            params["count"] = count
-        response = await self.client.get(f"{self.base_url}/candles/minutes/{unit}", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def get_candles_days(
-        self,
-        market: str,
-        count: Optional[int] = None
-    ) -> List[Dict[str, Any]]:
-        """Get daily candles for a market."""
-        params = {"market": market}
-        if count:
-            params["count"] = count
-        response = await self.client.get(f"{self.base_url}/candles/days", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
-
-
-# Global client instance
-upbit_client = UpbitClient()
+# Global client instance (shared with the HTTP server, rate-limited per request group)
+upbit_client = get_upbit_client()
 
 # 다국어 지원을 위한 설명 딕셔너리
 TOOL_DESCRIPTIONS = {
@@ -113,6 +48,18 @@ TOOL_DESCRIPTIONS = {
     "get_candles_days": {
         "en": "Get daily candles for a market",
         "ko": "마켓의 일봉 데이터 조회"
+    },
+    "get_candle_history": {
+        "en": "Get a candle history range, backfilled into the local store",
+        "ko": "기간별 캔들 이력 조회 (로컬 저장소에 누적)"
+    },
+    "get_resampled_candles": {
+        "en": "Get candles of any timeframe built locally from stored 1-minute candles",
+        "ko": "저장된 1분봉으로 만든 임의 주기 캔들 조회"
+    },
+    "get_indicators": {
+        "en": "Get technical indicators computed on stored candles, updated incrementally",
+        "ko": "저장된 캔들로 계산한 기술적 지표 조회 (증분 갱신)"
     }
 }
 
@@ -138,6 +85,30 @@ ERROR_MESSAGES = {
         "en": "count must be between 1 and 200",
         "ko": "count는 1~200 사이의 값이어야 합니다"
     },
+    "depth_range": {
+        "en": "depth must be between 1 and 30",
+        "ko": "depth는 1~30 사이의 값이어야 합니다"
+    },
+    "history_unit_invalid": {
+        "en": "unit must be one of [1, 3, 5, 10, 15, 30, 60, 240, 1440]",
+        "ko": "unit은 [1, 3, 5, 10, 15, 30, 60, 240, 1440] 중 하나여야 합니다"
+    },
+    "time_invalid": {
+        "en": "start and end must be ISO 8601 dates (e.g., '2024-01-01' or '2024-01-01T09:00:00+09:00')",
+        "ko": "start와 end는 ISO 8601 형식이어야 합니다 (예: '2024-01-01', '2024-01-01T09:00:00+09:00')"
+    },
+    "indicators_required": {
+        "en": "indicators parameter is required (e.g., ['rsi', 'macd'])",
+        "ko": "indicators 파라미터가 필요합니다 (예: ['rsi', 'macd'])"
+    },
+    "indicator_invalid": {
+        "en": "indicators must be sma, ema, rsi, macd, bbands, atr or vwap with optional parameters (e.g., 'ema:50', 'bbands:20:2')",
+        "ko": "indicators는 sma, ema, rsi, macd, bbands, atr, vwap 중 하나이며 파라미터를 붙일 수 있습니다 (예: 'ema:50', 'bbands:20:2')"
+    },
+    "tail_range": {
+        "en": "tail must be between 1 and 200",
+        "ko": "tail은 1~200 사이의 값이어야 합니다"
+    },
     "unit_invalid": {
         "en": "unit must be one of [1, 3, 5, 10, 15, 30, 60, 240]",
         "ko": "unit은 [1, 3, 5, 10, 15, 30, 60, 240] 중 하나여야 합니다"
@@ -165,11 +136,24 @@ def detect_language(ctx: Context = None) -> str:
 
 
 @mcp.tool()
-async def get_markets(ctx: Context) -> str:
-    """업비트의 모든 사용 가능한 마켓 조회 / Get all available markets on Upbit"""
+async def get_markets(
+    quote: Optional[str] = None,
+    base: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: Optional[int] = None,
+    ctx: Context = None,
+) -> str:
+    """업비트의 모든 사용 가능한 마켓 조회 / Get all available markets on Upbit
+
+    Args:
+        quote: 기준 통화 필터 (예: 'KRW', 'BTC', 'USDT') / Quote currency filter (e.g., 'KRW', 'BTC', 'USDT')
+        base: 거래 자산 필터 (예: 'BTC') / Base asset filter (e.g., 'BTC')
+        name: 한글 또는 영문 이름 검색 (예: '비트코인', 'Ethereum') / Korean or English name search (e.g., '비트코인', 'Ethereum')
+        limit: 반환할 최대 마켓 수 / Maximum number of markets to return
+    """
     lang = detect_language(ctx)
     try:
-        data = await upbit_client.get_markets()
+        data = await upbit_client.get_markets(quote=quote, base=base, name=name, limit=limit)
         return json.dumps(data, ensure_ascii=False, indent=2)
     except Exception as e:
         logger.error(f"Error getting markets: {e}")
@@ -197,15 +181,18 @@ async def get_ticker(markets: str, ctx: Context) -> str:
 
 
 @mcp.tool()
-async def get_orderbook(markets: str, ctx: Context) -> str:
+async def get_orderbook(markets: str, depth: Optional[int] = None, ctx: Context = None) -> str:
     """지정된 마켓의 호가 정보 조회 / Get orderbook for specified markets.
 
     Args:
         markets: 쉼표로 구분된 마켓 코드 (예: 'KRW-BTC,KRW-ETH') / Comma-separated market codes (e.g., 'KRW-BTC,KRW-ETH')
+        depth: 반환할 상위 호가 단계 수 (최대 30) / Number of top price levels to return (max 30)
     """
     lang = detect_language(ctx)
     try:
-        data = await upbit_client.get_orderbook(markets)
+        if depth is not None and (depth < 1 or depth > 30):
+            return get_error_message("depth_range", lang)
+        data = await upbit_client.get_orderbook(markets, depth)
         return json.dumps(data, ensure_ascii=False, indent=2)
     except Exception as e:
         logger.error(f"Error getting orderbook: {e}")
@@ -280,6 +267,123 @@ async def get_candles_days(market: str, count: Optional[int] = None, ctx: Contex
         return f"Error: {str(e)}"
 
 
+@mcp.tool()
+async def get_candle_history(
+    market: str,
+    start: str,
+    end: Optional[str] = None,
+    unit: int = 1,
+    limit: Optional[int] = 200,
+    ctx: Context = None,
+) -> str:
+    """기간별 캔들 이력 조회 (로컬 저장소에 누적) / Get a candle history range, backfilled into the local store.
+
+    200개 제한 없이 start~end 구간을 자동으로 나눠 받아 저장하며, 이후 요청에서는 빠진 구간만 받습니다.
+    Pages past the 200-candle limit automatically and only fetches the missing part on later calls.
+
+    Args:
+        market: 마켓 코드 (예: 'KRW-BTC') / Market code (e.g., 'KRW-BTC')
+        start: 시작 시각 (ISO 8601, 기본 UTC) / Range start (ISO 8601, UTC unless an offset is given)
+        end: 종료 시각 (기본값: 현재) / Range end (default: now)
+        unit: 분 단위 (1, 3, 5, 10, 15, 30, 60, 240, 1440=일봉) / Minute unit (1440 = daily)
+        limit: 반환할 최근 캔들 수 (0이면 요약만) / Number of latest candles to return (0 for summary only)
+    """
+    lang = detect_language(ctx)
+    try:
+        if unit not in CANDLE_UNITS:
+            return get_error_message("history_unit_invalid", lang)
+        try:
+            start_time = parse_time(start)
+            end_time = parse_time(end) if end else None
+        except ValueError:
+            return get_error_message("time_invalid", lang)
+        data = await get_candle_store().get_history(market, unit, start_time, end_time, limit)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    except Exception as e:
+        logger.error(f"Error getting candle history: {e}")
+        if lang == "ko":
+            return f"오류: {str(e)}"
+        return f"Error: {str(e)}"
+
+
+@mcp.tool()
+async def get_resampled_candles(
+    market: str,
+    timeframe: str,
+    start: str,
+    end: Optional[str] = None,
+    limit: Optional[int] = 200,
+    ctx: Context = None,
+) -> str:
+    """저장된 1분봉으로 만든 임의 주기 캔들 조회 / Get candles of any timeframe built locally from stored 1-minute candles.
+
+    저장소에 없는 1분봉만 받아 오므로, 이미 저장된 구간은 네트워크 요청 없이 계산합니다.
+    Only missing 1-minute candles are fetched; ranges already stored need no network request.
+
+    Args:
+        market: 마켓 코드 (예: 'KRW-BTC') / Market code (e.g., 'KRW-BTC')
+        timeframe: 캔들 주기 (예: '15m', '2h', '1d', '1w') / Timeframe (e.g., '15m', '2h', '1d', '1w')
+        start: 시작 시각 (ISO 8601, 기본 UTC) / Range start (ISO 8601, UTC unless an offset is given)
+        end: 종료 시각 (기본값: 현재) / Range end (default: now)
+        limit: 반환할 최근 캔들 수 (0이면 요약만) / Number of latest candles to return (0 for summary only)
+    """
+    lang = detect_language(ctx)
+    try:
+        try:
+            start_time = parse_time(start)
+            end_time = parse_time(end) if end else None
+        except ValueError:
+            return get_error_message("time_invalid", lang)
+        data = await get_candle_store().get_resampled(market, timeframe, start_time, end_time, limit)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    except Exception as e:
+        logger.error(f"Error getting resampled candles: {e}")
+        if lang == "ko":
+            return f"오류: {str(e)}"
+        return f"Error: {str(e)}"
+
+
+@mcp.tool()
+async def get_indicators(
+    market: str,
+    indicators: List[str],
+    unit: int = 1,
+    tail: int = 1,
+    ctx: Context = None,
+) -> str:
+    """저장된 캔들로 계산한 기술적 지표 조회 (증분 갱신) / Get technical indicators computed on stored candles, updated incrementally.
+
+    지표 상태를 유지하므로 이후 요청에서는 새로 저장된 캔들만 계산합니다.
+    Indicator state is kept between calls, so later calls only compute the newly stored candles.
+
+    Args:
+        market: 마켓 코드 (예: 'KRW-BTC') / Market code (e.g., 'KRW-BTC')
+        indicators: 지표 목록 (예: ['rsi', 'ema:50', 'macd:12:26:9', 'bbands:20:2', 'atr', 'sma', 'vwap']) / Indicators with optional parameters
+        unit: 분 단위 (1, 3, 5, 10, 15, 30, 60, 240, 1440=일봉) / Minute unit (1440 = daily)
+        tail: 지표별로 반환할 최근 값 수 (1~200) / Number of latest values per indicator (1-200)
+    """
+    lang = detect_language(ctx)
+    try:
+        if not indicators:
+            return get_error_message("indicators_required", lang)
+        if unit not in CANDLE_UNITS:
+            return get_error_message("history_unit_invalid", lang)
+        if tail < 1 or tail > 200:
+            return get_error_message("tail_range", lang)
+        try:
+            for spec in indicators:
+                parse_indicator(spec)
+        except ValueError:
+            return get_error_message("indicator_invalid", lang)
+        data = await get_indicator_engine().get_indicators(market, unit, indicators, tail)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    except Exception as e:
+        logger.error(f"Error getting indicators: {e}")
+        if lang == "ko":
+            return f"오류: {str(e)}"
+        return f"Error: {str(e)}"
+
+
 def main():
     """Main entry point for the FastMCP server."""
     port = int(os.getenv("PORT", 10000))
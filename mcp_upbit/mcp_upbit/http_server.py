@@ -4,6 +4,7 @@ import asyncio
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
@@ -11,17 +12,34 @@ from pydantic import BaseModel
 import uvicorn
 import json as json_lib
 
-from .upbit_client import UpbitClient
+from .candles import get_candle_store, parse_time
+from .indicators import get_indicator_engine
+from .upbit_client import get_upbit_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create FastAPI app
-app = FastAPI(title="Upbit HTTP Server", description="HTTP server for Upbit market data")
+# Upbit client instance (shared with the FastMCP server, rate-limited per request group)
+upbit_client = get_upbit_client()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the WebSocket subscriber on startup and close the pooled HTTP connections on shutdown.
+
+    The subscriber only runs when UPBIT_WS_TICKER_MARKETS or UPBIT_WS_ORDERBOOK_MARKETS is set.
+    """
+    if upbit_client.realtime is not None:
+        upbit_client.realtime.ensure_started()
+    try:
+        yield
+    finally:
+        await upbit_client.close()
+
 
-# Upbit client instance
-upbit_client = UpbitClient()
+# Create FastAPI app
+app = FastAPI(title="Upbit HTTP Server", description="HTTP server for Upbit market data", lifespan=lifespan)
 
 
 # Pydantic models for requests
@@ -47,7 +65,25 @@ async def handle_list_tools() -> List[Dict[str, Any]]:
             "description": "Get all available markets on Upbit",
             "inputSchema": {
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "quote": {
+                        "type": "string",
+                        "description": "Quote currency filter (e.g., 'KRW', 'BTC', 'USDT')"
+                    },
+                    "base": {
+                        "type": "string",
+                        "description": "Base asset filter (e.g., 'BTC')"
+                    },
+                    "name": {
+                        "type": "string",
+                        "description": "Korean or English name search (e.g., '비트코인', 'Ethereum')"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of markets to return",
+                        "minimum": 1
+                    }
+                },
                 "required": []
             }
         },
@@ -74,6 +110,12 @@ async def handle_list_tools() -> List[Dict[str, Any]]:
                     "markets": {
                         "type": "string",
                         "description": "Comma-separated market codes (e.g., 'KRW-BTC,KRW-ETH')"
+                    },
+                    "depth": {
+                        "type": "integer",
+                        "description": "Number of top price levels to return (max 30)",
+                        "minimum": 1,
+                        "maximum": 30
                     }
                 },
                 "required": ["markets"]
@@ -143,6 +185,101 @@ async def handle_list_tools() -> List[Dict[str, Any]]:
                 },
                 "required": ["market"]
             }
+        },
+        {
+            "name": "get_candle_history",
+            "description": "Get a candle history range, backfilled into the local store",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "market": {
+                        "type": "string",
+                        "description": "Market code (e.g., 'KRW-BTC')"
+                    },
+                    "start": {
+                        "type": "string",
+                        "description": "Range start (ISO 8601, UTC unless an offset is given)"
+                    },
+                    "end": {
+                        "type": "string",
+                        "description": "Range end (ISO 8601, default: now)"
+                    },
+                    "unit": {
+                        "type": "integer",
+                        "description": "Minute unit (1440 = daily)",
+                        "enum": [1, 3, 5, 10, 15, 30, 60, 240, 1440]
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Number of latest candles to return (0 for summary only)",
+                        "minimum": 0
+                    }
+                },
+                "required": ["market", "start"]
+            }
+        },
+        {
+            "name": "get_resampled_candles",
+            "description": "Get candles of any timeframe built locally from stored 1-minute candles",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "market": {
+                        "type": "string",
+                        "description": "Market code (e.g., 'KRW-BTC')"
+                    },
+                    "timeframe": {
+                        "type": "string",
+                        "description": "Timeframe (e.g., '15m', '2h', '1d', '1w')"
+                    },
+                    "start": {
+                        "type": "string",
+                        "description": "Range start (ISO 8601, UTC unless an offset is given)"
+                    },
+                    "end": {
+                        "type": "string",
+                        "description": "Range end (ISO 8601, default: now)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Number of latest candles to return (0 for summary only)",
+                        "minimum": 0
+                    }
+                },
+                "required": ["market", "timeframe", "start"]
+            }
+        },
+        {
+            "name": "get_indicators",
+            "description": "Get technical indicators computed on stored candles, updated incrementally",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "market": {
+                        "type": "string",
+                        "description": "Market code (e.g., 'KRW-BTC')"
+                    },
+                    "unit": {
+                        "type": "integer",
+                        "description": "Candle unit in minutes (1440 = daily)",
+                        "enum": [1, 3, 5, 10, 15, 30, 60, 240, 1440],
+                        "default": 1
+                    },
+                    "indicators": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Indicators with optional parameters (e.g., ['rsi', 'ema:50', 'macd:12:26:9', 'bbands:20:2', 'atr', 'sma', 'vwap'])"
+                    },
+                    "tail": {
+                        "type": "integer",
+                        "description": "Number of latest values to return per indicator",
+                        "minimum": 1,
+                        "maximum": 200,
+                        "default": 1
+                    }
+                },
+                "required": ["market", "indicators"]
+            }
         }
     ]
 
@@ -151,7 +288,12 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> str:
     """Handle tool calls."""
     try:
         if name == "get_markets":
-            data = await upbit_client.get_markets()
+            data = await upbit_client.get_markets(
+                quote=arguments.get("quote"),
+                base=arguments.get("base"),
+                name=arguments.get("name"),
+                limit=arguments.get("limit"),
+            )
             return json_lib.dumps(data, ensure_ascii=False, indent=2)
 
         elif name == "get_ticker":
@@ -165,7 +307,8 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> str:
             markets = arguments.get("markets")
             if not markets:
                 raise ValueError("markets parameter is required")
-            data = await upbit_client.get_orderbook(markets)
+            depth = arguments.get("depth")
+            data = await upbit_client.get_orderbook(markets, depth)
             return json_lib.dumps(data, ensure_ascii=False, indent=2)
 
         elif name == "get_trades":
@@ -193,6 +336,50 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> str:
             data = await upbit_client.get_candles_days(market, count)
             return json_lib.dumps(data, ensure_ascii=False, indent=2)
 
+        elif name == "get_candle_history":
+            market = arguments.get("market")
+            start = arguments.get("start")
+            if not market or not start:
+                raise ValueError("market and start parameters are required")
+            end = arguments.get("end")
+            data = await get_candle_store().get_history(
+                market,
+                arguments.get("unit", 1),
+                parse_time(start),
+                parse_time(end) if end else None,
+                arguments.get("limit", 200),
+            )
+            return json_lib.dumps(data, ensure_ascii=False, indent=2)
+
+        elif name == "get_resampled_candles":
+            market = arguments.get("market")
+            timeframe = arguments.get("timeframe")
+            start = arguments.get("start")
+            if not market or not timeframe or not start:
+                raise ValueError("market, timeframe and start parameters are required")
+            end = arguments.get("end")
+            data = await get_candle_store().get_resampled(
+                market,
+                timeframe,
+                parse_time(start),
+                parse_time(end) if end else None,
+                arguments.get("limit", 200),
+            )
+            return json_lib.dumps(data, ensure_ascii=False, indent=2)
+
+        elif name == "get_indicators":
+            market = arguments.get("market")
+            indicators = arguments.get("indicators")
+            if not market or not indicators:
+                raise ValueError("market and indicators parameters are required")
+            data = await get_indicator_engine().get_indicators(
+                market,
+                arguments.get("unit", 1),
+                indicators,
+                arguments.get("tail", 1),
+            )
+            return json_lib.dumps(data, ensure_ascii=False, indent=2)
+
         else:
             raise ValueError(f"Unknown tool: {name}")
 
@@ -254,7 +441,7 @@ async def mcp_endpoint(request: JSONRPCRequest):
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "mcp-upbit-server"}
+    return {"status": "healthy", "service": "mcp-upbit-server", "upbit_api": upbit_client.get_stats()}
 
 
 @app.get("/tools")
@@ -264,8 +451,6 @@ async def list_tools():
     return {"tools": tools}
 
 
-
-
 def run_server(host: str = "0.0.0.0", port: int = 10000):
     """Run the HTTP server."""
     logger.info(f"Starting MCP Upbit server on {host}:{port}")
@@ -0,0 +1,329 @@
+"""Vectorized technical indicators over stored Upbit candles, updated incrementally."""
+
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .candles import CANDLE_UNITS, CandleStore, format_time, get_candle_store
+
+# Candles kept up to date behind the latest one (backfilled on first use)
+INDICATOR_HISTORY = int(os.getenv("UPBIT_INDICATOR_HISTORY", "500"))
+
+# Default parameters of each indicator
+DEFAULT_PARAMS = {
+    "sma": (20,),
+    "ema": (20,),
+    "rsi": (14,),
+    "macd": (12, 26, 9),
+    "bbands": (20, 2),
+    "atr": (14,),
+    "vwap": (),
+}
+
+# Seconds per VWAP session (sessions start at 00:00 UTC = 09:00 KST, like Upbit's daily candles)
+VWAP_SESSION = 86400
+
+_SPEC_PATTERN = re.compile(r"^\s*([a-z]+)\s*(?:[:(]\s*([\d.,:\s]*?)\s*\)?)?\s*$", re.IGNORECASE)
+
+
+def parse_indicator(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """Parse 'rsi', 'rsi:14', 'macd:12:26:9' or 'bbands(20,2)' into (name, params)."""
+    match = _SPEC_PATTERN.match(spec)
+    name = match.group(1).lower() if match else ""
+    if name not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown indicator '{spec}' (available: {', '.join(DEFAULT_PARAMS)})")
+    defaults = DEFAULT_PARAMS[name]
+    raw = [part for part in re.split(r"[:,\s]+", match.group(2) or "") if part]
+    if len(raw) > len(defaults):
+        raise ValueError(f"Too many parameters for {name}: expected at most {len(defaults)}")
+    params = tuple(float(part) for part in raw) + defaults[len(raw):]
+    # Window lengths must be positive integers; only the Bollinger width may be fractional
+    for index, value in enumerate(params):
+        if value <= 0 or (not (name == "bbands" and index == 1) and value != int(value)):
+            raise ValueError(f"Invalid parameter {value:g} for {name}")
+    return name, tuple(int(value) if value == int(value) else value for value in params)
+
+
+def indicator_key(name: str, params: Tuple[float, ...]) -> str:
+    return "_".join([name, *(f"{value:g}" for value in params)])
+
+
+class EwmState:
+    """Running state of an exponentially weighted average seeded with the SMA of its first `period` values."""
+
+    __slots__ = ("prev", "count", "total")
+
+    def __init__(self):
+        self.prev: Optional[float] = None
+        self.count = 0
+        self.total = 0.0
+
+
+def _ema_blocks(values: np.ndarray, alpha: float, prev: float) -> np.ndarray:
+    """y[k] = (1 - alpha) * y[k-1] + alpha * x[k], vectorized in blocks.
+
+    Within a block the recursion has the closed form
+    y[k] = d^(k+1) * prev + alpha * d^k * cumsum(x[i] / d^i); blocks are short enough
+    that d^-i stays within float range.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return values.astype(np.float64, copy=True)
+    block = max(1, int(30 / -math.log(decay)))
+    out = np.empty(len(values), dtype=np.float64)
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(len(chunk))
+        out[start:start + len(chunk)] = decay * powers * prev + alpha * powers * np.cumsum(chunk / powers)
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def ewm(values: np.ndarray, alpha: float, period: int, state: EwmState) -> np.ndarray:
+    """Continue an SMA-seeded exponential average over new values (leading NaNs are skipped)."""
+    out = np.full(len(values), np.nan)
+    index = 0
+    if state.prev is None:
+        if state.count == 0:
+            valid = np.flatnonzero(~np.isnan(values))
+            index = int(valid[0]) if len(valid) else len(values)
+        take = values[index:index + period - state.count]
+        state.total += float(take.sum())
+        state.count += len(take)
+        index += len(take)
+        if state.count < period:
+            return out
+        state.prev = state.total / period
+        out[index - 1] = state.prev
+    if index < len(values):
+        out[index:] = _ema_blocks(values[index:], alpha, state.prev)
+        state.prev = float(out[-1])
+    return out
+
+
+def rolling_windows(tail: np.ndarray, values: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Windows of `period` values ending at each new value, using the previous tail as history.
+
+    Returns (windows, positions of the new values that have a full window, new tail).
+    """
+    series = np.concatenate([tail, values])
+    new_tail = series[-(period - 1):] if period > 1 else series[:0]
+    first_full = max(0, period - 1 - len(tail))
+    if len(series) < period:
+        return np.empty((0, period)), np.arange(0), new_tail
+    windows = sliding_window_view(series, period)[len(series) - period + 1 - (len(values) - first_full):]
+    return windows, np.arange(first_full, len(values)), new_tail
+
+
+class Indicator:
+    """One indicator with the state needed to continue it over newly arrived candles."""
+
+    def __init__(self, name: str, params: Tuple[float, ...]):
+        self.name = name
+        self.params = params
+        self.key = indicator_key(name, params)
+        self.state: Dict[str, Any] = {}
+
+    def update(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Compute output values for the new candles only."""
+        return getattr(self, f"_{self.name}")(columns)
+
+    def _ewm_state(self, name: str) -> EwmState:
+        return self.state.setdefault(name, EwmState())
+
+    def _sma(self, columns):
+        (period,) = self.params
+        windows, positions, self.state["tail"] = rolling_windows(
+            self.state.get("tail", np.empty(0)), columns["close"], period
+        )
+        out = np.full(len(columns["close"]), np.nan)
+        out[positions] = windows.mean(axis=1)
+        return {"value": out}
+
+    def _ema(self, columns):
+        (period,) = self.params
+        return {"value": ewm(columns["close"], 2 / (period + 1), period, self._ewm_state("ema"))}
+
+    def _rsi(self, columns):
+        (period,) = self.params
+        close = columns["close"]
+        prev_close = self.state.get("prev_close")
+        change = np.diff(close, prepend=close[0] if prev_close is None else prev_close)
+        if prev_close is None:
+            change[0] = np.nan
+        self.state["prev_close"] = float(close[-1])
+        gains = np.where(change > 0, change, 0.0)
+        losses = np.where(change < 0, -change, 0.0)
+        gains[np.isnan(change)] = losses[np.isnan(change)] = np.nan
+        gain = ewm(gains, 1 / period, period, self._ewm_state("gain"))
+        loss = ewm(losses, 1 / period, period, self._ewm_state("loss"))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        rsi[np.isnan(gain)] = np.nan
+        return {"value": rsi}
+
+    def _macd(self, columns):
+        fast, slow, signal = self.params
+        close = columns["close"]
+        macd = (
+            ewm(close, 2 / (fast + 1), fast, self._ewm_state("fast"))
+            - ewm(close, 2 / (slow + 1), slow, self._ewm_state("slow"))
+        )
+        signal_line = ewm(macd, 2 / (signal + 1), signal, self._ewm_state("signal"))
+        return {"macd": macd, "signal": signal_line, "histogram": macd - signal_line}
+
+    def _bbands(self, columns):
+        period, width = self.params
+        windows, positions, self.state["tail"] = rolling_windows(
+            self.state.get("tail", np.empty(0)), columns["close"], int(period)
+        )
+        middle = np.full(len(columns["close"]), np.nan)
+        deviation = np.full(len(columns["close"]), np.nan)
+        middle[positions] = windows.mean(axis=1)
+        deviation[positions] = windows.std(axis=1)
+        return {"upper": middle + width * deviation, "middle": middle, "lower": middle - width * deviation}
+
+    def _atr(self, columns):
+        (period,) = self.params
+        high, low, close = columns["high"], columns["low"], columns["close"]
+        prev_close = np.concatenate([[self.state.get("prev_close", np.nan)], close[:-1]])
+        self.state["prev_close"] = float(close[-1])
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return {"value": ewm(true_range, 1 / period, period, self._ewm_state("atr"))}
+
+    def _vwap(self, columns):
+        sessions = columns["time"] // VWAP_SESSION
+        value = np.cumsum(columns["value"])
+        volume = np.cumsum(columns["volume"])
+        # Restart the running sums at the first candle of every session
+        starts = np.flatnonzero(np.diff(sessions, prepend=sessions[0] - 1))
+        index = np.repeat(starts, np.diff(np.append(starts, len(sessions))))
+        value = value - (value[index] - columns["value"][index])
+        volume = volume - (volume[index] - columns["volume"][index])
+        # Continue the session that was running at the previous update
+        if self.state.get("session") == sessions[0]:
+            carry = index == 0
+            value[carry] += self.state["value"]
+            volume[carry] += self.state["volume"]
+        self.state.update(session=int(sessions[-1]), value=float(value[-1]), volume=float(volume[-1]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {"value": np.where(volume > 0, value / volume, np.nan)}
+
+
+class IndicatorSeries:
+    """Indicator outputs for one (market, unit), appended to as new candles are stored."""
+
+    def __init__(self):
+        self.indicators: Dict[str, Indicator] = {}
+        self.times: Dict[str, np.ndarray] = {}
+        self.outputs: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def update(self, indicator: Indicator, candles: Dict[str, np.ndarray]) -> Tuple[int, bool]:
+        """Bring one indicator up to date with the stored candles; returns (rows processed, recomputed)."""
+        key = indicator.key
+        times = self.times.get(key)
+        recompute = (
+            key not in self.indicators
+            or times is None
+            or len(times) == 0
+            or bool(len(candles["time"]) and candles["time"][0] < times[0])
+        )
+        if recompute:
+            # First use, or the store gained older candles: start over from the first stored candle
+            self.indicators[key] = indicator = Indicator(indicator.name, indicator.params)
+            new = candles
+        else:
+            indicator = self.indicators[key]
+            first_new = int(np.searchsorted(candles["time"], times[-1], side="right"))
+            new = {name: column[first_new:] for name, column in candles.items()}
+
+        count = len(new["time"])
+        if count == 0:
+            return 0, False
+        new = {name: np.asarray(column, dtype=np.float64 if name != "time" else np.int64) for name, column in new.items()}
+        result = indicator.update(new)
+        if recompute:
+            self.times[key] = new["time"]
+            self.outputs[key] = result
+        else:
+            self.times[key] = np.concatenate([times, new["time"]])
+            self.outputs[key] = {
+                name: np.concatenate([values, result[name]]) for name, values in self.outputs[key].items()
+            }
+        return count, recompute
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if value is None or math.isnan(value) else round(float(value), 8)
+
+
+class IndicatorEngine:
+    """Computes indicators on the candle store, keeping per-market state between calls."""
+
+    def __init__(self, store: Optional[CandleStore] = None):
+        self.store = store or get_candle_store()
+        self._series: Dict[Tuple[str, int], IndicatorSeries] = {}
+
+    async def get_indicators(
+        self,
+        market: str,
+        unit: int,
+        indicators: List[str],
+        tail: int = 1,
+    ) -> Dict[str, Any]:
+        """Latest value (tail=1) or the last `tail` values of each requested indicator."""
+        if unit not in CANDLE_UNITS:
+            raise ValueError(f"unit must be one of {CANDLE_UNITS}")
+        specs = [parse_indicator(spec) for spec in indicators]
+        tail = max(1, tail)
+
+        # Keep the stored candles current; only the missing tail is fetched
+        period = unit * 60
+        end = int(time.time())
+        result = await self.store.backfill(market, unit, end - INDICATOR_HISTORY * period, end)
+        market = result["market"]
+        candles = self.store.series(market, unit).read()
+        if len(candles["time"]) == 0:
+            raise ValueError(f"No candles stored for {market}")
+
+        series = self._series.setdefault((market, unit), IndicatorSeries())
+        values: Dict[str, Any] = {}
+        processed = {}
+        for name, params in specs:
+            indicator = Indicator(name, params)
+            count, recomputed = series.update(indicator, candles)
+            processed[indicator.key] = {"new_candles": count, "recomputed": recomputed}
+            outputs = series.outputs[indicator.key]
+            if tail == 1:
+                entry = {component: _clean(output[-1]) for component, output in outputs.items()}
+            else:
+                entry = {component: [_clean(v) for v in output[-tail:]] for component, output in outputs.items()}
+            values[indicator.key] = entry["value"] if list(entry) == ["value"] else entry
+
+        times = candles["time"][-tail:]
+        return {
+            "market": market,
+            "unit": unit,
+            "time": format_time(times[-1]) if tail == 1 else [format_time(t) for t in times],
+            "candles": len(candles["time"]),
+            "fetched_candles": result["fetched_candles"],
+            "indicators": values,
+            "updates": processed,
+        }
+
+
+# Process-wide indicator engine shared by the MCP and HTTP servers
+_shared_engine: Optional[IndicatorEngine] = None
+
+
+def get_indicator_engine() -> IndicatorEngine:
+    """Return the shared indicator engine (created on first use)."""
+    global _shared_engine
+    if _shared_engine is None:
+        _shared_engine = IndicatorEngine()
+    return _shared_engine
@@ -0,0 +1,145 @@
+"""Cached Upbit market catalogue with lookup indexes."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background refreshes of /market/all (the list changes rarely)
+MARKETS_REFRESH_INTERVAL = float(os.getenv("UPBIT_MARKETS_REFRESH_INTERVAL", "3600"))
+# Seconds to wait before retrying a failed refresh
+MARKETS_RETRY_INTERVAL = float(os.getenv("UPBIT_MARKETS_RETRY_INTERVAL", "60"))
+
+
+class InvalidMarketError(ValueError):
+    """Raised when a market code is not listed on Upbit."""
+
+    def __init__(self, markets: List[str]):
+        self.markets = markets
+        super().__init__(f"Unknown market code(s): {', '.join(markets)}")
+
+
+class MarketCatalog:
+    """In-memory copy of /market/all indexed by code, quote currency, base asset and name.
+
+    The catalogue is loaded on first use and refreshed in the background every
+    MARKETS_REFRESH_INTERVAL seconds; a failed refresh keeps serving the previous copy.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]):
+        self._fetch = fetch
+        self.markets: List[Dict[str, Any]] = []
+        self.by_code: Dict[str, Dict[str, Any]] = {}
+        self.by_quote: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_base: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_name: Dict[str, List[Dict[str, Any]]] = {}
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._load_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def _index(self, markets: List[Dict[str, Any]]) -> None:
+        """Rebuild every index, then swap them in at once."""
+        by_code, by_quote, by_base, by_name = {}, {}, {}, {}
+        for market in markets:
+            code = market["market"]
+            quote, _, base = code.partition("-")
+            by_code[code] = market
+            by_quote.setdefault(quote, []).append(market)
+            by_base.setdefault(base, []).append(market)
+            for name in {market.get("korean_name", "").lower(), market.get("english_name", "").lower()}:
+                if name:
+                    by_name.setdefault(name, []).append(market)
+        self.markets = markets
+        self.by_code, self.by_quote, self.by_base, self.by_name = by_code, by_quote, by_base, by_name
+        self.loaded_at = time.time()
+
+    async def refresh(self) -> None:
+        markets = await self._fetch()
+        self._index(markets)
+        self.refreshes += 1
+
+    async def ensure_loaded(self) -> None:
+        """Load the catalogue on first use and start the background refresh."""
+        if not self.loaded:
+            async with self._load_lock:
+                if not self.loaded:
+                    await self.refresh()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        delay = MARKETS_REFRESH_INTERVAL
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+                delay = MARKETS_REFRESH_INTERVAL
+            except Exception as e:
+                self.failures += 1
+                delay = MARKETS_RETRY_INTERVAL
+                logger.warning(f"Market catalogue refresh failed, keeping the previous copy: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def invalid(self, codes: List[str]) -> List[str]:
+        """Return the codes that are not in the catalogue."""
+        return [code for code in codes if code not in self.by_code]
+
+    def filter(
+        self,
+        quote: Optional[str] = None,
+        base: Optional[str] = None,
+        name: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Markets matching every given filter, in catalogue order.
+
+        name matches Korean or English names exactly (case-insensitive) among the markets
+        left by quote/base and falls back to a substring match when none of them match exactly.
+        """
+        if base:
+            candidates = self.by_base.get(base.upper(), [])
+        elif quote:
+            candidates = self.by_quote.get(quote.upper(), [])
+        else:
+            candidates = self.markets
+
+        if quote:
+            prefix = f"{quote.upper()}-"
+            candidates = [market for market in candidates if market["market"].startswith(prefix)]
+        if name:
+            needle = name.strip().lower()
+            # Exact matches from the name index win if any of them is still a candidate
+            exact = {id(market) for market in self.by_name.get(needle, [])}
+            matches = [market for market in candidates if id(market) in exact] if exact else []
+            candidates = matches or [
+                market for market in candidates
+                if needle in market.get("korean_name", "").lower()
+                or needle in market.get("english_name", "").lower()
+            ]
+        return candidates[:limit] if limit else candidates
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "markets": len(self.markets),
+            "quote_currencies": sorted(self.by_quote),
+            "loaded_at": self.loaded_at,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.failures,
+        }
@@ -0,0 +1,315 @@
+"""Realtime Upbit market data fed by the WebSocket API."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from websockets.asyncio.client import connect
+
+logger = logging.getLogger(__name__)
+
+# WebSocket settings (overridable via environment variables)
+UPBIT_WS_URL = os.getenv("UPBIT_WS_URL", "wss://api.upbit.com/websocket/v1")
+# Comma-separated markets to keep in the ticker cache / order book (both empty disables the subscriber)
+WS_TICKER_MARKETS = os.getenv("UPBIT_WS_TICKER_MARKETS", "")
+WS_ORDERBOOK_MARKETS = os.getenv("UPBIT_WS_ORDERBOOK_MARKETS", "")
+WS_RECONNECT_BASE_DELAY = float(os.getenv("UPBIT_WS_RECONNECT_BASE_DELAY", "0.5"))
+WS_RECONNECT_MAX_DELAY = float(os.getenv("UPBIT_WS_RECONNECT_MAX_DELAY", "30"))
+# Seconds a snapshot may still be served after the connection drops
+WS_STALE_AFTER = float(os.getenv("UPBIT_WS_STALE_AFTER", "5"))
+WS_PING_INTERVAL = float(os.getenv("UPBIT_WS_PING_INTERVAL", "20"))
+
+# Fields of a WebSocket ticker message that make up a REST /ticker entry
+REST_TICKER_FIELDS = (
+    "trade_date", "trade_time", "trade_date_kst", "trade_time_kst", "trade_timestamp",
+    "opening_price", "high_price", "low_price", "trade_price", "prev_closing_price",
+    "change", "change_price", "change_rate", "signed_change_price", "signed_change_rate",
+    "trade_volume", "acc_trade_price", "acc_trade_price_24h", "acc_trade_volume",
+    "acc_trade_volume_24h", "highest_52_week_price", "highest_52_week_date",
+    "lowest_52_week_price", "lowest_52_week_date", "timestamp",
+)
+
+
+def parse_markets(value: str) -> List[str]:
+    """Split a comma-separated market list into upper-case codes."""
+    return [market.strip().upper() for market in value.split(",") if market.strip()]
+
+
+def to_rest_ticker(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a WebSocket ticker message into the shape returned by GET /ticker."""
+    ticker = {"market": message["code"]}
+    for field in REST_TICKER_FIELDS:
+        if field in message:
+            ticker[field] = message[field]
+    return ticker
+
+
+class OrderBook:
+    """L2 order book of one market held as sorted, array-backed price levels.
+
+    Upbit's orderbook stream sends the full top of book in every message, so each
+    message replaces the levels: asks ascending and bids descending by price, with
+    prices and sizes in parallel double arrays.
+    """
+
+    __slots__ = (
+        "market", "ask_prices", "ask_sizes", "bid_prices", "bid_sizes",
+        "total_ask_size", "total_bid_size", "timestamp", "sequence",
+    )
+
+    def __init__(self, market: str):
+        self.market = market
+        self.ask_prices = array("d")
+        self.ask_sizes = array("d")
+        self.bid_prices = array("d")
+        self.bid_sizes = array("d")
+        self.total_ask_size = 0.0
+        self.total_bid_size = 0.0
+        self.timestamp = 0
+        self.sequence = 0
+
+    @staticmethod
+    def _sorted_levels(prices: List[float], sizes: List[float], descending: bool) -> Tuple[array, array]:
+        # Levels normally arrive in order already; only sort when they do not
+        ordered = all(
+            (a >= b) if descending else (a <= b) for a, b in zip(prices, prices[1:])
+        )
+        if not ordered:
+            pairs = sorted(zip(prices, sizes), reverse=descending)
+            prices = [price for price, _ in pairs]
+            sizes = [size for _, size in pairs]
+        return array("d", prices), array("d", sizes)
+
+    def apply(self, message: Dict[str, Any]) -> bool:
+        """Replace the levels with an orderbook message; returns False for out-of-order messages."""
+        timestamp = message.get("timestamp", 0)
+        if timestamp < self.timestamp:
+            return False
+        units = message.get("orderbook_units", [])
+        asks = [(unit["ask_price"], unit["ask_size"]) for unit in units if unit.get("ask_price")]
+        bids = [(unit["bid_price"], unit["bid_size"]) for unit in units if unit.get("bid_price")]
+        self.ask_prices, self.ask_sizes = self._sorted_levels(
+            [price for price, _ in asks], [size for _, size in asks], descending=False
+        )
+        self.bid_prices, self.bid_sizes = self._sorted_levels(
+            [price for price, _ in bids], [size for _, size in bids], descending=True
+        )
+        self.total_ask_size = message.get("total_ask_size", sum(self.ask_sizes))
+        self.total_bid_size = message.get("total_bid_size", sum(self.bid_sizes))
+        self.timestamp = timestamp
+        self.sequence += 1
+        return True
+
+    def top(self, depth: Optional[int] = None) -> Dict[str, Any]:
+        """Top depth levels in the shape of a REST /orderbook entry, plus the sequence number."""
+        levels = max(len(self.ask_prices), len(self.bid_prices))
+        if depth is not None:
+            levels = min(levels, depth)
+        units = []
+        for index in range(levels):
+            has_ask = index < len(self.ask_prices)
+            has_bid = index < len(self.bid_prices)
+            units.append({
+                "ask_price": self.ask_prices[index] if has_ask else None,
+                "bid_price": self.bid_prices[index] if has_bid else None,
+                "ask_size": self.ask_sizes[index] if has_ask else None,
+                "bid_size": self.bid_sizes[index] if has_bid else None,
+            })
+        return {
+            "market": self.market,
+            "timestamp": self.timestamp,
+            "sequence": self.sequence,
+            "total_ask_size": self.total_ask_size,
+            "total_bid_size": self.total_bid_size,
+            "orderbook_units": units,
+            "source": "websocket",
+        }
+
+
+class UpbitRealtimeFeed:
+    """Background subscriber to the Upbit WebSocket API that keeps in-memory tickers and order books.
+
+    The feed connects lazily, subscribes to the configured markets and replaces the
+    snapshot of a market on every message. Dropped connections are re-established with
+    jittered exponential backoff; snapshots are only served while connected or for
+    WS_STALE_AFTER seconds after a disconnect, so callers fall back to REST otherwise.
+    The feed counts as connected once a (re)connection delivers its first message, and
+    snapshots left over from a disconnect longer than WS_STALE_AFTER are dropped on reconnect.
+    """
+
+    def __init__(
+        self,
+        ticker_markets: List[str],
+        url: str = UPBIT_WS_URL,
+        orderbook_markets: Optional[List[str]] = None,
+    ):
+        self.url = url
+        self.ticker_markets = ticker_markets
+        self.orderbook_markets = orderbook_markets or []
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.orderbooks: Dict[str, OrderBook] = {}
+        self.connected = False
+        self.disconnected_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.messages = 0
+        self.malformed = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.hits = 0
+        self.misses = 0
+
+    def ensure_started(self) -> None:
+        """Start the subscriber task in the running event loop if it is not running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    def is_fresh(self) -> bool:
+        """Whether snapshots can be trusted (connected, or disconnected only briefly)."""
+        if self.connected:
+            return True
+        return self.disconnected_at is not None and time.monotonic() - self.disconnected_at < WS_STALE_AFTER
+
+    def lookup_tickers(self, markets: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Return (snapshots found, markets that must be fetched over REST)."""
+        if not self.is_fresh():
+            self.misses += len(markets)
+            return {}, markets
+        found = {}
+        missing = []
+        for market in markets:
+            ticker = self.tickers.get(market)
+            if ticker is None:
+                missing.append(market)
+            else:
+                found[market] = ticker
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def lookup_orderbooks(
+        self,
+        markets: List[str],
+        depth: Optional[int] = None,
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Return (top-of-book snapshots found, markets that must be fetched over REST)."""
+        if not self.is_fresh():
+            self.misses += len(markets)
+            return {}, markets
+        found = {}
+        missing = []
+        for market in markets:
+            book = self.orderbooks.get(market)
+            if book is None:
+                missing.append(market)
+            else:
+                found[market] = book.top(depth)
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def subscription(self) -> List[Dict[str, Any]]:
+        """Subscription request sent right after connecting."""
+        request: List[Dict[str, Any]] = [{"ticket": str(uuid.uuid4())}]
+        if self.ticker_markets:
+            request.append({"type": "ticker", "codes": self.ticker_markets})
+        if self.orderbook_markets:
+            request.append({"type": "orderbook", "codes": self.orderbook_markets})
+        request.append({"format": "DEFAULT"})
+        return request
+
+    def handle_message(self, raw: Any) -> bool:
+        """Apply one message to the snapshots; returns False for error messages."""
+        message = json.loads(raw)
+        if "error" in message:
+            logger.warning(f"Upbit WebSocket error: {message['error']}")
+            return False
+        self.messages += 1
+        message_type = message.get("type")
+        if message_type == "ticker":
+            self.tickers[message["code"]] = to_rest_ticker(message)
+        elif message_type == "orderbook":
+            book = self.orderbooks.get(message["code"])
+            if book is None:
+                book = self.orderbooks[message["code"]] = OrderBook(message["code"])
+            book.apply(message)
+        return True
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with connect(self.url, ping_interval=WS_PING_INTERVAL) as websocket:
+                    if not self.is_fresh():
+                        # Snapshots from before a long disconnect would be served as current
+                        self.tickers.clear()
+                        self.orderbooks.clear()
+                    await websocket.send(json.dumps(self.subscription()))
+                    self.connects += 1
+                    if self.connects > 1:
+                        self.reconnects += 1
+                    logger.info(
+                        f"Subscribed to Upbit WebSocket ticker for {len(self.ticker_markets)} markets, "
+                        f"orderbook for {len(self.orderbook_markets)} markets"
+                    )
+                    async for raw in websocket:
+                        try:
+                            if not self.handle_message(raw):
+                                continue
+                        except (KeyError, TypeError, ValueError) as e:
+                            self.malformed += 1
+                            logger.warning(f"Skipping malformed Upbit WebSocket message: {e!r}")
+                            continue
+                        # Serve snapshots and reset the backoff only once the connection actually delivers data
+                        self.connected = True
+                        attempt = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Upbit WebSocket connection lost: {e!r}")
+            finally:
+                if self.connected:
+                    self.disconnected_at = time.monotonic()
+                self.connected = False
+
+            delay = random.uniform(0, min(WS_RECONNECT_MAX_DELAY, WS_RECONNECT_BASE_DELAY * (2 ** attempt)))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "ticker_markets": len(self.ticker_markets),
+            "tickers_cached": len(self.tickers),
+            "orderbook_markets": len(self.orderbook_markets),
+            "orderbooks_cached": len(self.orderbooks),
+            "messages": self.messages,
+            "malformed_messages": self.malformed,
+            "reconnects": self.reconnects,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def create_realtime_feed() -> Optional[UpbitRealtimeFeed]:
+    """Create the feed from UPBIT_WS_TICKER_MARKETS / UPBIT_WS_ORDERBOOK_MARKETS, or None when both are empty."""
+    ticker_markets = parse_markets(WS_TICKER_MARKETS)
+    orderbook_markets = parse_markets(WS_ORDERBOOK_MARKETS)
+    if not ticker_markets and not orderbook_markets:
+        return None
+    return UpbitRealtimeFeed(ticker_markets=ticker_markets, orderbook_markets=orderbook_markets)
@@ -0,0 +1,56 @@
+"""Vectorized resampling of 1-minute candles into higher timeframes."""
+
+import re
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Seconds per timeframe suffix
+TIMEFRAME_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Weekly buckets start on Monday 00:00 UTC (1970-01-05), like Upbit's weekly candles;
+# every other timeframe is aligned to the Unix epoch (00:00 UTC = 09:00 KST)
+WEEK_ORIGIN = 4 * 86400
+
+_TIMEFRAME_PATTERN = re.compile(r"^\s*(\d+)\s*(m|min|h|d|w)?\s*$", re.IGNORECASE)
+
+
+def parse_timeframe(value: str) -> Tuple[int, int]:
+    """Parse '15m', '2h', '1d', '1w' or plain minutes ('240') into (period seconds, origin)."""
+    match = _TIMEFRAME_PATTERN.match(str(value))
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid timeframe '{value}' (use e.g. '15m', '2h', '1d', '1w')")
+    suffix = (match.group(2) or "m").lower()[0]
+    period = int(match.group(1)) * TIMEFRAME_UNITS[suffix]
+    origin = WEEK_ORIGIN if suffix == "w" else 0
+    return period, origin
+
+
+def bucket_start(timestamp: int, period: int, origin: int = 0) -> int:
+    """Start of the bucket containing timestamp."""
+    return (timestamp - origin) // period * period + origin
+
+
+def resample(columns: Dict[str, np.ndarray], period: int, origin: int = 0) -> Dict[str, np.ndarray]:
+    """Aggregate time-sorted candles into buckets of `period` seconds.
+
+    open is the first open of a bucket, close the last close, high/low the extremes,
+    and volume/value (accumulated trade volume and price) the sums. Buckets without
+    any candle are omitted, matching how Upbit omits periods without trades.
+    """
+    times = np.asarray(columns["time"])
+    if len(times) == 0:
+        return {name: np.asarray(column)[:0] for name, column in columns.items()}
+
+    buckets = (times - origin) // period
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(times)) - 1
+    return {
+        "time": buckets[starts] * period + origin,
+        "open": np.asarray(columns["open"])[starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": np.asarray(columns["close"])[ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+        "value": np.add.reduceat(columns["value"], starts),
+    }
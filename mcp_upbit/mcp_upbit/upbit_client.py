@@ -3,71 +3,384 @@
 import httpx
 from typing import Dict, List, Optional, Any
 import asyncio
+import logging
+import os
+import random
+import time
+
+from .markets import InvalidMarketError, MarketCatalog
+from .realtime import UpbitRealtimeFeed, create_realtime_feed, parse_markets
+
+logger = logging.getLogger(__name__)
+
+# Upbit API settings (overridable via environment variables)
+UPBIT_API_URL = os.getenv("UPBIT_API_URL", "https://api.upbit.com/v1")
+HTTP_TIMEOUT = float(os.getenv("UPBIT_HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("UPBIT_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("UPBIT_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Retry settings (full-jitter exponential backoff)
+MAX_RETRIES = int(os.getenv("UPBIT_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("UPBIT_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("UPBIT_RETRY_MAX_DELAY", "5"))
+
+# Per-group request budget assumed until the first Remaining-Req header arrives
+DEFAULT_REQUESTS_PER_SECOND = int(os.getenv("UPBIT_REQUESTS_PER_SECOND", "10"))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("UPBIT_REQUESTS_PER_MINUTE", "600"))
+
+# Remaining-Req window lengths (seconds)
+REMAINING_REQ_WINDOWS = {"sec": 1.0, "min": 60.0}
+
+# Request group of each endpoint (used until the server reports the group itself)
+ENDPOINT_GROUPS = {
+    "/market/all": "market",
+    "/ticker": "ticker",
+    "/orderbook": "orderbook",
+    "/trades/ticks": "trades",
+    "/candles": "candles",
+}
+
+# Status codes worth retrying (418 means the IP is blocked, so it is not retried)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class BudgetWindow:
+    """Remaining requests of one Remaining-Req window (sec or min)."""
+
+    def __init__(self, limit: int, length: float):
+        self.limit = limit
+        self.length = length
+        self.remaining = limit
+        self.reset_at = time.monotonic() + length
+
+    def refill(self, now: float) -> None:
+        """Restore the budget once the window has rolled over."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.length
+
+
+class GroupBudget:
+    """Request budget of one Upbit request group (market, ticker, orderbook, candles, trades).
+
+    Requests reserve a slot before they are sent; the Remaining-Req header of every
+    response then corrects the local estimate with the server's own count.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.windows = {
+            "sec": BudgetWindow(DEFAULT_REQUESTS_PER_SECOND, REMAINING_REQ_WINDOWS["sec"]),
+            "min": BudgetWindow(DEFAULT_REQUESTS_PER_MINUTE, REMAINING_REQ_WINDOWS["min"]),
+        }
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.throttled = 0
+
+    def _wait_time(self, now: float) -> float:
+        wait = 0.0
+        for window in self.windows.values():
+            window.refill(now)
+            if window.remaining <= 0:
+                wait = max(wait, window.reset_at - now)
+        return wait
+
+    async def acquire(self) -> None:
+        """Wait until every window of the group has budget left, then reserve one request."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    for window in self.windows.values():
+                        window.remaining -= 1
+                    return
+                self.waits += 1
+                await asyncio.sleep(wait)
+
+    def update(self, remaining: Dict[str, int]) -> None:
+        """Apply the counts reported by a Remaining-Req header."""
+        now = time.monotonic()
+        for key, count in remaining.items():
+            window = self.windows.get(key)
+            if window is None:
+                continue
+            window.refill(now)
+            # A count above the local estimate means the server window has already rolled over
+            if count > window.remaining:
+                window.reset_at = now + window.length
+            window.remaining = count
+            # Learn the real limit when the server allows more than the default
+            window.limit = max(window.limit, count + 1)
+
+    def exhaust(self) -> None:
+        """Mark the per-second window as spent after a 429 response."""
+        window = self.windows["sec"]
+        window.remaining = 0
+        window.reset_at = max(window.reset_at, time.monotonic() + window.length)
+        self.throttled += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        for window in self.windows.values():
+            window.refill(now)
+        return {
+            "remaining_sec": self.windows["sec"].remaining,
+            "remaining_min": self.windows["min"].remaining,
+            "waits": self.waits,
+            "throttled_429": self.throttled,
+        }
+
+
+def parse_remaining_req(value: Optional[str]) -> Dict[str, Any]:
+    """Parse a Remaining-Req header such as 'group=default; min=1799; sec=29'."""
+    parsed: Dict[str, Any] = {}
+    if not value:
+        return parsed
+    for part in value.split(";"):
+        key, _, number = part.strip().partition("=")
+        key = key.strip().lower()
+        number = number.strip()
+        if key == "group":
+            parsed["group"] = number
+        elif key in REMAINING_REQ_WINDOWS and number.lstrip("-").isdigit():
+            parsed[key] = int(number)
+    return parsed
+
+
+def endpoint_group(path: str) -> str:
+    """Return the request group an endpoint path belongs to."""
+    for prefix, group in ENDPOINT_GROUPS.items():
+        if path.startswith(prefix):
+            return group
+    return "default"
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: a random delay in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
 
 
 class UpbitClient:
-    """Client for Upbit public API."""
+    """Client for Upbit public API.
+
+    A single pooled HTTP client is shared by all requests. Each request group is scheduled
+    under its own budget taken from the Remaining-Req response header, and transient
+    failures (timeouts, connection errors, 429, 5xx) are retried with jittered backoff.
+    When a realtime feed is attached, tickers and order books of subscribed markets are
+    answered from its in-memory snapshots and only the remaining markets go over REST.
+    Market codes are checked against a cached market catalogue before any request is sent.
+    """
+
+    def __init__(
+        self,
+        base_url: str = UPBIT_API_URL,
+        max_retries: int = MAX_RETRIES,
+        realtime: Optional[UpbitRealtimeFeed] = None,
+    ):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.realtime = realtime
+        self.catalog = MarketCatalog(self.fetch_markets)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.budgets: Dict[str, GroupBudget] = {}
+        # Groups reported by the server for each endpoint path
+        self._path_groups: Dict[str, str] = {}
+        self.requests = 0
+        self.retries = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client (created on first use)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                headers={"Accept": "application/json"},
+            )
+        return self._client
+
+    def _budget(self, group: str) -> GroupBudget:
+        budget = self.budgets.get(group)
+        if budget is None:
+            budget = self.budgets[group] = GroupBudget(group)
+        return budget
+
+    async def request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET an endpoint under its group budget, retrying transient failures."""
+        group = self._path_groups.get(path) or endpoint_group(path)
+        budget = self._budget(group)
+        attempt = 0
+        while True:
+            await budget.acquire()
+            self.requests += 1
+            try:
+                response = await self.client.get(f"{self.base_url}{path}", params=params)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Upbit request to {path} failed ({e!r}), retrying")
+            else:
+                remaining = parse_remaining_req(response.headers.get("remaining-req"))
+                if remaining.get("group"):
+                    # Follow the group name reported by the server for later requests
+                    self._path_groups[path] = remaining["group"]
+                    if remaining["group"] != group:
+                        group = remaining["group"]
+                        budget = self._budget(group)
+                budget.update(remaining)
+                if response.status_code == 429:
+                    budget.exhaust()
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                logger.warning(f"Upbit request to {path} returned {response.status_code}, retrying")
+
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def fetch_markets(self) -> List[Dict[str, Any]]:
+        """Fetch all available markets from the API (used to refresh the catalogue)."""
+        return await self.request("/market/all")
+
+    async def get_markets(
+        self,
+        quote: Optional[str] = None,
+        base: Optional[str] = None,
+        name: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get available markets from the cached catalogue, optionally filtered."""
+        await self.catalog.ensure_loaded()
+        return self.catalog.filter(quote=quote, base=base, name=name, limit=limit)
 
-    def __init__(self):
-        self.base_url = "https://api.upbit.com/v1"
-        self.client = httpx.AsyncClient()
+    async def validate_markets(self, codes: List[str]) -> List[str]:
+        """Normalize market codes and reject unknown ones without a network call.
 
-    async def get_markets(self) -> List[Dict[str, Any]]:
-        """Get all available markets."""
-        response = await self.client.get(f"{self.base_url}/market/all")
-        response.raise_for_status()
-        return response.json()
+        Validation is skipped when the catalogue cannot be loaded, so an outage of
+        /market/all does not block the other endpoints.
+        """
+        codes = [code.strip().upper() for code in codes if code.strip()]
+        try:
+            await self.catalog.ensure_loaded()
+        except Exception as e:
+            logger.warning(f"Market catalogue unavailable, skipping validation: {e}")
+            return codes
+        invalid = self.catalog.invalid(codes)
+        if invalid:
+            raise InvalidMarketError(invalid)
+        return codes
 
     async def get_ticker(self, markets: str) -> List[Dict[str, Any]]:
         """Get ticker information for specified markets."""
-        params = {"markets": markets}
-        response = await self.client.get(f"{self.base_url}/ticker", params=params)
-        response.raise_for_status()
-        return response.json()
-
-    async def get_orderbook(self, markets: str) -> List[Dict[str, Any]]:
-        """Get orderbook for specified markets."""
-        params = {"markets": markets}
-        response = await self.client.get(f"{self.base_url}/orderbook", params=params)
-        response.raise_for_status()
-        return response.json()
+        codes = await self.validate_markets(parse_markets(markets))
+        if self.realtime is None:
+            params = {"markets": ",".join(codes)}
+            return await self.request("/ticker", params)
+
+        self.realtime.ensure_started()
+        found, missing = self.realtime.lookup_tickers(codes)
+        if missing:
+            fetched = await self.request("/ticker", {"markets": ",".join(missing)})
+            found.update((ticker["market"], ticker) for ticker in fetched)
+        return [found[code] for code in codes if code in found]
+
+    async def get_orderbook(self, markets: str, depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get orderbook for specified markets (top depth levels when depth is given)."""
+        codes = await self.validate_markets(parse_markets(markets))
+        if self.realtime is None:
+            params = {"markets": ",".join(codes)}
+            return _trim_orderbooks(await self.request("/orderbook", params), depth)
+
+        self.realtime.ensure_started()
+        found, missing = self.realtime.lookup_orderbooks(codes, depth)
+        if missing:
+            fetched = await self.request("/orderbook", {"markets": ",".join(missing)})
+            for book in _trim_orderbooks(fetched, depth):
+                book["source"] = "rest"
+                found[book["market"]] = book
+        return [found[code] for code in codes if code in found]
 
     async def get_trades(self, market: str, count: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get recent trades for a market."""
+        market = (await self.validate_markets([market]))[0]
         params = {"market": market}
         if count:
             params["count"] = count
-        response = await self.client.get(f"{self.base_url}/trades/ticks", params=params)
-        response.raise_for_status()
-        return response.json()
+        return await self.request("/trades/ticks", params)
 
     async def get_candles_minutes(
         self,
         unit: int,
         market: str,
-        count: Optional[int] = None
+        count: Optional[int] = None,
+        to: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Get minute candles for a market."""
+        """Get minute candles for a market (ending before `to`, ISO 8601 UTC, when given)."""
+        market = (await self.validate_markets([market]))[0]
         params = {"market": market}
         if count:
             params["count"] = count
-        response = await self.client.get(f"{self.base_url}/candles/minutes/{unit}", params=params)
-        response.raise_for_status()
-        return response.json()
+        if to:
+            params["to"] = to
+        return await self.request(f"/candles/minutes/{unit}", params)
 
     async def get_candles_days(
         self,
         market: str,
-        count: Optional[int] = None
+        count: Optional[int] = None,
+        to: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Get daily candles for a market."""
+        """Get daily candles for a market (ending before `to`, ISO 8601 UTC, when given)."""
+        market = (await self.validate_markets([market]))[0]
         params = {"market": market}
         if count:
             params["count"] = count
-        response = await self.client.get(f"{self.base_url}/candles/days", params=params)
-        response.raise_for_status()
-        return response.json()
+        if to:
+            params["to"] = to
+        return await self.request("/candles/days", params)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request counters and the remaining budget of every request group."""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "groups": {name: budget.get_stats() for name, budget in self.budgets.items()},
+            "realtime": self.realtime.get_stats() if self.realtime is not None else None,
+            "catalog": self.catalog.get_stats(),
+        }
 
     async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
\ No newline at end of file
+        """Stop the background tasks and close the HTTP client."""
+        await self.catalog.stop()
+        if self.realtime is not None:
+            await self.realtime.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _trim_orderbooks(books: List[Dict[str, Any]], depth: Optional[int]) -> List[Dict[str, Any]]:
+    """Keep only the top depth levels of REST orderbook entries."""
+    if depth is None:
+        return books
+    for book in books:
+        book["orderbook_units"] = book.get("orderbook_units", [])[:depth]
+    return books
+
+
+# Process-wide client shared by the MCP and HTTP servers
+_shared_client: Optional[UpbitClient] = None
+
+
+def get_upbit_client() -> UpbitClient:
+    """Return the shared Upbit client (created on first use)."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = UpbitClient(realtime=create_realtime_feed())
+    return _shared_client
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Upbit WebSocket API (wss://api.upbit.com/websocket/v1).
+
+Speaks the same subscription protocol as Upbit: the client sends
+[{"ticket": ...}, {"type": "ticker", "codes": [...]}, {"format": "DEFAULT"}]
+(optionally also {"type": "orderbook", "codes": [...]}) and receives a SNAPSHOT
+message per market followed by REALTIME updates, all as binary JSON frames.
+
+Usage:
+    python mock_upbit_websocket.py [--port 10001] [--interval 0.2] [--drop-every 0]
+
+Then point the server at it:
+    UPBIT_WS_URL=ws://localhost:10001 UPBIT_WS_TICKER_MARKETS=KRW-BTC,KRW-ETH \\
+        UPBIT_WS_ORDERBOOK_MARKETS=KRW-BTC uv run python -m mcp_upbit.http_server
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Set, Tuple
+
+from websockets.asyncio.server import ServerConnection, serve
+
+
+def ticker_message(code: str, price: float, stream_type: str) -> Dict[str, Any]:
+    """Build a ticker message with the fields Upbit sends in DEFAULT format."""
+    now = datetime.now(timezone.utc)
+    timestamp = int(now.timestamp() * 1000)
+    opening_price = round(price * 0.99, 2)
+    return {
+        "type": "ticker",
+        "code": code,
+        "opening_price": opening_price,
+        "high_price": round(price * 1.02, 2),
+        "low_price": round(price * 0.98, 2),
+        "trade_price": price,
+        "prev_closing_price": opening_price,
+        "change": "RISE" if price > opening_price else "FALL",
+        "change_price": round(abs(price - opening_price), 2),
+        "signed_change_price": round(price - opening_price, 2),
+        "change_rate": round(abs(price - opening_price) / opening_price, 6),
+        "signed_change_rate": round((price - opening_price) / opening_price, 6),
+        "trade_volume": round(random.uniform(0.001, 1), 6),
+        "acc_trade_volume": 1234.5,
+        "acc_trade_volume_24h": 2345.6,
+        "acc_trade_price": round(price * 1234.5, 2),
+        "acc_trade_price_24h": round(price * 2345.6, 2),
+        "trade_date": now.strftime("%Y%m%d"),
+        "trade_time": now.strftime("%H%M%S"),
+        "trade_timestamp": timestamp,
+        "ask_bid": random.choice(["ASK", "BID"]),
+        "highest_52_week_price": round(price * 1.5, 2),
+        "highest_52_week_date": "2025-01-01",
+        "lowest_52_week_price": round(price * 0.5, 2),
+        "lowest_52_week_date": "2024-06-01",
+        "market_state": "ACTIVE",
+        "is_trading_suspended": False,
+        "timestamp": timestamp,
+        "stream_type": stream_type,
+    }
+
+
+def orderbook_message(code: str, price: float, stream_type: str, levels: int = 15) -> Dict[str, Any]:
+    """Build an orderbook message with levels spread around the current price."""
+    tick = max(price * 0.0001, 0.01)
+    units = [
+        {
+            "ask_price": round(price + tick * (index + 1), 2),
+            "bid_price": round(price - tick * (index + 1), 2),
+            "ask_size": round(random.uniform(0.01, 5), 8),
+            "bid_size": round(random.uniform(0.01, 5), 8),
+        }
+        for index in range(levels)
+    ]
+    return {
+        "type": "orderbook",
+        "code": code,
+        "timestamp": int(time.time() * 1000),
+        "total_ask_size": round(sum(unit["ask_size"] for unit in units), 8),
+        "total_bid_size": round(sum(unit["bid_size"] for unit in units), 8),
+        "orderbook_units": units,
+        "stream_type": stream_type,
+        "level": 0,
+    }
+
+
+# Message builders for each subscription type
+MESSAGE_BUILDERS = {"ticker": ticker_message, "orderbook": orderbook_message}
+
+
+class MockUpbitWebSocketServer:
+    """Upbit WebSocket stand-in that streams random-walk ticker and orderbook updates."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, interval: float = 0.2, snapshot_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        # Seconds to wait after a subscription before sending the first (SNAPSHOT) messages
+        self.snapshot_delay = snapshot_delay
+        self.prices: Dict[str, float] = {}
+        self.connections: Set[ServerConnection] = set()
+        self.connection_count = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> "MockUpbitWebSocketServer":
+        self._server = await serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def drop_connections(self) -> None:
+        """Close every client connection abruptly to exercise reconnect logic."""
+        for connection in list(self.connections):
+            connection.transport.abort()
+
+    async def send_raw(self, frame: Any) -> None:
+        """Send a raw frame (e.g. a malformed message) to every client connection."""
+        for connection in list(self.connections):
+            await connection.send(frame)
+
+    def _next_price(self, code: str) -> float:
+        price = self.prices.get(code, random.uniform(1_000, 100_000_000))
+        price = round(price * (1 + random.gauss(0, 0.0005)), 2)
+        self.prices[code] = price
+        return price
+
+    async def _handle(self, connection: ServerConnection) -> None:
+        self.connections.add(connection)
+        self.connection_count += 1
+        try:
+            request = json.loads(await connection.recv())
+            streams: List[Tuple[str, str]] = []
+            for field in request:
+                if field.get("type") in MESSAGE_BUILDERS:
+                    streams.extend((field["type"], code.upper()) for code in field.get("codes", []))
+
+            await asyncio.sleep(self.snapshot_delay)
+            for stream, code in streams:
+                message = MESSAGE_BUILDERS[stream](code, self._next_price(code), "SNAPSHOT")
+                await connection.send(json.dumps(message).encode())
+            while True:
+                await asyncio.sleep(self.interval)
+                stream, code = random.choice(streams)
+                message = MESSAGE_BUILDERS[stream](code, self._next_price(code), "REALTIME")
+                await connection.send(json.dumps(message).encode())
+        except Exception:
+            pass
+        finally:
+            self.connections.discard(connection)
+
+
+async def run(args) -> None:
+    server = await MockUpbitWebSocketServer(args.host, args.port, args.interval).start()
+    print(f"🧪 Mock Upbit WebSocket server listening on {server.url}")
+    started = time.monotonic()
+    while True:
+        await asyncio.sleep(args.drop_every or 3600)
+        if args.drop_every:
+            print(f"   Dropping {len(server.connections)} connection(s) after {time.monotonic() - started:.0f}s")
+            await server.drop_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Upbit WebSocket API")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=10001, help="Port to bind (default: 10001)")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between realtime updates (default: 0.2)")
+    parser.add_argument("--drop-every", type=float, default=0, help="Drop all connections every N seconds (default: never)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Tests for the candle backfill and columnar store, using a fake client for candle pages."""
+
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+from mcp_upbit import candles
+from mcp_upbit.candles import CandleSeries, CandleStore, format_time, parse_time
+
+MINUTE = 60
+WINDOW = candles.PAGE_SIZE * MINUTE
+
+
+class FakeCandleClient:
+    """Serves 1-minute candles for the given start times, newest first like Upbit."""
+
+    def __init__(self, times: List[int], fail_before: Optional[int] = None):
+        self.times = np.array(sorted(times), dtype=np.int64)
+        self.fail_before = fail_before
+        self.requests: List[int] = []
+
+    async def validate_markets(self, codes: List[str]) -> List[str]:
+        return [code.strip().upper() for code in codes]
+
+    async def get_candles_minutes(self, unit: int, market: str, count: int, to: str) -> List[dict]:
+        to_epoch = parse_time(to)
+        self.requests.append(to_epoch)
+        if self.fail_before is not None and to_epoch <= self.fail_before:
+            raise RuntimeError("candle page failed")
+        end = int(np.searchsorted(self.times, to_epoch, side="left"))
+        page = self.times[max(0, end - count):end][::-1]
+        return [
+            {
+                "candle_date_time_utc": format_time(epoch)[:-1],
+                "opening_price": float(epoch % 1000),
+                "high_price": float(epoch % 1000) + 2,
+                "low_price": float(epoch % 1000) - 2,
+                "trade_price": float(epoch % 1000) + 1,
+                "candle_acc_trade_volume": 1.0,
+                "candle_acc_trade_price": 100.0,
+            }
+            for epoch in page
+        ]
+
+
+START = parse_time("2024-03-01T00:00:00")
+LISTED = START - 10 * WINDOW
+
+
+def minutes(start: int, end: int) -> List[int]:
+    return list(range(start, end, MINUTE))
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candles, "BACKFILL_CONCURRENCY", 4)
+    monkeypatch.setattr(candles, "BACKFILL_FLUSH_ROWS", 100_000)
+
+    def make(times: List[int], **kwargs) -> CandleStore:
+        return CandleStore(client=FakeCandleClient(times, **kwargs), directory=str(tmp_path))
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_backfill_stores_range_and_skips_covered_requests(make_store):
+    store = make_store(minutes(LISTED, START + 20 * WINDOW))
+    end = START + 10 * WINDOW
+
+    result = await store.backfill("krw-btc", 1, START, end)
+    assert result["market"] == "KRW-BTC"
+    assert result["fetched_candles"] == 10 * candles.PAGE_SIZE
+    assert result["requests"] == 10
+    series = store.series("KRW-BTC", 1)
+    assert (series.covered_from, series.covered_to) == (START, end)
+    assert series.read()["time"].tolist() == minutes(START, end)
+
+    again = await store.backfill("KRW-BTC", 1, START, end)
+    assert again["requests"] == 0
+    assert again["fetched_candles"] == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_fetches_only_missing_head_and_tail(make_store):
+    store = make_store(minutes(LISTED, START + 20 * WINDOW))
+    await store.backfill("KRW-BTC", 1, START, START + 2 * WINDOW)
+    store.client.requests.clear()
+
+    result = await store.backfill("KRW-BTC", 1, START - WINDOW, START + 3 * WINDOW)
+    # One forward page for the tail, one backward page for the head
+    assert sorted(store.client.requests) == [START, START + 3 * WINDOW]
+    assert result["fetched_candles"] == 2 * candles.PAGE_SIZE
+    series = store.series("KRW-BTC", 1)
+    assert (series.covered_from, series.covered_to) == (START - WINDOW, START + 3 * WINDOW)
+    assert series.read()["time"].tolist() == minutes(START - WINDOW, START + 3 * WINDOW)
+
+
+@pytest.mark.asyncio
+async def test_gaps_are_covered_without_refetching(make_store):
+    quiet = set(range(START + WINDOW, START + WINDOW + 90 * MINUTE, MINUTE))
+    times = [epoch for epoch in minutes(LISTED, START + 4 * WINDOW) if epoch not in quiet]
+    store = make_store(times)
+    end = START + 4 * WINDOW
+
+    result = await store.backfill("KRW-BTC", 1, START, end)
+    assert result["fetched_candles"] == 4 * candles.PAGE_SIZE - len(quiet)
+    stored = store.series("KRW-BTC", 1).read()["time"]
+    assert not quiet & set(stored.tolist())
+    assert np.all(np.diff(stored) > 0)
+
+    # A period without trades inside the covered range is not fetched again
+    assert (await store.backfill("KRW-BTC", 1, START + WINDOW, START + 2 * WINDOW))["requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_stops_at_listing(make_store):
+    listed = START + WINDOW // 2
+    store = make_store(minutes(listed, START + 4 * WINDOW))
+    end = START + 4 * WINDOW
+
+    result = await store.backfill("KRW-BTC", 1, START - 20 * WINDOW, end)
+    # The first batch reaches an empty page before the listing and stops there
+    assert result["requests"] == candles.BACKFILL_CONCURRENCY * 2
+    series = store.series("KRW-BTC", 1)
+    assert series.covered_from == START - 20 * WINDOW
+    assert series.read()["time"].tolist() == minutes(listed, end)
+    assert (await store.backfill("KRW-BTC", 1, START - 20 * WINDOW, end))["requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_writes_once(make_store, monkeypatch):
+    merges = []
+    original = CandleSeries.merge
+
+    def counting_merge(self, new, covered_from, covered_to):
+        merges.append(len(new["time"]))
+        original(self, new, covered_from, covered_to)
+
+    monkeypatch.setattr(CandleSeries, "merge", counting_merge)
+    store = make_store(minutes(LISTED, START + 20 * WINDOW))
+    await store.backfill("KRW-BTC", 1, START, START + 10 * WINDOW)
+    assert merges == [10 * candles.PAGE_SIZE]
+
+    # Past the flush threshold, long backfills write every few batches instead
+    monkeypatch.setattr(candles, "BACKFILL_FLUSH_ROWS", candles.PAGE_SIZE * candles.BACKFILL_CONCURRENCY)
+    merges.clear()
+    await store.backfill("KRW-BTC", 1, START, START + 20 * WINDOW)
+    assert merges == [
+        candles.PAGE_SIZE * candles.BACKFILL_CONCURRENCY,
+        candles.PAGE_SIZE * candles.BACKFILL_CONCURRENCY,
+        candles.PAGE_SIZE * 2,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_page_keeps_completed_batches(make_store, tmp_path):
+    end = START + 8 * WINDOW
+    store = make_store(minutes(LISTED, end), fail_before=START + 2 * WINDOW)
+
+    with pytest.raises(RuntimeError):
+        await store.backfill("KRW-BTC", 1, START, end)
+    # The first (newest) batch of four windows was written before the failing batch
+    covered_from = end - candles.BACKFILL_CONCURRENCY * WINDOW
+    series = store.series("KRW-BTC", 1)
+    assert (series.covered_from, series.covered_to) == (covered_from, end)
+
+    # A new store over the same directory picks up the persisted rows and coverage
+    reloaded = CandleStore(client=FakeCandleClient(minutes(LISTED, end)), directory=str(tmp_path))
+    reloaded_series = reloaded.series("KRW-BTC", 1)
+    assert reloaded_series.covered_from == covered_from
+    assert reloaded_series.read()["time"].tolist() == minutes(covered_from, end)
+    result = await reloaded.backfill("KRW-BTC", 1, START, end)
+    assert result["requests"] == 4
+    assert result["fetched_candles"] == (covered_from - START) // MINUTE
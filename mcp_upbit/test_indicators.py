@@ -0,0 +1,134 @@
+"""Tests for the incremental indicator engine against full recomputes and naive references."""
+
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from mcp_upbit.candles import parse_time
+from mcp_upbit.indicators import DEFAULT_PARAMS, VWAP_SESSION, Indicator, IndicatorSeries, parse_indicator
+
+
+def make_candles(count: int, seed: int = 3) -> Dict[str, np.ndarray]:
+    """Random-walk 5-minute candles that span several VWAP sessions."""
+    rng = np.random.default_rng(seed)
+    close = 50_000 + np.cumsum(rng.normal(scale=50, size=count))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    volume = rng.random(size=count) + 0.01
+    return {
+        "time": parse_time("2024-03-01T20:00:00") + np.arange(count, dtype=np.int64) * 300,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.random(size=count) * 20,
+        "low": np.minimum(open_, close) - rng.random(size=count) * 20,
+        "close": close,
+        "volume": volume,
+        "value": volume * close,
+    }
+
+
+def split(candles: Dict[str, np.ndarray], sizes: List[int]) -> List[Dict[str, np.ndarray]]:
+    bounds = np.cumsum([0, *sizes])
+    return [{name: column[lo:hi] for name, column in candles.items()} for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def naive_ema(values: np.ndarray, alpha: float, period: int) -> np.ndarray:
+    """SMA-seeded exponential average, one value at a time."""
+    out = np.full(len(values), np.nan)
+    prev = float(np.mean(values[:period]))
+    out[period - 1] = prev
+    for index in range(period, len(values)):
+        prev = (1 - alpha) * prev + alpha * values[index]
+        out[index] = prev
+    return out
+
+
+def naive_rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's RSI, one value at a time."""
+    change = np.diff(close)
+    out = np.full(len(close), np.nan)
+    gain = float(np.mean(np.clip(change[:period], 0, None)))
+    loss = float(np.mean(np.clip(-change[:period], 0, None)))
+    for index in range(period, len(change) + 1):
+        if index > period:
+            gain = (gain * (period - 1) + max(change[index - 1], 0)) / period
+            loss = (loss * (period - 1) + max(-change[index - 1], 0)) / period
+        out[index] = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+    return out
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("rsi", ("rsi", (14,))),
+    ("RSI:21", ("rsi", (21,))),
+    ("macd:8:21", ("macd", (8, 21, 9))),
+    ("bbands(20, 2.5)", ("bbands", (20, 2.5))),
+    ("bbands:10", ("bbands", (10, 2))),
+    (" vwap ", ("vwap", ())),
+])
+def test_parse_indicator(spec, expected):
+    assert parse_indicator(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["foo", "rsi:0", "sma:2.5", "ema:1:2", "vwap:5", ""])
+def test_parse_indicator_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_indicator(spec)
+
+
+@pytest.mark.parametrize("name", list(DEFAULT_PARAMS))
+@pytest.mark.parametrize("sizes", [[1] * 40 + [960], [13, 7, 280, 1, 699], [600, 400]])
+def test_incremental_update_matches_full_recompute(name, sizes):
+    candles = make_candles(sum(sizes))
+    full = Indicator(name, DEFAULT_PARAMS[name]).update(candles)
+
+    incremental = Indicator(name, DEFAULT_PARAMS[name])
+    parts = [incremental.update(chunk) for chunk in split(candles, sizes)]
+    for component, values in full.items():
+        joined = np.concatenate([part[component] for part in parts])
+        np.testing.assert_allclose(joined, values, rtol=1e-9, equal_nan=True)
+
+
+def test_ema_and_rsi_match_reference():
+    candles = make_candles(3000)
+    close = candles["close"]
+    ema = Indicator("ema", (50,)).update(candles)["value"]
+    np.testing.assert_allclose(ema, naive_ema(close, 2 / 51, 50), rtol=1e-9, equal_nan=True)
+    rsi = Indicator("rsi", (14,)).update(candles)["value"]
+    np.testing.assert_allclose(rsi, naive_rsi(close, 14), rtol=1e-9, equal_nan=True)
+
+
+def test_sma_bbands_and_vwap_match_reference():
+    candles = make_candles(500)
+    close = candles["close"]
+    sma = Indicator("sma", (20,)).update(candles)["value"]
+    expected = np.array([np.nan] * 19 + [close[i - 19:i + 1].mean() for i in range(19, len(close))])
+    np.testing.assert_allclose(sma, expected, rtol=1e-9, equal_nan=True)
+
+    bands = Indicator("bbands", (20, 2)).update(candles)
+    std = np.array([np.nan] * 19 + [close[i - 19:i + 1].std() for i in range(19, len(close))])
+    np.testing.assert_allclose(bands["upper"], expected + 2 * std, rtol=1e-9, equal_nan=True)
+
+    vwap = Indicator("vwap", ()).update(candles)["value"]
+    sessions = candles["time"] // VWAP_SESSION
+    for index in range(len(close)):
+        same = sessions[:index + 1] == sessions[index]
+        reference = candles["value"][:index + 1][same].sum() / candles["volume"][:index + 1][same].sum()
+        assert vwap[index] == pytest.approx(reference, rel=1e-9)
+
+
+def test_indicator_series_processes_only_new_candles():
+    candles = make_candles(800)
+    series = IndicatorSeries()
+    indicator = Indicator("macd", DEFAULT_PARAMS["macd"])
+
+    assert series.update(indicator, {name: column[:700] for name, column in candles.items()}) == (700, True)
+    assert series.update(indicator, {name: column[:700] for name, column in candles.items()}) == (0, False)
+    assert series.update(indicator, candles) == (100, False)
+    full = Indicator("macd", DEFAULT_PARAMS["macd"]).update(candles)
+    for component, values in full.items():
+        np.testing.assert_allclose(series.outputs[indicator.key][component], values, rtol=1e-9, equal_nan=True)
+
+    # Older candles arriving in the store force a recompute from the first stored candle
+    earlier = make_candles(900)
+    earlier["time"] = earlier["time"] - 100 * 300
+    assert series.update(indicator, earlier) == (900, True)
+    assert len(series.outputs[indicator.key]["macd"]) == 900
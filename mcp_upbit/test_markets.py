@@ -0,0 +1,106 @@
+"""Tests for the cached market catalogue and market code validation (no network access)."""
+
+import asyncio
+
+import pytest
+
+from mcp_upbit.markets import InvalidMarketError, MarketCatalog
+from mcp_upbit.upbit_client import UpbitClient
+
+MARKETS = [
+    {"market": "KRW-BTC", "korean_name": "비트코인", "english_name": "Bitcoin"},
+    {"market": "KRW-BCH", "korean_name": "비트코인캐시", "english_name": "Bitcoin Cash"},
+    {"market": "KRW-ETH", "korean_name": "이더리움", "english_name": "Ethereum"},
+    {"market": "BTC-ETH", "korean_name": "이더리움", "english_name": "Ethereum"},
+    {"market": "BTC-BCH", "korean_name": "비트코인캐시", "english_name": "Bitcoin Cash"},
+    {"market": "USDT-BTC", "korean_name": "비트코인", "english_name": "Bitcoin"},
+]
+
+
+def make_catalog(markets=MARKETS) -> MarketCatalog:
+    async def fetch():
+        return markets
+
+    catalog = MarketCatalog(fetch)
+    catalog._index(markets)
+    return catalog
+
+
+def codes(markets):
+    return [market["market"] for market in markets]
+
+
+def test_filter_by_quote_and_base():
+    catalog = make_catalog()
+    assert codes(catalog.filter(quote="krw")) == ["KRW-BTC", "KRW-BCH", "KRW-ETH"]
+    assert codes(catalog.filter(base="eth")) == ["KRW-ETH", "BTC-ETH"]
+    assert codes(catalog.filter(quote="BTC", base="ETH")) == ["BTC-ETH"]
+    assert codes(catalog.filter(quote="KRW", limit=2)) == ["KRW-BTC", "KRW-BCH"]
+    assert catalog.filter(quote="EUR") == []
+
+
+def test_filter_name_prefers_exact_match():
+    catalog = make_catalog()
+    assert codes(catalog.filter(name="bitcoin")) == ["KRW-BTC", "USDT-BTC"]
+    assert codes(catalog.filter(name=" 비트코인 ", quote="KRW")) == ["KRW-BTC"]
+    assert codes(catalog.filter(name="coin c", quote="KRW")) == ["KRW-BCH"]
+
+
+def test_name_index_serves_exact_lookups():
+    catalog = make_catalog()
+    assert codes(catalog.by_name["bitcoin"]) == ["KRW-BTC", "USDT-BTC"]
+    assert codes(catalog.by_name["비트코인캐시"]) == ["KRW-BCH", "BTC-BCH"]
+    # Exact matches come from the index rather than a scan of the names
+    catalog.by_name["satoshi"] = [catalog.by_code["USDT-BTC"], catalog.by_code["KRW-BTC"]]
+    assert codes(catalog.filter(name="Satoshi")) == ["KRW-BTC", "USDT-BTC"]
+    assert codes(catalog.filter(name="satoshi", quote="USDT")) == ["USDT-BTC"]
+
+
+def test_filter_name_exact_match_is_scoped_to_candidates():
+    catalog = make_catalog()
+    # "Bitcoin" is an exact match only outside the BTC market, so the substring match applies there
+    assert codes(catalog.filter(name="bitcoin", quote="BTC")) == ["BTC-BCH"]
+    assert codes(catalog.filter(name="비트코인", base="BCH")) == ["KRW-BCH", "BTC-BCH"]
+
+
+@pytest.mark.asyncio
+async def test_ensure_loaded_fetches_once():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return MARKETS
+
+    catalog = MarketCatalog(fetch)
+    await asyncio.gather(*(catalog.ensure_loaded() for _ in range(5)))
+    assert len(calls) == 1
+    assert catalog.invalid(["KRW-BTC", "KRW-XYZ"]) == ["KRW-XYZ"]
+    await catalog.stop()
+
+
+@pytest.mark.asyncio
+async def test_validate_markets_rejects_unknown_codes():
+    client = UpbitClient()
+    client.catalog = make_catalog()
+    try:
+        assert await client.validate_markets([" krw-btc", "BTC-ETH", ""]) == ["KRW-BTC", "BTC-ETH"]
+        with pytest.raises(InvalidMarketError) as error:
+            await client.get_ticker("KRW-BTC,KRW-XYZ,BTC-ABC")
+        assert error.value.markets == ["KRW-XYZ", "BTC-ABC"]
+        assert client.requests == 0
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_validate_markets_skips_when_catalogue_unavailable():
+    async def fetch():
+        raise RuntimeError("market/all unavailable")
+
+    client = UpbitClient()
+    client.catalog = MarketCatalog(fetch)
+    try:
+        assert await client.validate_markets(["krw-xyz"]) == ["KRW-XYZ"]
+    finally:
+        await client.close()
@@ -0,0 +1,185 @@
+"""Tests for the WebSocket realtime feed against the local stand-in server (no network access)."""
+
+import asyncio
+import json
+import time
+from typing import Callable
+
+import pytest
+
+from mcp_upbit import http_server, realtime
+from mcp_upbit.markets import MarketCatalog
+from mcp_upbit.realtime import UpbitRealtimeFeed
+from mcp_upbit.upbit_client import UpbitClient
+from mock_upbit_websocket import MockUpbitWebSocketServer
+
+MARKETS = [
+    {"market": "KRW-BTC", "korean_name": "비트코인", "english_name": "Bitcoin"},
+    {"market": "KRW-ETH", "korean_name": "이더리움", "english_name": "Ethereum"},
+]
+
+
+def make_client(feed: UpbitRealtimeFeed) -> UpbitClient:
+    """Client on the realtime feed whose market catalogue is served locally instead of /market/all."""
+    async def fetch_markets():
+        return MARKETS
+
+    client = UpbitClient(realtime=feed)
+    client.catalog = MarketCatalog(fetch_markets)
+    return client
+
+
+async def wait_until(predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+    """Poll until the predicate holds or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return predicate()
+
+
+@pytest.mark.asyncio
+async def test_realtime_ticker():
+    server = await MockUpbitWebSocketServer(interval=0.05).start()
+    markets = ["KRW-BTC", "KRW-ETH"]
+    client = make_client(UpbitRealtimeFeed(markets, url=server.url))
+    try:
+        client.realtime.ensure_started()
+        assert await wait_until(lambda: len(client.realtime.tickers) == len(markets))
+
+        # get_ticker answers subscribed markets from the snapshot without REST requests
+        ticker = await client.get_ticker("KRW-BTC,KRW-ETH")
+        assert [t["market"] for t in ticker] == markets
+        assert all(t["trade_price"] > 0 for t in ticker)
+        assert client.requests == 0
+        assert client.realtime.hits == len(markets)
+
+        # A dropped connection is re-established and snapshots keep flowing
+        await server.drop_connections()
+        assert await wait_until(lambda: client.realtime.reconnects > 0 and client.realtime.connected)
+        assert server.connection_count >= 2
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_http_server_lifespan_starts_feed_and_closes_client(monkeypatch):
+    server = await MockUpbitWebSocketServer(interval=0.05).start()
+    client = make_client(UpbitRealtimeFeed(["KRW-BTC"], url=server.url))
+    monkeypatch.setattr(http_server, "upbit_client", client)
+    try:
+        async with http_server.lifespan(http_server.app):
+            assert await wait_until(lambda: "KRW-BTC" in client.realtime.tickers)
+            assert client.realtime.connected
+        assert client.realtime._task is None
+        assert not client.realtime.connected
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_realtime_orderbook():
+    server = await MockUpbitWebSocketServer(interval=0.02).start()
+    client = make_client(UpbitRealtimeFeed([], url=server.url, orderbook_markets=["KRW-BTC"]))
+    try:
+        client.realtime.ensure_started()
+        assert await wait_until(lambda: "KRW-BTC" in client.realtime.orderbooks)
+
+        # The top levels come from memory, sorted and not crossed
+        first = (await client.get_orderbook("KRW-BTC", depth=5))[0]
+        units = first["orderbook_units"]
+        asks = [unit["ask_price"] for unit in units]
+        bids = [unit["bid_price"] for unit in units]
+        assert len(units) == 5
+        assert asks == sorted(asks)
+        assert bids == sorted(bids, reverse=True)
+        assert bids[0] < asks[0]
+        assert first["source"] == "websocket"
+
+        # Stream updates advance the sequence number and timestamp
+        sequence = first["sequence"]
+        assert await wait_until(lambda: client.realtime.orderbooks["KRW-BTC"].sequence > sequence)
+        latest = (await client.get_orderbook("KRW-BTC", depth=5))[0]
+        assert latest["sequence"] > first["sequence"]
+        assert latest["timestamp"] >= first["timestamp"]
+        assert client.requests == 0
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_malformed_message_is_skipped_without_reconnecting(caplog):
+    server = await MockUpbitWebSocketServer(interval=0.02).start()
+    feed = UpbitRealtimeFeed(["KRW-BTC"], url=server.url)
+    try:
+        feed.ensure_started()
+        assert await wait_until(lambda: "KRW-BTC" in feed.tickers)
+
+        await server.send_raw(b"not json")
+        await server.send_raw(json.dumps({"type": "ticker"}).encode())
+        assert await wait_until(lambda: feed.malformed == 2)
+        messages = feed.messages
+        assert await wait_until(lambda: feed.messages > messages)
+        assert feed.connected
+        assert (feed.connects, feed.reconnects) == (1, 0)
+        assert sum("malformed" in record.getMessage() for record in caplog.records) == 2
+    finally:
+        await feed.stop()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_serves_snapshots_only_after_first_message(monkeypatch):
+    monkeypatch.setattr(realtime, "WS_STALE_AFTER", 0.2)
+    server = await MockUpbitWebSocketServer(interval=0.02).start()
+    feed = UpbitRealtimeFeed(["KRW-BTC"], url=server.url)
+    try:
+        feed.ensure_started()
+        assert await wait_until(lambda: feed.connected)
+
+        # The new connection is subscribed but silent, so it does not count as connected
+        server.snapshot_delay = 0.6
+        await server.drop_connections()
+        assert await wait_until(lambda: server.connection_count == 2)
+        assert not feed.connected
+        assert await wait_until(lambda: not feed.is_fresh())
+        assert feed.lookup_tickers(["KRW-BTC"]) == ({}, ["KRW-BTC"])
+
+        assert await wait_until(lambda: feed.connected)
+        found, missing = feed.lookup_tickers(["KRW-BTC"])
+        assert list(found) == ["KRW-BTC"] and missing == []
+    finally:
+        await feed.stop()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_long_disconnect_drops_stale_snapshots(monkeypatch):
+    monkeypatch.setattr(realtime, "WS_STALE_AFTER", 0.2)
+    monkeypatch.setattr(realtime, "WS_RECONNECT_BASE_DELAY", 0.02)
+    server = await MockUpbitWebSocketServer(interval=0.02).start()
+    feed = UpbitRealtimeFeed(["KRW-BTC"], url=server.url, orderbook_markets=["KRW-BTC"])
+    try:
+        feed.ensure_started()
+        assert await wait_until(lambda: "KRW-BTC" in feed.tickers and "KRW-BTC" in feed.orderbooks)
+        port = server.port
+        await server.stop()
+        assert await wait_until(lambda: not feed.connected)
+        await asyncio.sleep(0.3)
+
+        # After the server comes back, snapshots from before the outage are gone until fresh ones arrive
+        server = await MockUpbitWebSocketServer(port=port, interval=0.02, snapshot_delay=0.3).start()
+        assert await wait_until(lambda: server.connection_count == 1)
+        await asyncio.sleep(0.05)
+        assert feed.tickers == {} and feed.orderbooks == {}
+        assert feed.lookup_tickers(["KRW-BTC"]) == ({}, ["KRW-BTC"])
+
+        assert await wait_until(lambda: feed.connected and "KRW-BTC" in feed.tickers)
+        assert feed.reconnects == 1
+    finally:
+        await feed.stop()
+        await server.stop()
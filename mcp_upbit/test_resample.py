@@ -0,0 +1,114 @@
+"""Tests for timeframe parsing, bucket alignment and vectorized resampling."""
+
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from mcp_upbit.candles import parse_time
+from mcp_upbit.resample import WEEK_ORIGIN, bucket_start, parse_timeframe, resample
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("15m", (900, 0)),
+    ("15min", (900, 0)),
+    ("240", (14400, 0)),
+    (" 2H ", (7200, 0)),
+    ("1d", (86400, 0)),
+    ("1w", (604800, WEEK_ORIGIN)),
+    ("2W", (1209600, WEEK_ORIGIN)),
+])
+def test_parse_timeframe(value, expected):
+    assert parse_timeframe(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0m", "", "abc", "1y", "-5m", "1.5h"])
+def test_parse_timeframe_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timeframe(value)
+
+
+def test_week_origin_is_monday():
+    origin = datetime.fromtimestamp(WEEK_ORIGIN, tz=timezone.utc)
+    assert origin.weekday() == 0
+    assert (origin.hour, origin.minute) == (0, 0)
+
+
+@pytest.mark.parametrize("moment, timeframe, expected", [
+    ("2024-03-05T13:47:00", "15m", "2024-03-05T13:45:00"),
+    ("2024-03-05T13:47:00", "4h", "2024-03-05T12:00:00"),
+    ("2024-03-05T13:47:00", "1d", "2024-03-05T00:00:00"),
+    # 2024-03-10 is a Sunday, 2024-03-11 a Monday
+    ("2024-03-10T23:59:00", "1w", "2024-03-04T00:00:00"),
+    ("2024-03-11T00:00:00", "1w", "2024-03-11T00:00:00"),
+    ("2024-03-06T12:00:00", "1w", "2024-03-04T00:00:00"),
+])
+def test_bucket_start(moment, timeframe, expected):
+    period, origin = parse_timeframe(timeframe)
+    assert bucket_start(parse_time(moment), period, origin) == parse_time(expected)
+
+
+def naive_resample(columns: Dict[str, np.ndarray], period: int, origin: int) -> Dict[str, List[float]]:
+    """Reference implementation: one bucket at a time with plain Python."""
+    buckets: Dict[int, List[int]] = {}
+    for index, epoch in enumerate(columns["time"]):
+        buckets.setdefault(bucket_start(int(epoch), period, origin), []).append(index)
+    result: Dict[str, List[float]] = {name: [] for name in columns}
+    for start, rows in sorted(buckets.items()):
+        result["time"].append(start)
+        result["open"].append(columns["open"][rows[0]])
+        result["high"].append(max(columns["high"][row] for row in rows))
+        result["low"].append(min(columns["low"][row] for row in rows))
+        result["close"].append(columns["close"][rows[-1]])
+        result["volume"].append(sum(columns["volume"][row] for row in rows))
+        result["value"].append(sum(columns["value"][row] for row in rows))
+    return result
+
+
+def random_minutes(count: int, seed: int = 7) -> Dict[str, np.ndarray]:
+    """1-minute candles with random gaps (minutes without trades) starting on a Thursday."""
+    rng = np.random.default_rng(seed)
+    start = parse_time("2024-02-29T05:00:00")
+    times = start + np.cumsum(rng.integers(1, 4, size=count)) * 60
+    close = 100 + np.cumsum(rng.normal(size=count))
+    return {
+        "time": times.astype(np.int64),
+        "open": close + rng.normal(size=count),
+        "high": close + 3,
+        "low": close - 3 + rng.random(size=count),
+        "close": close,
+        "volume": rng.random(size=count),
+        "value": rng.random(size=count) * 1000,
+    }
+
+
+@pytest.mark.parametrize("timeframe", ["3m", "15m", "1h", "4h", "1d", "1w"])
+def test_resample_matches_naive_aggregation(timeframe):
+    period, origin = parse_timeframe(timeframe)
+    columns = random_minutes(20_000)
+    result = resample(columns, period, origin)
+    expected = naive_resample(columns, period, origin)
+    assert result["time"].tolist() == expected["time"]
+    for name in ("open", "high", "low", "close", "volume", "value"):
+        np.testing.assert_allclose(result[name], expected[name])
+
+
+def test_resample_omits_empty_buckets_and_handles_empty_input():
+    columns = {
+        "time": np.array([0, 60, 7200, 7260], dtype=np.int64),
+        "open": np.array([1.0, 2.0, 3.0, 4.0]),
+        "high": np.array([5.0, 6.0, 7.0, 8.0]),
+        "low": np.array([0.5, 0.4, 0.3, 0.2]),
+        "close": np.array([1.5, 2.5, 3.5, 4.5]),
+        "volume": np.array([1.0, 1.0, 2.0, 2.0]),
+        "value": np.array([10.0, 10.0, 20.0, 20.0]),
+    }
+    result = resample(columns, 3600)
+    assert result["time"].tolist() == [0, 7200]
+    assert result["open"].tolist() == [1.0, 3.0]
+    assert result["close"].tolist() == [2.5, 4.5]
+    assert result["volume"].tolist() == [2.0, 4.0]
+
+    empty = resample({name: column[:0] for name, column in columns.items()}, 3600)
+    assert all(len(column) == 0 for column in empty.values())
@@ -114,7 +114,9 @@ def print_usage_instructions():
     print("   curl http://localhost:10000/health")
     print("\n4. Change port (optional):")
     print("   PORT=8080 docker-compose up -d")
-    print("\n5. View logs:")
+    print("\n5. Serve tickers from the WebSocket cache (optional):")
+    print("   UPBIT_WS_TICKER_MARKETS=KRW-BTC,KRW-ETH docker-compose up -d")
+    print("\n6. View logs:")
     print("   docker-compose logs -f")
     print("\n📚 Check README.md for detailed API documentation")
     print("\n✨ Available endpoints:")